@@ -1,31 +1,34 @@
 import pandas as pd
+from backend.analytics.threshold.performance_stats import refresh_performance_stats
+from backend.supabase.cache import cached, invalidate
 from backend.supabase.supabase_client import supabase  # الاتصال المركزي
 
-def fetch_performance_data():
-    """Fetch monthly performance tracking data."""
-    response = supabase.table('performance_tracking').select('*').execute()
-    return pd.DataFrame(response.data)
-
 def bayesian_update(prior_mean, prior_variance, observed_mean, observed_variance):
     """Bayesian Updating Formula."""
     posterior_mean = (prior_variance * observed_mean + observed_variance * prior_mean) / (prior_variance + observed_variance)
     return round(posterior_mean, 2)
 
-def update_thresholds():
+def update_thresholds(full=False):
     """Apply Bayesian update to thresholds."""
-    # Fetch data
-    df = fetch_performance_data()
+    # Fold only the periods added since the last run into the running statistics
+    stats = refresh_performance_stats(full=full)
 
-    if df.empty:
+    if not stats.periods:
         print("⚠️ No performance data found.")
         return
+    if stats.service_count < 2:
+        print(f"⚠️ {int(stats.service_count)} service level value(s) recorded; need 2 for a variance. Skipping update.")
+        return
 
     # Example calculation: Adjust Demand Variability Threshold
-    observed_mean = df['service_level_achieved'].mean()
-    observed_variance = df['service_level_achieved'].var()
+    observed_mean = stats.service_mean
+    observed_variance = stats.service_variance
 
     # Fetch current threshold
-    current = supabase.table('threshold_config').select('*').limit(1).execute().data[0]
+    current = cached(
+        'threshold_config', 'current',
+        lambda: supabase.table('threshold_config').select('*').limit(1).execute().data[0]
+    )
     prior_mean = current['demand_variability_threshold']
     prior_variance = 0.01  # Example prior variance
 
@@ -34,6 +37,7 @@ def update_thresholds():
 
     # Update in Supabase
     supabase.table('threshold_config').update({'demand_variability_threshold': new_threshold}).execute()
+    invalidate('threshold_config')
     print(f"✅ Demand Variability Threshold updated to: {new_threshold}")
 
 if __name__ == "__main__":
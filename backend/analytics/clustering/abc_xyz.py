@@ -0,0 +1,189 @@
+"""
+Vectorised ABC-XYZ segmentation of product-locations.
+
+A cheap, deterministic alternative to the K-Means classification:
+
+* **ABC** -- Pareto classes on each location's cumulative value share, with
+  value = average daily usage x latest unit price.  Money and units are
+  never mixed: a location where any row has no price is ranked by ADU
+  alone (``value_basis = "adu"``) and reported.  Rows are ranked by value within their location; a row is
+  ``A`` while the share of value *before* it is below ``ABC_A_SHARE`` (80%),
+  ``B`` below ``ABC_B_SHARE`` (95%) and ``C`` otherwise, so the most
+  valuable row of a location is always ``A``.
+* **XYZ** -- demand coefficient of variation: ``X`` up to ``XYZ_X_CV``
+  (0.5), ``Y`` up to ``XYZ_Y_CV`` (1.0), ``Z`` above.
+* **Lead time** -- ``Short`` up to 7 days, ``Medium`` up to 21, ``Long``
+  above, from the ``items`` supply + manufacturing lead times (the
+  buffer's DLT when the item has none).
+
+Everything works on columnar arrays: one ``np.lexsort`` by location and
+descending value, one ``np.cumsum`` over the whole array and per-location
+offsets from ``np.flatnonzero`` / ``np.add.reduceat``, so the cost is one
+sort plus linear passes, whatever the number of locations.
+"""
+
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.supabase.bulk import read_table
+
+ABC_A_SHARE = float(os.getenv("ABC_A_SHARE", "0.8"))
+ABC_B_SHARE = float(os.getenv("ABC_B_SHARE", "0.95"))
+XYZ_X_CV = float(os.getenv("XYZ_X_CV", "0.5"))
+XYZ_Y_CV = float(os.getenv("XYZ_Y_CV", "1.0"))
+LEAD_TIME_BINS = (7.0, 21.0)
+LEAD_TIME_LABELS = np.array(["Short", "Medium", "Long"])
+ABC = np.array(["A", "B", "C"])
+XYZ = np.array(["X", "Y", "Z"])
+VARIABILITY_LEVELS = {"X": "Low", "Y": "Medium", "Z": "High"}
+CRITICALITY = {"A": "High", "B": "Medium", "C": "Low"}
+
+
+def abc_classes(location_codes: np.ndarray, values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Pareto class, cumulative value share and in-location rank of every row.
+
+    Args:
+        location_codes: Integer location code per row (e.g. from ``pd.factorize``).
+        values: Non-negative value per row (NaN counts as 0).
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)
+    n = len(values)
+    if not n:
+        return {"abc_class": np.array([], dtype=str), "cumulative_share": np.array([]), "rank": np.array([], dtype=int)}
+    order = np.lexsort((-values, location_codes))
+    sorted_locations = location_codes[order]
+    sorted_values = values[order]
+
+    starts = np.concatenate([[0], np.flatnonzero(sorted_locations[1:] != sorted_locations[:-1]) + 1])
+    sizes = np.diff(np.append(starts, n))
+    totals = np.repeat(np.add.reduceat(sorted_values, starts), sizes)
+    running = np.cumsum(sorted_values)
+    before_location = np.repeat(running[starts] - sorted_values[starts], sizes)
+    cumulative = running - before_location
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(totals > 0, cumulative / totals, 1.0)
+        share_before = np.where(totals > 0, (cumulative - sorted_values) / totals, 1.0)
+
+    klass = np.where(share_before < ABC_A_SHARE, 0, np.where(share_before < ABC_B_SHARE, 1, 2))
+    rank = np.arange(n) - np.repeat(starts, sizes) + 1
+
+    result_class = np.empty(n, dtype=int)
+    result_share = np.empty(n)
+    result_rank = np.empty(n, dtype=int)
+    result_class[order], result_share[order], result_rank[order] = klass, share, rank
+    return {"abc_class": ABC[result_class], "cumulative_share": result_share, "rank": result_rank}
+
+
+def xyz_classes(cv: np.ndarray) -> np.ndarray:
+    """X/Y/Z class of each coefficient of variation (NaN counts as Z)."""
+    cv = np.asarray(cv, dtype=float)
+    return XYZ[np.where(cv <= XYZ_X_CV, 0, np.where(cv <= XYZ_Y_CV, 1, 2))]
+
+
+def lead_time_categories(lead_time_days: np.ndarray) -> np.ndarray:
+    """Short/Medium/Long category of each lead time (NaN counts as Long)."""
+    lead_time_days = np.asarray(lead_time_days, dtype=float)
+    return LEAD_TIME_LABELS[np.where(lead_time_days <= LEAD_TIME_BINS[0], 0,
+                                     np.where(lead_time_days <= LEAD_TIME_BINS[1], 1, 2))]
+
+
+def segment(frame: pd.DataFrame) -> pd.DataFrame:
+    """ABC, XYZ and lead-time segments of every row.
+
+    ``frame`` needs ``product_id``, ``location_id``, ``value``, ``cv`` and
+    ``lead_time_days``; the result adds ``abc_class``, ``xyz_class``,
+    ``segment`` (e.g. ``"AX"``), ``lead_time_category``, ``cumulative_share``
+    and ``rank``.
+    """
+    codes, _ = pd.factorize(frame["location_id"])
+    abc = abc_classes(codes, frame["value"].to_numpy(dtype=float))
+    xyz = xyz_classes(frame["cv"].to_numpy(dtype=float))
+    out = frame.copy()
+    out["abc_class"] = abc["abc_class"]
+    out["xyz_class"] = xyz
+    out["segment"] = np.char.add(abc["abc_class"].astype(str), xyz.astype(str))
+    out["lead_time_category"] = lead_time_categories(frame["lead_time_days"].to_numpy(dtype=float))
+    out["cumulative_share"] = abc["cumulative_share"]
+    out["rank"] = abc["rank"]
+    return out
+
+
+def segment_matrix(segmented: pd.DataFrame, by_location: bool = False) -> pd.DataFrame:
+    """The 3x3 ABC x XYZ matrix of row counts and value (per location when ``by_location``)."""
+    keys = (["location_id"] if by_location else []) + ["abc_class", "xyz_class"]
+    cells = pd.MultiIndex.from_product([list(ABC), list(XYZ)], names=["abc_class", "xyz_class"])
+    grouped = segmented.groupby(keys, observed=True).agg(products=("product_id", "size"), value=("value", "sum"))
+    if by_location:
+        locations = segmented["location_id"].unique()
+        cells = pd.MultiIndex.from_tuples(
+            [(location, a, x) for location in locations for a, x in cells], names=keys,
+        )
+    return grouped.reindex(cells, fill_value=0).reset_index()
+
+
+def _optional_table(table: str, key, columns: str) -> pd.DataFrame:
+    try:
+        return read_table(table, key=key, columns=columns)
+    except Exception as e:
+        print(f"⚠️ Could not load {table} for ABC-XYZ segmentation: {e}")
+        return pd.DataFrame()
+
+
+def load_segmentation_inputs() -> pd.DataFrame:
+    """Planning rows with value, CV and lead time, from one read per source table."""
+    planning = read_table(
+        "inventory_planning_view", key=("product_id", "location_id"),
+        columns="product_id, location_id, average_daily_usage, demand_variability, lead_time_days",
+    )
+    if planning.empty:
+        return planning
+    adu = planning["average_daily_usage"].astype(float).fillna(0.0)
+
+    pricing = _optional_table("product_pricing-master", ("product_id", "effective_date"), "product_id, effective_date, price")
+    price = pd.Series(np.nan, index=planning.index)
+    if not pricing.empty:
+        latest = pricing.sort_values("effective_date").drop_duplicates("product_id", keep="last").set_index("product_id")["price"]
+        price = planning["product_id"].map(latest).astype(float)
+
+    items = _optional_table("items", "item_id", "item_id, supply_lead_time, manufacturing_lead_time")
+    lead_time = planning["lead_time_days"].astype(float)
+    if not items.empty:
+        item_lead_time = (
+            items["supply_lead_time"].astype(float).fillna(0.0)
+            + items["manufacturing_lead_time"].astype(float).fillna(0.0)
+        ).set_axis(items["item_id"].astype(str))
+        lead_time = planning["product_id"].astype(str).map(item_lead_time).astype(float).fillna(lead_time)
+
+    # Rank a location by money only when every one of its rows has a price
+    fully_priced = price.notna().groupby(planning["location_id"]).transform("all")
+    unpriced_locations = planning.loc[~fully_priced, "location_id"].unique()
+    if len(unpriced_locations):
+        print(f"⚠️ {int(price.isna().sum())} row(s) without a price; ranking "
+              f"{len(unpriced_locations)} location(s) by ADU: {', '.join(map(str, unpriced_locations[:10]))}")
+
+    return pd.DataFrame({
+        "product_id": planning["product_id"],
+        "location_id": planning["location_id"],
+        "average_daily_usage": adu,
+        "demand_variability": planning["demand_variability"].astype(float),
+        "value": np.where(fully_priced, adu * price, adu),
+        "value_basis": np.where(fully_priced, "price", "adu"),
+        "cv": planning["demand_variability"].astype(float),
+        "lead_time_days": lead_time,
+    })
+
+
+def classify_abc_xyz(inputs: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Segment every product-location into ``product_classification`` columns."""
+    inputs = load_segmentation_inputs() if inputs is None else inputs
+    if inputs.empty:
+        return inputs
+    df = segment(inputs)
+    df["classification_label"] = df["abc_class"]
+    df["variability_level"] = df["xyz_class"].map(VARIABILITY_LEVELS)
+    df["criticality"] = df["abc_class"].map(CRITICALITY)
+    df["score"] = df["rank"]
+    return df
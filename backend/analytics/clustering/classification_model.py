@@ -0,0 +1,152 @@
+"""
+Persisted, versioned K-Means model for product classification.
+
+A :class:`ClassificationModel` holds what is needed to label a
+product-location without retraining: the feature scaling (mean and scale),
+the cluster centroids in feature space, the cluster -> A/B/C label mapping
+and the mean squared distance to the nearest centroid on the training
+data.  Each training run writes a new ``product_classification_v<N>.npz``
+under ``CLASSIFICATION_MODEL_DIR``; the highest version is the current
+model.
+
+:meth:`ClassificationModel.fit` clusters the raw features, exactly like
+``classify_products`` (same ``KMeans`` settings, mean 0 and scale 1), so
+switching between the in-memory and the persisted path does not relabel
+the catalogue.  The scaling fields stay in the artifact so a scaled model
+can be introduced later without changing its format.
+
+Labels are assigned with a nearest-centroid lookup.  A full retrain is only
+needed when the model is older than ``CLASSIFICATION_RETRAIN_DAYS`` or when
+the current data has drifted: :meth:`ClassificationModel.drift` is the
+ratio of the mean squared nearest-centroid distance on the data to the one
+seen at training, and a ratio above ``1 + CLASSIFICATION_DRIFT_TOLERANCE``
+triggers a retrain.
+"""
+
+import glob
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+MODEL_DIR = os.getenv(
+    "CLASSIFICATION_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".models"),
+)
+RETRAIN_DAYS = int(os.getenv("CLASSIFICATION_RETRAIN_DAYS", "7"))
+DRIFT_TOLERANCE = float(os.getenv("CLASSIFICATION_DRIFT_TOLERANCE", "0.25"))
+MODEL_NAME = "product_classification"
+LABELS = np.array(["A", "B", "C"])
+
+
+class ClassificationModel:
+    """Scaled K-Means centroids plus their A/B/C label mapping."""
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        mean: np.ndarray,
+        scale: np.ndarray,
+        labels: np.ndarray,
+        inertia: float,
+        version: int = 1,
+        trained_at: Optional[datetime] = None,
+    ):
+        self.centroids = centroids
+        self.mean = mean
+        self.scale = scale
+        self.labels = labels
+        self.inertia = inertia
+        self.version = version
+        self.trained_at = trained_at or datetime.utcnow()
+
+    @classmethod
+    def fit(cls, features: np.ndarray, n_clusters: int = 3, version: int = 1) -> "ClassificationModel":
+        """Train on raw features; clusters are labelled A/B/C by descending centroid sum."""
+        mean = np.zeros(features.shape[1])
+        scale = np.ones(features.shape[1])
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42).fit(features)
+        order = np.argsort(kmeans.cluster_centers_.sum(axis=1))[::-1]
+        labels = np.empty(n_clusters, dtype=object)
+        labels[order] = LABELS[:n_clusters]
+        return cls(kmeans.cluster_centers_, mean, scale, labels.astype(str), kmeans.inertia_ / len(features), version)
+
+    def _distances(self, features: np.ndarray) -> np.ndarray:
+        scaled = (features - self.mean) / self.scale
+        return ((scaled[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+
+    def assign(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        """Nearest cluster and its label for each row."""
+        cluster = self._distances(features).argmin(axis=1)
+        return {"cluster_id": cluster, "classification_label": self.labels[cluster]}
+
+    def drift(self, features: np.ndarray) -> float:
+        """Mean squared nearest-centroid distance on ``features`` relative to training."""
+        if not len(features):
+            return 1.0
+        current = self._distances(features).min(axis=1).mean()
+        return float(current / self.inertia) if self.inertia > 0 else float("inf") if current > 0 else 1.0
+
+    def needs_retrain(self, features: np.ndarray, now: Optional[datetime] = None) -> Optional[str]:
+        """Why the model should be retrained on ``features``, or ``None``."""
+        now = now or datetime.utcnow()
+        if now - self.trained_at >= timedelta(days=RETRAIN_DAYS):
+            return f"model v{self.version} is older than {RETRAIN_DAYS} days"
+        drift = self.drift(features)
+        if drift > 1 + DRIFT_TOLERANCE:
+            return f"drift {drift:.2f} exceeds {1 + DRIFT_TOLERANCE:.2f}"
+        return None
+
+    # -- persistence --------------------------------------------------------
+
+    def save(self, directory: str = MODEL_DIR) -> str:
+        """Write the model as ``product_classification_v<version>.npz``; returns the path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{MODEL_NAME}_v{self.version}.npz")
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            centroids=self.centroids,
+            mean=self.mean,
+            scale=self.scale,
+            labels=self.labels.astype(str),
+            inertia=np.array(self.inertia),
+            version=np.array(self.version),
+            trained_at=np.array(self.trained_at.isoformat()),
+        )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "ClassificationModel":
+        with np.load(path) as state:
+            return cls(
+                state["centroids"],
+                state["mean"],
+                state["scale"],
+                state["labels"],
+                float(state["inertia"]),
+                int(state["version"]),
+                datetime.fromisoformat(str(state["trained_at"])),
+            )
+
+
+def latest_version(directory: str = MODEL_DIR) -> int:
+    """Highest saved model version (0 when none exists)."""
+    versions = [
+        int(match.group(1))
+        for match in (re.search(rf"{MODEL_NAME}_v(\d+)\.npz$", path) for path in glob.glob(os.path.join(directory, "*.npz")))
+        if match
+    ]
+    return max(versions, default=0)
+
+
+def load_latest(directory: str = MODEL_DIR) -> Optional[ClassificationModel]:
+    """The current (highest-version) model, or ``None`` when none is saved."""
+    version = latest_version(directory)
+    if not version:
+        return None
+    return ClassificationModel.load(os.path.join(directory, f"{MODEL_NAME}_v{version}.npz"))
@@ -1,62 +1,42 @@
+import os
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from supabase import create_client, Client
-import os
-from dotenv import load_dotenv
-
-# === Load environment variables ===
-load_dotenv()
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from backend.analytics.clustering.abc_xyz import classify_abc_xyz
+from backend.analytics.clustering.classification_model import ClassificationModel, MODEL_DIR, latest_version, load_latest
+from backend.supabase.bulk import UPSERT_CHUNK_SIZE, bulk_upsert, iter_batches, read_table
+from backend.supabase.supabase_client import supabase
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+FEATURES = ['average_daily_usage', 'demand_variability']
+SOURCE = 'inventory_planning_view'
+SOURCE_KEY = ('product_id', 'location_id')
+SOURCE_COLUMNS = 'product_id, location_id, average_daily_usage, demand_variability'
+# "incremental" labels rows with the persisted model (classification_model.py) and
+# retrains only on schedule or drift; "kmeans" retrains on the whole view in memory;
+# "streaming" trains MiniBatchKMeans over record batches of CLASSIFICATION_BATCH_SIZE
+# rows and labels them in a second pass; "abc_xyz" uses the Pareto ABC-XYZ engine
+MODE = os.getenv("CLASSIFICATION_MODE", "incremental")
+BATCH_SIZE = int(os.getenv("CLASSIFICATION_BATCH_SIZE", "10000"))
 
 # === Step 1: Fetch All Data from Supabase in Batches ===
 def fetch_all_data():
-    """Fetch product data from Supabase with batching."""
-    all_rows = []
-    batch_size = 1000
-    start = 0
-
-    while True:
-        print(f"📦 Fetching rows {start} to {start + batch_size - 1}...")
-        response = supabase.table('inventory_planning_view') \
-            .select('product_id, location_id, average_daily_usage, demand_variability') \
-            .range(start, start + batch_size - 1) \
-            .execute()
+    """Fetch product data from Supabase with concurrent keyset pagination."""
+    df = read_table(SOURCE, key=SOURCE_KEY, columns=SOURCE_COLUMNS)
 
-        rows = response.data
-        if not rows:
-            break
-
-        all_rows.extend(rows)
-        start += batch_size
-
-    print(f"✅ Total fetched: {len(all_rows)} rows")
-    return pd.DataFrame(all_rows)
+    print(f"✅ Total fetched: {len(df)} rows")
+    return df
 
 # === Step 2: Classify Products with K-Means and ABC Labels ===
-def classify_products(df):
-    """Apply K-Means Clustering and assign classification labels (A, B, C)."""
-    if df.empty:
-        print("⚠️ No data to classify.")
-        return df
-
-    features = df[['average_daily_usage', 'demand_variability']].fillna(0)
-
-    kmeans = KMeans(n_clusters=3, random_state=42)
-    df['cluster_id'] = kmeans.fit_predict(features)
-
-    centroids = kmeans.cluster_centers_
+def cluster_labels(centroids):
+    """Map cluster ids to A/B/C by descending centroid sum (A = highest priority)."""
     risk_scores = [np.sum(c) for c in centroids]  # higher sum = higher importance
     sorted_clusters = np.argsort(risk_scores)[::-1]  # sort high → low
 
-    label_map = ['A', 'B', 'C']  # A = highest priority
-    cluster_to_label = {cluster_id: label_map[idx] for idx, cluster_id in enumerate(sorted_clusters)}
-    df['classification_label'] = df['cluster_id'].map(cluster_to_label)
+    label_map = ['A', 'B', 'C']
+    return {cluster_id: label_map[idx] for idx, cluster_id in enumerate(sorted_clusters)}
 
+def annotate_labels(df):
+    """Derive the categorical columns from ``classification_label`` and the features."""
     df['lead_time_category'] = 'Normal'  # placeholder if no real lead time category
     df['variability_level'] = pd.cut(df['demand_variability'],
                                      bins=[-1, 0.3, 0.6, float('inf')],
@@ -66,47 +46,253 @@ def classify_products(df):
         'B': 'Medium',
         'C': 'Low'
     })
+    return df
+
+def classify_products(df):
+    """Apply K-Means Clustering and assign classification labels (A, B, C)."""
+    if df.empty:
+        print("⚠️ No data to classify.")
+        return df
+
+    features = df[FEATURES].fillna(0)
+
+    kmeans = KMeans(n_clusters=3, random_state=42)
+    df['cluster_id'] = kmeans.fit_predict(features)
+    df['classification_label'] = df['cluster_id'].map(cluster_labels(kmeans.cluster_centers_))
+
+    annotate_labels(df)
     df['score'] = df['average_daily_usage'].rank(ascending=False).astype(int)
 
     return df
 
+# === Step 2b: Streaming classification with MiniBatchKMeans ===
+def iter_planning_batches(batch_size=None):
+    """Stream ``inventory_planning_view`` in batches of ``batch_size`` rows (the last may be shorter).
+
+    Pages are read at the reader's ``PAGE_SIZE``, which the server honours,
+    and re-chunked here into ``batch_size`` frames.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    pending, rows = [], 0
+    for page in iter_batches(SOURCE, key=SOURCE_KEY, columns=SOURCE_COLUMNS):
+        pending.append(page)
+        rows += len(page)
+        while rows >= batch_size:
+            frame = pd.concat(pending, ignore_index=True)
+            yield frame.iloc[:batch_size]
+            rest = frame.iloc[batch_size:].reset_index(drop=True)
+            pending, rows = [rest], len(rest)
+    if rows:
+        yield pd.concat(pending, ignore_index=True)
+
+def source_row_count():
+    """Exact row count of ``inventory_planning_view`` (``None`` when it cannot be read)."""
+    try:
+        return supabase.table(SOURCE).select(SOURCE_KEY[0], count='exact', head=True).execute().count
+    except Exception as e:
+        print(f"⚠️ Could not count {SOURCE}: {e}")
+        return None
+
+def descending_rank(sorted_values, values):
+    """``Series.rank(ascending=False)`` (average ties) of ``values`` within ``sorted_values``."""
+    left = np.searchsorted(sorted_values, values, side='left')
+    right = np.searchsorted(sorted_values, values, side='right')
+    greater = len(sorted_values) - right
+    return greater + (right - left + 1) / 2
+
+def train_streaming_model(batches, n_clusters=3, batch_size=None):
+    """Train MiniBatchKMeans with ``partial_fit`` over ``batches``.
+
+    Returns ``(model, sorted_adu)``; the sorted ADU column (one float per row)
+    is all that is kept of the data, for the global ``score`` rank.
+    """
+    model = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=batch_size or BATCH_SIZE, n_init=3)
+    adu_parts = []
+    pending = None
+    for batch in batches:
+        features = batch[FEATURES].fillna(0).to_numpy(dtype=float)
+        adu_parts.append(batch['average_daily_usage'].dropna().to_numpy(dtype=float))
+        # partial_fit needs at least n_clusters samples per call
+        pending = features if pending is None else np.vstack([pending, features])
+        if len(pending) >= n_clusters:
+            model.partial_fit(pending)
+            pending = None
+    if not hasattr(model, 'cluster_centers_'):
+        return None, np.empty(0)
+    if pending is not None:
+        model.partial_fit(pending)
+    return model, np.sort(np.concatenate(adu_parts)) if adu_parts else np.empty(0)
+
+def classify_batch(batch, model, sorted_adu):
+    """Label one batch with a trained streaming model."""
+    df = batch.copy()
+    df['cluster_id'] = model.predict(df[FEATURES].fillna(0).to_numpy(dtype=float))
+    df['classification_label'] = df['cluster_id'].map(cluster_labels(model.cluster_centers_))
+    annotate_labels(df)
+    df['score'] = descending_rank(sorted_adu, df['average_daily_usage'].to_numpy(dtype=float)).astype(int)
+    return df
+
+def classify_products_streaming(batch_size=None):
+    """Two streaming passes over the view: train, then yield labelled batches."""
+    model, sorted_adu = train_streaming_model(iter_planning_batches(batch_size), batch_size=batch_size)
+    if model is None:
+        print("⚠️ No data to classify.")
+        return
+    for batch in iter_planning_batches(batch_size):
+        yield classify_batch(batch, model, sorted_adu)
+
+# === Step 2c: Label with the persisted model ===
+def classify_with_model(df, model):
+    """Label rows by nearest centroid of a saved :class:`ClassificationModel`."""
+    if df.empty:
+        return df
+    assigned = model.assign(df[FEATURES].fillna(0).to_numpy(dtype=float))
+    df['cluster_id'] = assigned['cluster_id']
+    df['classification_label'] = assigned['classification_label']
+    annotate_labels(df)
+    df['score'] = df['average_daily_usage'].rank(ascending=False).astype(int)
+    return df
+
+def current_model(features, retrain=False, model_dir=None):
+    """Latest saved model, retrained (as a new version) when forced, due or drifted."""
+    model_dir = model_dir or MODEL_DIR
+    model = None if retrain else load_latest(model_dir)
+    if retrain:
+        reason = "retrain requested"
+    elif model is None:
+        reason = "no saved model"
+    else:
+        reason = model.needs_retrain(features)
+    if reason is None:
+        print(f"♻️ Reusing classification model v{model.version}")
+        return model
+    model = ClassificationModel.fit(features, version=latest_version(model_dir) + 1)
+    path = model.save(model_dir)
+    print(f"🧠 Trained classification model v{model.version} ({reason}) → {path}")
+    return model
+
 # === Step 3: Store Results to Supabase ===
+CLASSIFICATION_COLUMNS = ['product_id', 'location_id', 'classification_label',
+                          'lead_time_category', 'variability_level', 'criticality', 'score']
+
+def load_stored_classification(columns=None):
+    """Current ``product_classification`` rows (empty when the table cannot be read)."""
+    try:
+        return read_table('product_classification', key=SOURCE_KEY,
+                          columns=', '.join(columns or CLASSIFICATION_COLUMNS))
+    except Exception as e:
+        print(f"⚠️ Could not read stored classification: {e}")
+        return pd.DataFrame(columns=columns or CLASSIFICATION_COLUMNS)
+
+def _normalise(frame):
+    frame = frame[CLASSIFICATION_COLUMNS].astype(object)
+    # Nullable integers: a NULL score must not turn the others into '1.0'
+    frame['score'] = pd.to_numeric(frame['score'], errors='coerce').round().astype('Int64').astype(object)
+    # Every null as the same string, so NULL == NULL (NaN and pd.NA never compare equal)
+    return frame.mask(frame.isna(), 'None').astype(str).set_index(list(SOURCE_KEY))
+
+def classification_diff(df, stored):
+    """Rows of ``df`` that are new or differ from ``stored``, and the stored keys no longer in ``df``."""
+    if stored.empty:
+        return df[CLASSIFICATION_COLUMNS], []
+    new, old = _normalise(df), _normalise(stored)
+    old = old[~old.index.duplicated(keep='last')]
+    common = new.index.intersection(old.index)
+    changed = new.index.difference(old.index).append(
+        common[(new.loc[common] != old.loc[common]).any(axis=1).to_numpy()])
+    rows = df.set_index(list(SOURCE_KEY)).loc[changed].reset_index()
+    return rows[CLASSIFICATION_COLUMNS], list(old.index.difference(new.index))
+
+def delete_classification(keys):
+    """Delete ``(product_id, location_id)`` rows, chunked per location."""
+    by_location = {}
+    for product_id, location_id in keys:
+        by_location.setdefault(location_id, []).append(product_id)
+    for location_id, products in by_location.items():
+        for start in range(0, len(products), UPSERT_CHUNK_SIZE):
+            (supabase.table('product_classification').delete()
+             .eq('location_id', location_id).in_('product_id', products[start:start + UPSERT_CHUNK_SIZE]).execute())
+
 def store_classification(df):
-    """Store classification results to Supabase."""
+    """Write only the classification rows that changed, then drop stale ones.
+
+    Rows are upserted in place, so readers never see an empty table mid-run.
+    """
     if df.empty:
         print("⚠️ No classification data to store.")
-        return
+        return None
 
     try:
-        # Optional: clear old records
-        supabase.table('product_classification').delete().neq('product_id', '').execute()
-        print("🗑️ Old classification records cleared.")
-
-        records = df[['product_id', 'location_id', 'classification_label',
-                      'lead_time_category', 'variability_level', 'criticality', 'score']].to_dict(orient='records')
+        changed, stale = classification_diff(df, load_stored_classification())
+        stats = bulk_upsert('product_classification', changed, on_conflict='product_id,location_id')
+        delete_classification(stale)
 
-        for record in records:
-            supabase.table('product_classification').upsert(record).execute()
-
-        print("✅ Classification data stored successfully.")
+        print(f"✅ Classification data stored successfully: {stats['rows_written']} changed rows of {len(df)}, "
+              f"{len(stale)} stale rows removed, in {stats['seconds']}s ({stats['rows_per_second']} rows/s).")
+        return {'changed': stats['rows_written'], 'unchanged': len(df) - len(changed), 'removed': len(stale)}
     except Exception as e:
         print("❌ Failed to store classification:", str(e))
+        return None
 
 # === Step 4: Main ===
-def main():
+def run_streaming(batch_size=None):
+    print("🚀 Running streaming MiniBatch K-Means classification (ABC)...")
+    stored = 0
+    seen = set()
+    for batch in classify_products_streaming(batch_size):
+        stats = bulk_upsert('product_classification', batch[CLASSIFICATION_COLUMNS], on_conflict='product_id,location_id')
+        seen.update(zip(batch['product_id'], batch['location_id']))
+        stored += stats['rows_written']
+    # Only a scan that saw every source row may treat unseen stored rows as stale
+    expected = source_row_count()
+    if expected is None or len(seen) < expected:
+        print(f"⚠️ Scanned {len(seen)} of {expected if expected is not None else 'unknown'} source rows; "
+              "keeping stored rows that were not seen.")
+        print(f"🎯 Classification completed: {stored} rows.")
+        return
+    existing = load_stored_classification(list(SOURCE_KEY))
+    stale = [key for key in zip(existing['product_id'], existing['location_id']) if key not in seen]
+    delete_classification(stale)
+    print(f"🎯 Classification completed successfully: {stored} rows, {len(stale)} stale rows removed.")
+
+def run_incremental(retrain=False, model_dir=None):
+    """Label every row with the persisted model and write the rows that changed."""
     print("🔄 Fetching product planning data...")
     df = fetch_all_data()
     if df.empty:
         print("⚠️ No data fetched, exiting.")
-        return
+        return None
+
+    model = current_model(df[FEATURES].fillna(0).to_numpy(dtype=float), retrain, model_dir)
+    classified_df = classify_with_model(df, model)
+
+    print("💾 Storing changed classification rows to Supabase...")
+    stats = store_classification(classified_df)
+    print("🎯 Classification completed successfully.")
+    return stats
+
+def main(mode=None, retrain=False):
+    mode = mode or MODE
+    if mode == 'streaming':
+        run_streaming()
+        return None
+    if mode == 'incremental':
+        return run_incremental(retrain)
+    if mode == 'abc_xyz':
+        print("🚀 Running ABC-XYZ segmentation...")
+        return store_classification(classify_abc_xyz())
+
+    print("🔄 Fetching product planning data...")
+    df = fetch_all_data()
+    if df.empty:
+        print("⚠️ No data fetched, exiting.")
+        return None
 
     print("🚀 Running K-Means classification (ABC)...")
     classified_df = classify_products(df)
 
     print("💾 Storing classification results to Supabase...")
-    store_classification(classified_df)
-
-    print("🎯 Classification completed successfully.")
+    return store_classification(classified_df)
 
 if __name__ == "__main__":
     main()
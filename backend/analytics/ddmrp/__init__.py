@@ -4,7 +4,13 @@ This module imports commonly used functions for easy access.
 """
 
 from .decoupled_lead_time import calculate_decoupled_lead_time  # noqa: F401
-from .buffer_profiles import calculate_buffer_profiles  # noqa: F401
+from .adu_engine import RollingADUEngine, refresh_adu  # noqa: F401
+from .dlt_graph import DLTGraph, calculate_decoupled_lead_times  # noqa: F401
+from .buffer_profiles import calculate_buffer_profiles, calculate_buffer_profiles_batch  # noqa: F401
 from .dynamic_buffer_adjustments import adjust_buffer_levels  # noqa: F401
+from .adjustment_calendar import AdjustmentCalendar, calculate_buffer_zone_plan  # noqa: F401
 from .net_flow_calculation import calculate_net_flow  # noqa: F401
+from .net_flow_batch import calculate_net_flow_batch  # noqa: F401
+from .net_flow_incremental import IncrementalNetFlow, record_changes, refresh_net_flow  # noqa: F401
+from .bullwhip_windows import BullwhipPrefixSums, calculate_bullwhip_windows  # noqa: F401
 from .alerts import generate_alerts  # noqa: F401
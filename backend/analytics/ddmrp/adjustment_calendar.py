@@ -0,0 +1,287 @@
+"""
+Time-phased buffer zones from planned adjustment calendars.
+
+DDMRP planned adjustments are date ranges per product-location:
+
+* **DAF** (``demand_adjustment_factor``) scales ADU, e.g. for promotions
+  and seasonality;
+* **ZAF** (``zone_adjustment_factor``) scales the variability factor and
+  so the red and yellow zones;
+* **LTAF** (``lead_time_adjustment_factor``) scales the decoupled lead time.
+
+A calendar row may target a segment instead of one pair by using ``'*'`` as
+its ``product_id`` (every product at the location) or ``location_id``
+(the product everywhere).  Where ranges overlap, a pair-specific row beats
+a segment row and, at equal specificity, the latest ``start_date`` wins
+(as in the database recalculation).  ``ramp_days`` phases a factor in
+linearly from 1.0 over the first days of its range.
+
+:class:`AdjustmentCalendar` turns each calendar into an ``(items x days)``
+factor grid with one scatter of all range cells, and
+:func:`plan_buffer_zones` applies the zone formulas of
+``recalculate_buffers_with_adjustments`` (migration ``20251004231918``) to
+the whole grid at once, including its ``CEIL`` to the rounding multiple
+(``inventory_ddmrp_buffers_view`` rounds to the nearest unit instead).
+:func:`calculate_buffer_zone_plan` persists the result to
+``buffer_zone_plan`` and writes only cells whose zones changed since the
+last run.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.analytics.ddmrp.net_flow_batch import BUFFER_SOURCE, PAIR
+from backend.supabase.bulk import bulk_upsert, read_table
+
+PLAN_TABLE = "buffer_zone_plan"
+PLAN_HORIZON_DAYS = int(os.getenv("BUFFER_PLAN_HORIZON_DAYS", "90"))
+# Zones closer than this to the stored plan are not rewritten
+PLAN_TOLERANCE = float(os.getenv("BUFFER_PLAN_TOLERANCE", "1e-6"))
+WILDCARD = "*"
+
+FACTOR_TABLES = {
+    "daf": "demand_adjustment_factor",
+    "zaf": "zone_adjustment_factor",
+    "ltaf": "lead_time_adjustment_factor",
+}
+# Primary key of each factor table, the unique key the paged reads walk on
+FACTOR_KEYS = {
+    "daf": ("product_id", "location_id", "start_date", "end_date"),
+    "zaf": ("product_id", "location_id", "start_date"),
+    "ltaf": ("product_id", "location_id", "start_date"),
+}
+ZONES = ["red_zone", "yellow_zone", "green_zone"]
+
+
+def _day_offsets(values: pd.Series, start: date) -> np.ndarray:
+    days = pd.to_datetime(values).values.astype("datetime64[D]").astype(np.int64)
+    return days - (start.toordinal() - date(1970, 1, 1).toordinal())
+
+
+class AdjustmentCalendar:
+    """Planned DAF/ZAF/LTAF ranges, expanded to factor grids on demand."""
+
+    def __init__(self, calendars: Optional[Dict[str, pd.DataFrame]] = None):
+        """
+        Args:
+            calendars: Frames keyed by factor name (``daf``, ``zaf``,
+                ``ltaf``) with ``product_id``, ``location_id``,
+                ``start_date``, ``end_date``, the factor column and
+                optionally ``ramp_days``.  Missing factors are neutral.
+        """
+        self.calendars = {factor: (calendars or {}).get(factor, pd.DataFrame()) for factor in FACTOR_TABLES}
+
+    @classmethod
+    def load(cls, start: date, horizon_days: int = PLAN_HORIZON_DAYS) -> "AdjustmentCalendar":
+        """Read the ranges that overlap ``[start, start + horizon_days)``."""
+        end = start + timedelta(days=horizon_days - 1)
+        filters = [("end_date", "gte", start.isoformat()), ("start_date", "lte", end.isoformat())]
+        calendars = {}
+        for factor, table in FACTOR_TABLES.items():
+            calendars[factor] = read_table(table, key=FACTOR_KEYS[factor], columns="*", filters=filters)
+        return cls(calendars)
+
+    def _match(self, pairs: pd.MultiIndex, calendar: pd.DataFrame):
+        """``(calendar row, pair position, specificity)`` for every row/pair match."""
+        products = calendar["product_id"].astype(str).to_numpy()
+        locations = calendar["location_id"].astype(str).to_numpy()
+        exact = (products != WILDCARD) & (locations != WILDCARD)
+
+        rows = [np.flatnonzero(exact)]
+        codes = [pairs.get_indexer(pd.MultiIndex.from_arrays([products[exact], locations[exact]]))]
+        specificity = [np.full(len(rows[0]), 2)]
+
+        # Segment rows are few; expand each to the positions of its pairs
+        by_product = pd.Series(np.arange(len(pairs))).groupby(pairs.get_level_values(0)).indices
+        by_location = pd.Series(np.arange(len(pairs))).groupby(pairs.get_level_values(1)).indices
+        everything = np.arange(len(pairs))
+        for row in np.flatnonzero(~exact):
+            if products[row] == WILDCARD and locations[row] == WILDCARD:
+                positions, rank = everything, 0
+            elif products[row] == WILDCARD:
+                positions, rank = by_location.get(locations[row], everything[:0]), 1
+            else:
+                positions, rank = by_product.get(products[row], everything[:0]), 1
+            rows.append(np.full(len(positions), row))
+            codes.append(np.asarray(positions))
+            specificity.append(np.full(len(positions), rank))
+
+        rows, codes, specificity = (np.concatenate(parts).astype(np.int64) for parts in (rows, codes, specificity))
+        keep = codes >= 0
+        return rows[keep], codes[keep], specificity[keep]
+
+    def factor_grid(self, factor: str, pairs: pd.MultiIndex, start: date, horizon_days: int) -> np.ndarray:
+        """``(len(pairs), horizon_days)`` grid of one factor (1.0 where no range applies)."""
+        grid = np.ones((len(pairs), horizon_days))
+        calendar = self.calendars[factor]
+        if calendar.empty or not len(pairs):
+            return grid
+
+        rows, codes, specificity = self._match(pairs, calendar)
+        first = _day_offsets(calendar["start_date"], start)[rows]
+        last = _day_offsets(calendar["end_date"], start)[rows]
+        lo, hi = np.maximum(first, 0), np.minimum(last, horizon_days - 1)
+        keep = lo <= hi
+        rows, codes, specificity, first, lo, hi = (a[keep] for a in (rows, codes, specificity, first, lo, hi))
+        if not len(rows):
+            return grid
+
+        # One cell per (range, day): repeat each range over its clipped length
+        lengths = hi - lo + 1
+        owner = np.repeat(np.arange(len(rows)), lengths)
+        days = lo[owner] + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+        values = calendar[factor].astype(float).to_numpy()[rows][owner]
+        ramp = (
+            calendar["ramp_days"].fillna(0).astype(float).to_numpy()[rows][owner]
+            if "ramp_days" in calendar else np.zeros(len(owner))
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            phase = np.where(ramp > 0, np.minimum(1.0, (days - first[owner] + 1) / ramp), 1.0)
+        values = 1.0 + (values - 1.0) * phase
+
+        # Overlaps: the most specific, then the latest-starting range wins
+        cells = codes[owner] * horizon_days + days
+        order = np.lexsort((first[owner], specificity[owner], cells))
+        cells = cells[order]
+        winner = np.r_[cells[1:] != cells[:-1], True]
+        grid.ravel()[cells[winner]] = values[order][winner]
+        return grid
+
+
+def plan_buffer_zones(
+    base: pd.DataFrame,
+    calendar: AdjustmentCalendar,
+    start: date,
+    horizon_days: int = PLAN_HORIZON_DAYS,
+) -> Dict[str, Any]:
+    """Time-phased zones of every pair in ``base`` over the horizon.
+
+    Follows ``recalculate_buffers_with_adjustments``: DLT rounded and at
+    least one day, red = max(ADU x DLT x LT factor x variability x ZAF, MOQ),
+    yellow = red, green = ADU x order cycle x LT factor, red and green
+    rounded up to the rounding multiple.
+
+    Args:
+        base: One row per pair with ``product_id``, ``location_id``, ``adu``,
+            ``dlt``, ``lt_factor``, ``variability_factor``,
+            ``order_cycle_days``, ``moq`` and ``rounding_multiple``.
+        calendar: Planned adjustments.
+        start: First planned day.
+        horizon_days: Number of days.
+
+    Returns:
+        Dictionary with the ``pairs`` index, the ``dates`` and
+        ``(pairs x days)`` arrays for ``daf``, ``zaf``, ``ltaf`` and each zone.
+    """
+    base = base.drop_duplicates(PAIR)
+    pairs = pd.MultiIndex.from_frame(base[PAIR].astype(str))
+
+    def column(name: str, default: float) -> np.ndarray:
+        values = base[name].astype(float).fillna(default) if name in base else pd.Series(default, index=base.index)
+        return values.to_numpy()[:, None]
+
+    factors = {factor: calendar.factor_grid(factor, pairs, start, horizon_days) for factor in FACTOR_TABLES}
+    adu = column("adu", 0.0) * factors["daf"]
+    dlt = np.maximum(1.0, np.floor(column("dlt", 7.0) * factors["ltaf"] + 0.5))
+    lt_factor = column("lt_factor", 1.0)
+
+    red = np.maximum(adu * dlt * lt_factor * column("variability_factor", 0.5) * factors["zaf"], column("moq", 0.0))
+    green = adu * column("order_cycle_days", 7.0) * lt_factor
+    rounding = column("rounding_multiple", 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        red = np.where(rounding > 0, np.ceil(red / rounding) * rounding, red)
+        green = np.where(rounding > 0, np.ceil(green / rounding) * rounding, green)
+
+    return {
+        "pairs": pairs,
+        "dates": pd.date_range(start, periods=horizon_days, freq="D").date,
+        **factors,
+        "red_zone": red,
+        "yellow_zone": red.copy(),
+        "green_zone": green,
+    }
+
+
+def plan_frame(plan: Dict[str, Any]) -> pd.DataFrame:
+    """Long ``(product_id, location_id, plan_date)`` frame of a zone plan."""
+    pairs, dates = plan["pairs"], plan["dates"]
+    n, horizon = len(pairs), len(dates)
+    frame = pd.DataFrame({
+        "product_id": np.repeat(pairs.get_level_values(0).to_numpy(), horizon),
+        "location_id": np.repeat(pairs.get_level_values(1).to_numpy(), horizon),
+        "plan_date": np.tile(np.asarray([d.isoformat() for d in dates], dtype=object), n),
+    })
+    for name in list(FACTOR_TABLES) + ZONES:
+        frame[name] = plan[name].ravel()
+    return frame
+
+
+def changed_rows(frame: pd.DataFrame, stored: pd.DataFrame, tolerance: float = PLAN_TOLERANCE) -> pd.DataFrame:
+    """Rows of ``frame`` that are missing from or differ from ``stored``."""
+    if stored.empty:
+        return frame
+    key = PAIR + ["plan_date"]
+    stored = stored.assign(plan_date=pd.to_datetime(stored["plan_date"]).dt.date.astype(str))
+    previous = stored.set_index(key).reindex(pd.MultiIndex.from_frame(frame[key].astype(str)))
+    current = frame[ZONES].to_numpy(dtype=float)
+    before = previous[ZONES].to_numpy(dtype=float)
+    differs = ~(np.abs(current - before) <= tolerance).all(axis=1)
+    return frame[differs]
+
+
+def load_plan_base(product_ids: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Per-pair ADU, DLT and buffer profile parameters from the buffer source."""
+    return read_table(
+        BUFFER_SOURCE, key=tuple(PAIR),
+        columns="product_id, location_id, adu, dlt, lt_factor, variability_factor, order_cycle_days, moq, rounding_multiple",
+        filters=[("product_id", "in_", list(product_ids))] if product_ids is not None else None,
+    )
+
+
+def calculate_buffer_zone_plan(
+    start: Optional[date] = None,
+    horizon_days: int = PLAN_HORIZON_DAYS,
+    persist: bool = True,
+) -> Dict[str, Any]:
+    """Plan the zones of every buffered pair and persist the changed cells.
+
+    Returns:
+        Dictionary with the number of ``pairs``, ``horizon_days``,
+        ``rows_changed`` and the bulk writer's ``write_stats``, plus the
+        ``plan`` arrays.
+    """
+    start = start or date.today()
+    base = load_plan_base()
+    if base.empty:
+        return {"pairs": 0, "horizon_days": horizon_days, "rows_changed": 0, "write_stats": None, "plan": None}
+
+    plan = plan_buffer_zones(base, AdjustmentCalendar.load(start, horizon_days), start, horizon_days)
+    rows_changed, write_stats = 0, None
+    if persist:
+        end = start + timedelta(days=horizon_days - 1)
+        try:
+            stored = read_table(
+                PLAN_TABLE, key=("product_id", "location_id", "plan_date"),
+                columns="product_id, location_id, plan_date, red_zone, yellow_zone, green_zone",
+                filters=[("plan_date", "gte", start.isoformat()), ("plan_date", "lte", end.isoformat())],
+            )
+            changed = changed_rows(plan_frame(plan), stored)
+            rows_changed = len(changed)
+            if rows_changed:
+                changed = changed.assign(calculated_at=datetime.utcnow().isoformat())
+                write_stats = bulk_upsert(PLAN_TABLE, changed, on_conflict="product_id,location_id,plan_date")
+        except Exception as e:
+            print(f"Error saving buffer zone plan: {e}")
+
+    return {
+        "pairs": len(plan["pairs"]),
+        "horizon_days": horizon_days,
+        "rows_changed": rows_changed,
+        "write_stats": write_stats,
+        "plan": plan,
+    }
@@ -0,0 +1,444 @@
+"""
+Rolling Average Daily Usage (ADU) engine.
+
+Computes past-looking, forward-looking and blended ADU for every
+product-location pair at once and keeps per-pair state so that each new
+day of sales costs O(1) per pair instead of a rescan of the history:
+
+* **Past ADU** – sales over the last ``past_window`` calendar days divided by
+  the number of days in the window (or the days since the pair's first
+  sale, for pairs younger than the window).  Each pair keeps a ring buffer
+  of its last ``past_window`` daily quantities and their running sum;
+  advancing one day subtracts the slot that drops out and adds the new one.
+* **Forward ADU** – forecast quantity over the next ``forward_window`` days
+  divided by ``forward_window``, read from a per-pair cumulative-sum array
+  of the daily forecast, so moving the planning date is two lookups.
+* **Blended ADU** – ``blend_weight * past + (1 - blend_weight) * forward``;
+  pairs without a forecast fall back to past ADU.
+
+The engine state can be saved to and loaded from an ``.npz`` file
+(``ADU_STATE_PATH``), so the daily job in :func:`refresh_adu` only reads
+recent sales.  Sales can arrive late or backdated, so each run re-reads the
+last ``ADU_LOOKBACK_DAYS`` days before the state date and applies only the
+``sales_id`` values the state has not seen yet (the ids of that window are
+kept in the state).  Rows backdated further, edited or deleted are picked up
+by a full rebuild, done automatically once the last one is
+``ADU_FULL_REBUILD_DAYS`` old.
+
+:meth:`RollingADUEngine.lookup` returns ADU arrays aligned with a list of
+pairs, and :func:`item_adu` the ADU of buffered items from the saved state;
+the batch buffer-profile endpoint uses it for rows sent without an
+``average_daily_demand`` (:func:`calculate_buffer_profiles_batch`).
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.supabase import sales_snapshot
+from backend.supabase.bulk import read_table
+
+PAST_WINDOW = int(os.getenv("ADU_PAST_WINDOW", "90"))
+FORWARD_WINDOW = int(os.getenv("ADU_FORWARD_WINDOW", "90"))
+BLEND_WEIGHT = float(os.getenv("ADU_BLEND_WEIGHT", "0.5"))
+STATE_PATH = os.getenv("ADU_STATE_PATH", "")
+LOOKBACK_DAYS = int(os.getenv("ADU_LOOKBACK_DAYS", "3"))
+FULL_REBUILD_DAYS = int(os.getenv("ADU_FULL_REBUILD_DAYS", "7"))
+
+Pair = Tuple[str, str]
+
+
+def _day(value) -> date:
+    return value if isinstance(value, date) else pd.Timestamp(value).date()
+
+
+def _day_numbers(values: pd.Series) -> np.ndarray:
+    """Convert a date column to proleptic ordinals (``date.toordinal``)."""
+    days = pd.to_datetime(values).values.astype("datetime64[D]").astype(np.int64)
+    return days + date(1970, 1, 1).toordinal()
+
+
+def rolling_past_adu(
+    sales: pd.DataFrame,
+    window: int = PAST_WINDOW,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Tuple[List[Pair], pd.DatetimeIndex, np.ndarray]:
+    """Past-looking ADU of every pair on every day of ``[start, end]``.
+
+    Builds a pairs x days grid of daily quantities, takes one cumulative sum
+    along the day axis and differences it ``window`` columns apart.  Memory
+    is ``pairs * (days + window)`` floats, so use it for backfills and
+    analysis; the incremental engine only keeps ``window`` days per pair.
+
+    Returns:
+        ``(pairs, dates, adu)`` where ``adu[i, j]`` is the ADU of ``pairs[i]``
+        on ``dates[j]``.
+    """
+    days = _day_numbers(sales["sales_date"])
+    codes, uniques = pd.MultiIndex.from_frame(sales[["product_id", "location_id"]]).factorize()
+    end_day = (end or date.fromordinal(int(days.max()))).toordinal()
+    start_day = (start or date.fromordinal(int(days.min()))).toordinal()
+    first_day = start_day - window
+
+    mask = (days > first_day) & (days <= end_day)
+    grid = np.zeros((len(uniques), end_day - first_day + 1))
+    np.add.at(grid, (codes[mask], days[mask] - first_day), sales["quantity_sold"].to_numpy(dtype=float)[mask])
+    cumulative = np.cumsum(grid, axis=1)
+    window_sum = cumulative[:, window:] - cumulative[:, :-window]
+
+    # Pairs younger than the window are averaged over the days since their first sale
+    first_sale = np.full(len(uniques), np.iinfo(np.int64).max)
+    np.minimum.at(first_sale, codes, days)
+    day_axis = np.arange(start_day, end_day + 1)
+    age = np.clip(day_axis[None, :] - first_sale[:, None] + 1, 0, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        adu = np.where(age > 0, window_sum / np.maximum(age, 1), 0.0)
+
+    dates = pd.date_range(date.fromordinal(start_day), date.fromordinal(end_day), freq="D")
+    return list(uniques), dates, adu
+
+
+class RollingADUEngine:
+    """Incrementally maintained past, forward and blended ADU for many pairs."""
+
+    def __init__(
+        self,
+        past_window: int = PAST_WINDOW,
+        forward_window: int = FORWARD_WINDOW,
+        blend_weight: float = BLEND_WEIGHT,
+    ):
+        self.past_window = past_window
+        self.forward_window = forward_window
+        self.blend_weight = blend_weight
+        self.as_of: Optional[date] = None
+        self.pairs: List[Pair] = []
+        self._index: Dict[Pair, int] = {}
+        self._ring = np.zeros((0, past_window))
+        self._sum = np.zeros(0)
+        self._age = np.zeros(0, dtype=np.int64)
+        self._forecast_cumsum = np.zeros((0, 1))
+        self._forecast_start = 0
+        # ``sales_id -> day`` of the applied rows inside the lookback window
+        self.applied: Dict[str, int] = {}
+        self.built_on: Optional[date] = None
+
+    # -- pair bookkeeping ---------------------------------------------------
+
+    def _rows_for(self, pairs: Iterable[Pair]) -> np.ndarray:
+        """Row index of each pair, appending state rows for unseen pairs."""
+        rows = []
+        new_pairs = []
+        for pair in pairs:
+            row = self._index.get(pair)
+            if row is None:
+                row = self._index[pair] = len(self.pairs) + len(new_pairs)
+                new_pairs.append(pair)
+            rows.append(row)
+        if new_pairs:
+            n = len(new_pairs)
+            self.pairs.extend(new_pairs)
+            self._ring = np.vstack([self._ring, np.zeros((n, self.past_window))])
+            self._sum = np.concatenate([self._sum, np.zeros(n)])
+            self._age = np.concatenate([self._age, np.zeros(n, dtype=np.int64)])
+            self._forecast_cumsum = np.vstack(
+                [self._forecast_cumsum, np.full((n, self._forecast_cumsum.shape[1]), np.nan)]
+            )
+        return np.asarray(rows, dtype=np.int64)
+
+    @staticmethod
+    def _pairs_of(frame: pd.DataFrame) -> List[Pair]:
+        return list(zip(frame["product_id"].astype(str), frame["location_id"].astype(str)))
+
+    # -- past ADU -----------------------------------------------------------
+
+    def build(self, sales: pd.DataFrame, as_of: Optional[date] = None) -> "RollingADUEngine":
+        """Initialise the state from a sales history in one vectorised pass.
+
+        Args:
+            sales: Rows with ``product_id``, ``location_id``, ``sales_date``
+                and ``quantity_sold``.
+            as_of: Last day covered by the history (default: latest ``sales_date``).
+        """
+        if sales.empty:
+            self.as_of = _day(as_of) if as_of else self.as_of
+            return self
+        days = _day_numbers(sales["sales_date"])
+        as_of_day = _day(as_of).toordinal() if as_of else int(days.max())
+        rows = self._rows_for(self._pairs_of(sales))
+
+        first_sale = np.full(len(self.pairs), np.iinfo(np.int64).max)
+        np.minimum.at(first_sale, rows, days)
+        seen = first_sale <= as_of_day
+        self._age = np.where(seen, np.clip(as_of_day - first_sale + 1, 0, self.past_window), 0)
+
+        mask = (days > as_of_day - self.past_window) & (days <= as_of_day)
+        self._ring[:] = 0.0
+        np.add.at(
+            self._ring,
+            (rows[mask], days[mask] % self.past_window),
+            sales["quantity_sold"].to_numpy(dtype=float)[mask],
+        )
+        self._sum = self._ring.sum(axis=1)
+        self.as_of = date.fromordinal(as_of_day)
+        return self
+
+    def advance(self, day: date) -> None:
+        """Roll every pair forward to ``day``; days without sales count as zero."""
+        day_number = _day(day).toordinal()
+        if self.as_of is None:
+            self.as_of = date.fromordinal(day_number)
+            return
+        gap = day_number - self.as_of.toordinal()
+        if gap <= 0:
+            return
+        active = self._age > 0
+        if gap >= self.past_window:
+            self._ring[:] = 0.0
+            self._sum[:] = 0.0
+        else:
+            for number in range(self.as_of.toordinal() + 1, day_number + 1):
+                slot = number % self.past_window
+                self._sum -= self._ring[:, slot]
+                self._ring[:, slot] = 0.0
+        self._age = np.where(active, np.minimum(self._age + gap, self.past_window), 0)
+        self.as_of = date.fromordinal(day_number)
+
+    def add_sales(self, sales: pd.DataFrame) -> int:
+        """Apply new (or late) sales rows to the state.
+
+        The engine first advances to the latest ``sales_date``; each row then
+        updates its pair's ring slot and running sum in O(1).  Rows older than
+        the past window are ignored.
+
+        Returns:
+            Number of rows applied.
+        """
+        if sales.empty:
+            return 0
+        days = _day_numbers(sales["sales_date"])
+        self.advance(date.fromordinal(int(days.max())))
+        as_of_day = self.as_of.toordinal()
+
+        keep = days > as_of_day - self.past_window
+        rows = self._rows_for(self._pairs_of(sales[keep]))
+        days = days[keep]
+        quantities = sales["quantity_sold"].to_numpy(dtype=float)[keep]
+        np.add.at(self._ring, (rows, days % self.past_window), quantities)
+        np.add.at(self._sum, rows, quantities)
+
+        # A pair's age counts from its earliest sale inside the window
+        age_from_sale = as_of_day - days + 1
+        np.maximum.at(self._age, rows, age_from_sale)
+        return int(keep.sum())
+
+    def unseen(self, sales: pd.DataFrame) -> pd.DataFrame:
+        """Rows of ``sales`` whose ``sales_id`` has not been applied yet."""
+        if sales.empty:
+            return sales
+        return sales[~sales["sales_id"].astype(str).isin(self.applied)]
+
+    def remember(self, sales: pd.DataFrame, lookback_days: int = LOOKBACK_DAYS) -> None:
+        """Record the ``sales_id`` of applied rows inside the lookback window and forget older ones."""
+        if self.as_of is None:
+            return
+        cutoff = self.as_of.toordinal() - lookback_days
+        if not sales.empty and "sales_id" in sales:
+            days = _day_numbers(sales["sales_date"])
+            recent = days > cutoff
+            self.applied.update(zip(sales["sales_id"].astype(str)[recent], days[recent].tolist()))
+        self.applied = {sales_id: day for sales_id, day in self.applied.items() if day > cutoff}
+
+    def past_adu(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self._age > 0, self._sum / np.maximum(self._age, 1), 0.0)
+
+    # -- forward ADU --------------------------------------------------------
+
+    def set_forecasts(self, forecasts: pd.DataFrame) -> None:
+        """Load daily forecasts (``product_id``, ``location_id``, ``forecast_date``, ``forecast_qty``).
+
+        Replaces any previous forecast.  The daily quantities are stored as a
+        per-pair cumulative sum, so :meth:`forward_adu` is O(1) per pair for
+        any planning date covered by the forecast.
+        """
+        if forecasts.empty:
+            self._forecast_cumsum = np.full((len(self.pairs), 1), np.nan)
+            return
+        days = _day_numbers(forecasts["forecast_date"])
+        rows = self._rows_for(self._pairs_of(forecasts))
+        start, end = int(days.min()), int(days.max())
+        grid = np.zeros((len(self.pairs), end - start + 1))
+        np.add.at(grid, (rows, days - start), forecasts["forecast_qty"].to_numpy(dtype=float))
+
+        cumulative = np.zeros((len(self.pairs), grid.shape[1] + 1))
+        np.cumsum(grid, axis=1, out=cumulative[:, 1:])
+        has_forecast = np.zeros(len(self.pairs), dtype=bool)
+        has_forecast[rows] = True
+        cumulative[~has_forecast] = np.nan
+        self._forecast_cumsum = cumulative
+        self._forecast_start = start
+
+    def forward_adu(self, as_of: Optional[date] = None) -> np.ndarray:
+        """Forecast quantity of days ``as_of + 1 .. as_of + forward_window`` divided by the window."""
+        as_of = _day(as_of) if as_of else self.as_of
+        if as_of is None:
+            return np.full(len(self.pairs), np.nan)
+        width = self._forecast_cumsum.shape[1] - 1
+        lo = int(np.clip(as_of.toordinal() + 1 - self._forecast_start, 0, width))
+        hi = int(np.clip(as_of.toordinal() + 1 + self.forward_window - self._forecast_start, 0, width))
+        return (self._forecast_cumsum[:, hi] - self._forecast_cumsum[:, lo]) / self.forward_window
+
+    # -- results ------------------------------------------------------------
+
+    def blended_adu(self) -> np.ndarray:
+        past = self.past_adu()
+        forward = self.forward_adu()
+        return np.where(np.isnan(forward), past, self.blend_weight * past + (1.0 - self.blend_weight) * forward)
+
+    def results(self) -> pd.DataFrame:
+        """Past, forward and blended ADU of every pair as of :attr:`as_of`."""
+        return pd.DataFrame({
+            "product_id": [p for p, _ in self.pairs],
+            "location_id": [l for _, l in self.pairs],
+            "past_adu": self.past_adu(),
+            "forward_adu": self.forward_adu(),
+            "blended_adu": self.blended_adu(),
+            "as_of": self.as_of.isoformat() if self.as_of else None,
+        })
+
+    def lookup(self, pairs: Sequence[Pair], kind: str = "blended") -> np.ndarray:
+        """ADU aligned with ``pairs`` (``kind`` is ``past``, ``forward`` or ``blended``); NaN for unknown pairs."""
+        values = {"past": self.past_adu, "forward": self.forward_adu, "blended": self.blended_adu}[kind]()
+        rows = np.fromiter((self._index.get(tuple(pair), -1) for pair in pairs), dtype=np.int64, count=len(pairs))
+        return np.where(rows >= 0, values[np.maximum(rows, 0)] if len(values) else np.nan, np.nan)
+
+    # -- persistence --------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """Write the engine state to an ``.npz`` file."""
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            windows=np.array([self.past_window, self.forward_window]),
+            blend_weight=np.array(self.blend_weight),
+            as_of=np.array(self.as_of.toordinal() if self.as_of else -1),
+            product_id=np.array([p for p, _ in self.pairs], dtype=str),
+            location_id=np.array([l for _, l in self.pairs], dtype=str),
+            ring=self._ring,
+            age=self._age,
+            forecast_cumsum=self._forecast_cumsum,
+            forecast_start=np.array(self._forecast_start),
+            applied_id=np.array(list(self.applied), dtype=str),
+            applied_day=np.array(list(self.applied.values()), dtype=np.int64),
+            built_on=np.array(self.built_on.toordinal() if self.built_on else -1),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "RollingADUEngine":
+        with np.load(path) as state:
+            past_window, forward_window = (int(v) for v in state["windows"])
+            engine = cls(past_window, forward_window, float(state["blend_weight"]))
+            as_of = int(state["as_of"])
+            engine.as_of = date.fromordinal(as_of) if as_of > 0 else None
+            engine.pairs = list(zip(state["product_id"].tolist(), state["location_id"].tolist()))
+            engine._index = {pair: i for i, pair in enumerate(engine.pairs)}
+            engine._ring = state["ring"]
+            engine._sum = engine._ring.sum(axis=1)
+            engine._age = state["age"]
+            engine._forecast_cumsum = state["forecast_cumsum"]
+            engine._forecast_start = int(state["forecast_start"])
+            # States saved before the lookback have no build date and are rebuilt
+            if "built_on" in state.files:
+                engine.applied = dict(zip(state["applied_id"].tolist(), state["applied_day"].tolist()))
+                built_on = int(state["built_on"])
+                engine.built_on = date.fromordinal(built_on) if built_on > 0 else None
+        return engine
+
+
+def fetch_sales_since(after: Optional[date] = None, lookback_days: Optional[int] = None) -> pd.DataFrame:
+    """Sales rows after ``after`` (or the last ``lookback_days`` when ``after`` is ``None``)."""
+    columns = ["sales_id", "product_id", "location_id", "sales_date", "quantity_sold"]
+    start = None
+    if after is not None:
+        start = after + timedelta(days=1)
+    elif lookback_days:
+        start = date.today() - timedelta(days=lookback_days)
+    if sales_snapshot.SNAPSHOT_ENABLED:
+        sales_snapshot.sync_sales_snapshot()
+        return sales_snapshot.load_sales(columns=columns, start_date=start)
+    filters = [("sales_date", "gte", start.isoformat())] if start else None
+    return read_table("historical_sales_data", key="sales_id", columns=", ".join(columns), filters=filters)
+
+
+def full_rebuild_due(engine: RollingADUEngine, today: Optional[date] = None) -> bool:
+    """Whether the state was never fully built or its last build is ``ADU_FULL_REBUILD_DAYS`` old."""
+    if engine.built_on is None or engine.as_of is None:
+        return True
+    return ((today or date.today()) - engine.built_on).days >= FULL_REBUILD_DAYS
+
+
+def refresh_adu(
+    state_path: str = STATE_PATH,
+    forecasts: Optional[pd.DataFrame] = None,
+    as_of: Optional[date] = None,
+    full: bool = False,
+) -> pd.DataFrame:
+    """Daily ADU job: load the saved state, apply new sales, save and return the results.
+
+    The sales of the last ``ADU_LOOKBACK_DAYS`` days before the state date
+    are read again and rows whose ``sales_id`` was already applied are
+    skipped.  Without a saved state, with ``full=True`` or when
+    :func:`full_rebuild_due`, the engine is rebuilt from the last
+    ``ADU_PAST_WINDOW`` days of history.  ``forecasts`` (see
+    :meth:`RollingADUEngine.set_forecasts`) enables forward and blended ADU.
+    """
+    engine = RollingADUEngine.load(state_path) if state_path and os.path.exists(state_path) else None
+    if engine is not None and not full and not full_rebuild_due(engine):
+        sales = engine.unseen(fetch_sales_since(after=engine.as_of - timedelta(days=LOOKBACK_DAYS)))
+        engine.add_sales(sales)
+    else:
+        engine = RollingADUEngine()
+        sales = fetch_sales_since(lookback_days=engine.past_window)
+        engine.build(sales)
+        engine.built_on = date.today()
+    engine.remember(sales)
+    if as_of is not None:
+        engine.advance(as_of)
+    if forecasts is not None:
+        engine.set_forecasts(forecasts)
+    if state_path:
+        engine.save(state_path)
+    return engine.results()
+
+
+def item_adu(
+    item_ids: Sequence[str],
+    location_ids: Optional[Sequence[Optional[str]]] = None,
+    kind: str = "blended",
+    engine: Optional[RollingADUEngine] = None,
+    state_path: Optional[str] = None,
+) -> np.ndarray:
+    """ADU of items from the saved engine state, for buffer sizing.
+
+    An item with a location gets the ADU of that pair; one without (the
+    ``buffers`` table is per item) gets the sum over all its locations.
+    NaN for items without sales in the state.
+    """
+    if engine is None:
+        state_path = state_path or STATE_PATH
+        if not state_path or not os.path.exists(state_path):
+            raise ValueError("No saved ADU state; set ADU_STATE_PATH and run refresh_adu first")
+        engine = RollingADUEngine.load(state_path)
+    results = engine.results()
+    values = results[f"{kind}_adu"].to_numpy(dtype=float)
+    by_product = pd.Series(values).groupby(results["product_id"].to_numpy()).sum(min_count=1)
+    locations = list(location_ids) if location_ids is not None else [None] * len(item_ids)
+    located = [pd.notna(l) and str(l) != "" for l in locations]
+    pair_adu = engine.lookup([(str(i), str(l)) for i, l in zip(item_ids, locations)], kind)
+    total_adu = by_product.reindex([str(i) for i in item_ids]).to_numpy(dtype=float)
+    return np.where(located, pair_adu, total_adu)
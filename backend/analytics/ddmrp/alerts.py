@@ -1,61 +1,139 @@
-from supabase import create_client
-from dotenv import load_dotenv
-import os
+"""
+Net flow alerts driven by color transitions.
+
+Only rows in an alerting color (red or yellow) are read from ``net_flow``,
+filtered server-side and paged on its ``(product_id, location_id)`` key;
+an alert's ``item_id`` is the row's ``product_id``.  Each item keeps at
+most one *open* alert, which records the item's last alerting color; the
+open alerts are loaded once per run into an index keyed by
+``(item_id, location_id)`` and every candidate is compared against it:
+
+* no open alert (last known color green/blue) -> a new alert is opened;
+* open alert with a different color (yellow <-> red) -> the open alert is
+  resolved and a new one is opened with ``previous_color`` set;
+* open alert with the same color -> nothing is written;
+* open alert whose item is no longer red/yellow -> the alert is resolved.
+
+New alerts are inserted and resolved alerts updated in chunks, so a run
+writes in proportion to the number of transitions, not to the number of
+alerting items.  The ``alert_transitions`` migration adds the status
+columns and a partial unique index that enforces one open alert per
+item/location.
+"""
+
 import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-# Load environment variables
-load_dotenv()
+import pandas as pd
 
-# Initialize Supabase client
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+from backend.supabase.bulk import UPSERT_CHUNK_SIZE, iter_batches, read_table
+from backend.supabase.supabase_client import is_configured, supabase
 
-supabase = None
-if SUPABASE_URL and SUPABASE_SERVICE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+ALERT_COLORS = ("red", "yellow")
+ALERT_TYPES = {"red": "critical", "yellow": "warning"}
+OPEN = "open"
+RESOLVED = "resolved"
 
+AlertKey = Tuple[str, Optional[str]]
 
-def generate_alerts():
-    """
-    Generate alerts based on the current net flow status.
 
-    This function checks the `net_flow` table for items whose net flow status is
-    in the red or yellow zone. For each such item, it creates an alert record
-    with the appropriate severity (e.g., critical for red, warning for yellow)
-    and inserts these records into the `alerts` table.
+def _alert_key(item_id: Any, location_id: Any) -> AlertKey:
+    return str(item_id), None if pd.isna(location_id) or location_id == "" else str(location_id)
+
+
+def load_open_alerts() -> Dict[AlertKey, Dict[str, Any]]:
+    """Index of open alerts: ``(item_id, location_id) -> {"id", "color"}``."""
+    rows = read_table(
+        "alerts", key="id", columns="id, item_id, location_id, color",
+        filters={"status": OPEN},
+    )
+    index: Dict[AlertKey, Dict[str, Any]] = {}
+    for record in rows.to_dict("records"):
+        index[_alert_key(record["item_id"], record.get("location_id"))] = {
+            "id": record["id"],
+            "color": str(record["color"]).lower(),
+        }
+    return index
+
+
+def _alerting_rows() -> Iterator[Dict[str, Any]]:
+    """Red/yellow ``net_flow`` rows, filtered and paged server-side."""
+    filters = [("color", "in_", list(ALERT_COLORS))]
+    for batch in iter_batches("net_flow", key=("product_id", "location_id"), columns="*", filters=filters):
+        yield from batch.to_dict("records")
+
+
+def _new_alert(key: AlertKey, color: str, previous_color: Optional[str], now: str) -> Dict[str, Any]:
+    item_id, location_id = key
+    where = f" at {location_id}" if location_id else ""
+    message = f"Item {item_id}{where} net flow is in {color} zone"
+    if previous_color:
+        message += f" (was {previous_color})"
+    return {
+        "item_id": item_id,
+        "location_id": location_id,
+        "alert_type": ALERT_TYPES[color],
+        "color": color,
+        "previous_color": previous_color,
+        "message": message,
+        "status": OPEN,
+        "created_at": now,
+    }
+
+
+def _resolve(alert_ids: List[Any], now: str) -> None:
+    for start in range(0, len(alert_ids), UPSERT_CHUNK_SIZE):
+        chunk = alert_ids[start:start + UPSERT_CHUNK_SIZE]
+        supabase.table("alerts").update({"status": RESOLVED, "resolved_at": now}).in_("id", chunk).execute()
+
+
+def _insert(alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    inserted: List[Dict[str, Any]] = []
+    for start in range(0, len(alerts), UPSERT_CHUNK_SIZE):
+        chunk = alerts[start:start + UPSERT_CHUNK_SIZE]
+        response = supabase.table("alerts").insert(chunk).execute()
+        inserted.extend(response.data or chunk)
+    return inserted
+
+
+def generate_alerts() -> List[Dict[str, Any]]:
+    """
+    Open alerts for items whose net flow color changed into or within the
+    red/yellow zones, and resolve alerts of items that left them.
 
     Returns:
-        list: A list of generated alerts dictionaries, or an empty list if none
-              are created.
+        list: The newly opened alert dictionaries (empty when no item
+              changed color since the previous run).
     """
-    if supabase is None:
-        raise RuntimeError("Supabase client is not configured. Please set SUPABASE_URL and SUPABASE_SERVICE_KEY in the environment.")
-
-    # Fetch net flow data
-    response = supabase.table("net_flow").select("*").execute()
-    data = response.data if hasattr(response, "data") else None
-    if not data:
-        return []
-
-    alerts = []
-    for record in data:
-        color = record.get("color")
-        item_id = record.get("item_id")
-        if not color or not item_id:
+    if not is_configured():
+        raise RuntimeError("Supabase client is not configured. Please set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY in the environment.")
+
+    now = datetime.datetime.utcnow().isoformat()
+    open_alerts = load_open_alerts()
+
+    new_alerts: List[Dict[str, Any]] = []
+    resolve_ids: List[Any] = []
+    seen = set()
+    for record in _alerting_rows():
+        item_id = record.get("product_id")
+        color = str(record.get("color") or "").lower()
+        if pd.isna(item_id) or color not in ALERT_TYPES:
+            continue
+        key = _alert_key(item_id, record.get("location_id"))
+        if key in seen:
             continue
+        seen.add(key)
+
+        current = open_alerts.get(key)
+        if current is not None and current["color"] == color:
+            continue
+        if current is not None:
+            resolve_ids.append(current["id"])
+        new_alerts.append(_new_alert(key, color, current["color"] if current else None, now))
+
+    # Open alerts of items that are no longer red/yellow have recovered
+    resolve_ids.extend(alert["id"] for key, alert in open_alerts.items() if key not in seen)
 
-        if color.lower() in ["red", "yellow"]:
-            alert_type = "critical" if color.lower() == "red" else "warning"
-            message = f"Item {item_id} net flow is in {color} zone"
-            alerts.append({
-                "item_id": item_id,
-                "alert_type": alert_type,
-                "color": color,
-                "message": message,
-                "created_at": datetime.datetime.utcnow().isoformat()
-            })
-
-    if alerts:
-        supabase.table("alerts").insert(alerts).execute()
-
-    return alerts
+    # Resolve first so the one-open-alert-per-item index never sees two
+    _resolve(resolve_ids, now)
+    return _insert(new_alerts) if new_alerts else []
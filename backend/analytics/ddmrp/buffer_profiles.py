@@ -11,12 +11,23 @@ database.  Only the buffer zone values are returned to the caller; the
 item identifier is used internally for persistence but is omitted
 from the response to align with the API's ``BufferProfileResponse``
 schema.
+
+:func:`calculate_buffer_profiles_batch` applies the same formulas to whole
+arrays of items in one NumPy pass and persists them with a single chunked
+bulk upsert.
 """
 
-from typing import Dict
+import time
+from typing import Any, Dict, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
 
+from backend.supabase.bulk import bulk_upsert
 from backend.supabase.supabase_client import supabase
 
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
 
 def calculate_buffer_profiles(
     item_id: str,
@@ -77,4 +88,83 @@ def calculate_buffer_profiles(
         "red_zone": red_zone,
         "yellow_zone": yellow_zone,
         "green_zone": green_zone,
-    }
\ No newline at end of file
+    }
+
+def compute_buffer_zones(
+    average_daily_demand: ArrayLike,
+    decoupled_lead_time: ArrayLike,
+    min_order_quantity: ArrayLike,
+    variability_factor: ArrayLike = 1.0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorised form of the zone formulas in :func:`calculate_buffer_profiles`.
+
+    Every argument may be a scalar or an array; arrays are broadcast
+    against each other.  Returns ``(red_zone, yellow_zone, green_zone)``
+    as float64 arrays.
+    """
+    adu = np.asarray(average_daily_demand, dtype=np.float64)
+    dlt = np.asarray(decoupled_lead_time, dtype=np.float64)
+    moq = np.asarray(min_order_quantity, dtype=np.float64)
+    variability = np.asarray(variability_factor, dtype=np.float64)
+
+    red_zone = np.maximum(adu * dlt * variability, moq)
+    return red_zone, 0.5 * red_zone, 2.0 * red_zone
+
+
+def calculate_buffer_profiles_batch(
+    item_ids: Sequence[str],
+    average_daily_demand: ArrayLike,
+    decoupled_lead_time: ArrayLike,
+    min_order_quantity: ArrayLike,
+    variability_factor: ArrayLike = 1.0,
+    persist: bool = True,
+) -> Dict[str, Any]:
+    """Calculate buffer zones for many items at once.
+
+    The zones are computed in one NumPy pass and written to ``buffers``
+    with a single chunked bulk upsert instead of one request per item.
+
+    Args:
+        item_ids: Identifiers of the items, one per row.
+        average_daily_demand: ADU per item (array or scalar).
+        decoupled_lead_time: DLT in days per item (array or scalar).
+        min_order_quantity: MOQ per item (array or scalar).
+        variability_factor: Variability factor per item (array or scalar).
+        persist: Write the profiles to ``buffers`` when ``True``.
+
+    Returns:
+        Dictionary with ``item_id``, ``red_zone``, ``yellow_zone`` and
+        ``green_zone`` arrays, ``compute_seconds`` and the bulk writer's
+        ``write_stats`` (``None`` when not persisted or the write failed).
+    """
+    item_ids = np.asarray(item_ids, dtype=object)
+    started = time.perf_counter()
+    red_zone, yellow_zone, green_zone = compute_buffer_zones(
+        average_daily_demand, decoupled_lead_time, min_order_quantity, variability_factor
+    )
+    red_zone, yellow_zone, green_zone = (
+        np.broadcast_to(zone, item_ids.shape) for zone in (red_zone, yellow_zone, green_zone)
+    )
+    compute_seconds = time.perf_counter() - started
+
+    write_stats = None
+    if persist and len(item_ids):
+        records = pd.DataFrame({
+            "item_id": item_ids,
+            "red_zone": red_zone,
+            "yellow_zone": yellow_zone,
+            "green_zone": green_zone,
+        })
+        try:
+            write_stats = bulk_upsert("buffers", records, on_conflict="item_id")
+        except Exception as e:
+            print(f"Error saving buffer profiles: {e}")
+
+    return {
+        "item_id": item_ids,
+        "red_zone": red_zone,
+        "yellow_zone": yellow_zone,
+        "green_zone": green_zone,
+        "compute_seconds": compute_seconds,
+        "write_stats": write_stats,
+    }
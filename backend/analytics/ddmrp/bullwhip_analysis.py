@@ -7,12 +7,31 @@ to support 9-factor decoupling point scoring.
 Bullwhip Ratio = Order Variability / Customer Demand Variability
 """
 
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
 import pandas as pd
 import numpy as np
+from backend.analytics.ddmrp.bullwhip_summary import location_stats, record_bullwhip_results, top_candidates
+from backend.supabase import sales_snapshot
+from backend.supabase.bulk import bulk_upsert, read_table
 from backend.supabase.supabase_client import supabase
 
+BULLWHIP_CONFLICT_KEY = "product_id,location_id,analysis_period_end"
+PAIR = ["product_id", "location_id"]
+
+# Ratio thresholds shared by the scalar and vectorised scoring
+RATIO_THRESHOLDS = [3.0, 2.0, 1.5, 1.2, 1.0]
+RATIO_SCORES = [100, 85, 70, 50, 30]
+RATIO_INTERPRETATIONS = [
+    "CRITICAL: Severe demand amplification - immediate decoupling required",
+    "HIGH: Significant amplification - strong decoupling candidate",
+    "MODERATE: Noticeable amplification - consider decoupling",
+    "MILD: Minor amplification - monitor closely",
+    "LOW: Minimal amplification - low decoupling priority",
+]
+NO_AMPLIFICATION_SCORE = 20
+NO_AMPLIFICATION = "NONE: No amplification detected"
+
 
 def calculate_bullwhip_analysis(
     product_id: str, 
@@ -33,17 +52,52 @@ def calculate_bullwhip_analysis(
     Returns:
         Dictionary with bullwhip metrics and scoring
     """
+    result, record = _compute_bullwhip(product_id, location_id, analysis_days)
+
+    # Upsert into database
+    if record is not None:
+        try:
+            supabase.table("bullwhip_analysis").upsert(
+                record, on_conflict=BULLWHIP_CONFLICT_KEY
+            ).execute()
+            record_bullwhip_results([record])
+        except Exception as e:
+            print(f"Error upserting bullwhip analysis: {e}")
+
+    return result
+
+
+def _compute_bullwhip(
+    product_id: str,
+    location_id: str,
+    analysis_days: int
+) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Fetch and score one pair without persisting it.
+
+    Returns the API result and the ``bullwhip_analysis`` record to upsert
+    (``None`` when there is insufficient data).
+    """
     end_date = datetime.now().date()
     start_date = end_date - timedelta(days=analysis_days)
     
-    # Get customer demand (actual sales)
-    sales_response = supabase.table("historical_sales_data") \
-        .select("sales_date, quantity_sold") \
-        .eq("product_id", product_id) \
-        .eq("location_id", location_id) \
-        .gte("sales_date", start_date.isoformat()) \
-        .lte("sales_date", end_date.isoformat()) \
-        .execute()
+    # Get customer demand (actual sales), from the local snapshot when enabled
+    if sales_snapshot.SNAPSHOT_ENABLED:
+        sales_data = sales_snapshot.load_sales(
+            locations=[location_id],
+            product_ids=[product_id],
+            columns=["sales_date", "quantity_sold"],
+            start_date=start_date,
+            end_date=end_date
+        ).to_dict("records")
+    else:
+        sales_data = supabase.table("historical_sales_data") \
+            .select("sales_date, quantity_sold") \
+            .eq("product_id", product_id) \
+            .eq("location_id", location_id) \
+            .gte("sales_date", start_date.isoformat()) \
+            .lte("sales_date", end_date.isoformat()) \
+            .execute().data
     
     # Get orders placed to supplier
     po_response = supabase.table("open_pos") \
@@ -54,16 +108,16 @@ def calculate_bullwhip_analysis(
         .lte("order_date", end_date.isoformat()) \
         .execute()
     
-    if not sales_response.data or not po_response.data:
+    if not sales_data or not po_response.data:
         return {
             "status": "insufficient_data",
             "message": f"Insufficient data for {product_id} at {location_id}",
             "bullwhip_ratio": 1.0,
             "bullwhip_score": 50
-        }
+        }, None
     
     # Calculate customer demand variability
-    demand_df = pd.DataFrame(sales_response.data)
+    demand_df = pd.DataFrame(sales_data)
     demand_mean = demand_df['quantity_sold'].mean()
     demand_std = demand_df['quantity_sold'].std()
     demand_cv = demand_std / demand_mean if demand_mean > 0 else 0
@@ -80,21 +134,19 @@ def calculate_bullwhip_analysis(
     # Score (0-100 scale, higher ratio = higher score = more need for decoupling)
     score = _calculate_bullwhip_score(bullwhip_ratio)
     
-    # Upsert into database
-    try:
-        supabase.table("bullwhip_analysis").upsert({
-            "product_id": product_id,
-            "location_id": location_id,
-            "analysis_period_start": start_date.isoformat(),
-            "analysis_period_end": end_date.isoformat(),
-            "customer_demand_mean": float(demand_mean),
-            "customer_demand_std_dev": float(demand_std),
-            "order_qty_mean": float(order_mean),
-            "order_qty_std_dev": float(order_std),
-            "bullwhip_score": score
-        }, on_conflict="product_id,location_id,analysis_period_end").execute()
-    except Exception as e:
-        print(f"Error upserting bullwhip analysis: {e}")
+    record = {
+        "product_id": product_id,
+        "location_id": location_id,
+        "analysis_period_start": start_date.isoformat(),
+        "analysis_period_end": end_date.isoformat(),
+        "customer_demand_mean": float(demand_mean),
+        "customer_demand_std_dev": float(demand_std),
+        "order_qty_mean": float(order_mean),
+        "order_qty_std_dev": float(order_std),
+        # Undefined (NULL) with a single order: no sample std to compare
+        "bullwhip_ratio": float(bullwhip_ratio) if np.isfinite(bullwhip_ratio) else None,
+        "bullwhip_score": score
+    }
     
     return {
         "status": "success",
@@ -112,7 +164,7 @@ def calculate_bullwhip_analysis(
             "end": end_date.isoformat(),
             "days": analysis_days
         }
-    }
+    }, record
 
 
 def _calculate_bullwhip_score(ratio: float) -> int:
@@ -153,6 +205,135 @@ def _get_interpretation(ratio: float) -> str:
         return "NONE: No amplification detected"
 
 
+def _score_ratios(ratios: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised :func:`_calculate_bullwhip_score` and :func:`_get_interpretation`."""
+    conditions = [ratios >= threshold for threshold in RATIO_THRESHOLDS]
+    scores = np.select(conditions, RATIO_SCORES, default=NO_AMPLIFICATION_SCORE)
+    interpretations = np.select(conditions, RATIO_INTERPRETATIONS, default=NO_AMPLIFICATION)
+    return scores, interpretations
+
+
+def _load_bullwhip_window(
+    locations: Sequence[str],
+    start_date: date,
+    end_date: date
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Sales and supplier orders of ``locations`` in the window, one read each."""
+    locations = list(locations)
+    if sales_snapshot.SNAPSHOT_ENABLED:
+        sales = sales_snapshot.load_sales(
+            locations=locations,
+            columns=["product_id", "location_id", "sales_date", "quantity_sold"],
+            start_date=start_date,
+            end_date=end_date
+        )
+    else:
+        sales = read_table(
+            "historical_sales_data", key="sales_id",
+            columns="product_id, location_id, quantity_sold",
+            filters=[
+                ("location_id", "in_", locations),
+                ("sales_date", "gte", start_date.isoformat()),
+                ("sales_date", "lte", end_date.isoformat()),
+            ]
+        )
+    orders = read_table(
+        "open_pos", key="id",
+        columns="product_id, location_id, ordered_qty",
+        filters=[
+            ("location_id", "in_", locations),
+            ("order_date", "gte", start_date.isoformat()),
+            ("order_date", "lte", end_date.isoformat()),
+        ]
+    )
+    return sales, orders
+
+
+def _pair_moments(pairs: pd.MultiIndex, rows: pd.DataFrame, column: str) -> pd.DataFrame:
+    """Row count, mean and sample std of ``column`` per pair (one groupby)."""
+    if rows.empty:
+        return pd.DataFrame(index=pairs, columns=["count", "mean", "std"], dtype=float).fillna({"count": 0})
+    keys = [rows["product_id"].astype(str), rows["location_id"].astype(str)]
+    moments = rows[column].astype(float).groupby(keys).agg(["count", "mean", "std"])
+    return moments.reindex(pairs).fillna({"count": 0})
+
+
+def compute_bullwhip_batch(
+    product_location_pairs: List[Tuple[str, str]],
+    analysis_days: int = 90
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Score many pairs from a single read of sales and supplier orders.
+
+    Produces the same per-pair results and records as :func:`_compute_bullwhip`,
+    with the moments of every pair computed by one groupby per table and
+    the ratios and scores computed as arrays.
+
+    Returns:
+        ``(results, records)`` – one result per pair, in input order, and
+        the ``bullwhip_analysis`` records of the pairs with enough data.
+    """
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=analysis_days)
+    pairs = pd.MultiIndex.from_tuples(
+        [(str(p), str(l)) for p, l in product_location_pairs], names=PAIR
+    )
+    if not len(pairs):
+        return [], []
+
+    sales, orders = _load_bullwhip_window(pairs.get_level_values(1).unique(), start_date, end_date)
+    demand = _pair_moments(pairs, sales, "quantity_sold")
+    order = _pair_moments(pairs, orders, "ordered_qty")
+
+    demand_mean, demand_std = demand["mean"].to_numpy(), demand["std"].to_numpy()
+    order_mean, order_std = order["mean"].to_numpy(), order["std"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        demand_cv = np.where(demand_mean > 0, demand_std / demand_mean, 0.0)
+        order_cv = np.where(order_mean > 0, order_std / order_mean, 0.0)
+        ratios = np.where(demand_cv > 0, order_cv / demand_cv, 1.0)
+    scores, interpretations = _score_ratios(ratios)
+    enough = (demand["count"].to_numpy() > 0) & (order["count"].to_numpy() > 0)
+
+    period = {"start": start_date.isoformat(), "end": end_date.isoformat(), "days": analysis_days}
+    results, records = [], []
+    for i, (product_id, location_id) in enumerate(product_location_pairs):
+        if not enough[i]:
+            results.append({
+                "status": "insufficient_data",
+                "message": f"Insufficient data for {product_id} at {location_id}",
+                "bullwhip_ratio": 1.0,
+                "bullwhip_score": 50
+            })
+            continue
+        score = int(scores[i])
+        records.append({
+            "product_id": product_id,
+            "location_id": location_id,
+            "analysis_period_start": period["start"],
+            "analysis_period_end": period["end"],
+            "customer_demand_mean": float(demand_mean[i]),
+            "customer_demand_std_dev": float(demand_std[i]),
+            "order_qty_mean": float(order_mean[i]),
+            "order_qty_std_dev": float(order_std[i]),
+            "bullwhip_ratio": float(ratios[i]) if np.isfinite(ratios[i]) else None,
+            "bullwhip_score": score
+        })
+        results.append({
+            "status": "success",
+            "product_id": product_id,
+            "location_id": location_id,
+            "bullwhip_ratio": round(float(ratios[i]), 2),
+            "customer_demand_cv": round(float(demand_cv[i]), 3),
+            "order_qty_cv": round(float(order_cv[i]), 3),
+            "customer_demand_mean": round(float(demand_mean[i]), 2),
+            "order_qty_mean": round(float(order_mean[i]), 2),
+            "bullwhip_score": score,
+            "interpretation": str(interpretations[i]),
+            "analysis_period": dict(period)
+        })
+    return results, records
+
+
 def batch_calculate_bullwhip(
     product_location_pairs: list = None,
     analysis_days: int = 90,
@@ -170,6 +351,10 @@ def batch_calculate_bullwhip(
     Returns:
         Dictionary with batch results and summary statistics
     """
+    if sales_snapshot.SNAPSHOT_ENABLED:
+        # Pull only the sales delta once; every pair then reads the local snapshot
+        sales_snapshot.sync_sales_snapshot()
+    
     if product_location_pairs is None:
         # Get all decoupling points
         dp_response = supabase.table("decoupling_points") \
@@ -184,31 +369,26 @@ def batch_calculate_bullwhip(
             for dp in dp_response.data
         ]
     
-    results = []
-    critical_count = 0
-    high_count = 0
-    moderate_count = 0
+    # One read per table for every pair instead of two queries per pair
+    results, records = compute_bullwhip_batch(product_location_pairs, analysis_days)
     
-    for product_id, location_id in product_location_pairs:
-        result = calculate_bullwhip_analysis(
-            product_id, 
-            location_id, 
-            analysis_days
-        )
-        results.append(result)
-        
-        if result["status"] == "success":
-            ratio = result["bullwhip_ratio"]
-            if ratio >= 3.0:
-                critical_count += 1
-            elif ratio >= 2.0:
-                high_count += 1
-            elif ratio >= 1.5:
-                moderate_count += 1
+    ratios = np.array([r["bullwhip_ratio"] for r in results if r["status"] == "success"], dtype=float)
+    critical_count = int((ratios >= 3.0).sum())
+    high_count = int(((ratios >= 2.0) & (ratios < 3.0)).sum())
+    moderate_count = int(((ratios >= 1.5) & (ratios < 2.0)).sum())
+    
+    # Persist all pairs with chunked bulk upserts instead of one request per pair
+    write_stats = None
+    try:
+        write_stats = bulk_upsert("bullwhip_analysis", records, on_conflict=BULLWHIP_CONFLICT_KEY)
+        record_bullwhip_results(records)
+    except Exception as e:
+        print(f"Error upserting bullwhip analysis: {e}")
     
     return {
         "status": "success",
         "total_analyzed": len(results),
+        "write_stats": write_stats,
         "successful": len([r for r in results if r["status"] == "success"]),
         "insufficient_data": len([r for r in results if r["status"] == "insufficient_data"]),
         "summary": {
@@ -229,19 +409,16 @@ def get_top_bullwhip_candidates(limit: int = 20) -> list:
     """
     Get top products with highest bullwhip ratios (best decoupling candidates).
     
+    Served from ``bullwhip_top_candidates``, which is kept current where
+    ``bullwhip_analysis`` is written (see ``bullwhip_summary``).
+    
     Args:
         limit: Maximum number of results to return
     
     Returns:
         List of products sorted by bullwhip ratio (descending)
     """
-    response = supabase.table("bullwhip_analysis") \
-        .select("*") \
-        .order("bullwhip_ratio", desc=True) \
-        .limit(limit) \
-        .execute()
-    
-    return response.data if response.data else []
+    return top_candidates(limit)
 
 
 def analyze_bullwhip_by_location(location_id: str) -> Dict:
@@ -254,28 +431,17 @@ def analyze_bullwhip_by_location(location_id: str) -> Dict:
     Returns:
         Dictionary with location-level bullwhip statistics
     """
-    response = supabase.table("bullwhip_analysis") \
-        .select("*") \
-        .eq("location_id", location_id) \
-        .execute()
-    
-    if not response.data:
+    stats = location_stats(location_id)
+    if stats is None:
         return {
             "status": "no_data",
             "location_id": location_id
         }
     
-    df = pd.DataFrame(response.data)
-    
+    top_5 = [dict(product, bullwhip_ratio=round(product["bullwhip_ratio"], 2)) for product in stats["top_5_products"]]
     return {
         "status": "success",
         "location_id": location_id,
-        "total_products": len(df),
-        "avg_bullwhip_ratio": round(df["bullwhip_ratio"].mean(), 2),
-        "max_bullwhip_ratio": round(df["bullwhip_ratio"].max(), 2),
-        "critical_products": len(df[df["bullwhip_ratio"] >= 2.0]),
-        "products_with_amplification": len(df[df["bullwhip_ratio"] > 1.0]),
-        "top_5_products": df.nlargest(5, "bullwhip_ratio")[
-            ["product_id", "bullwhip_ratio", "bullwhip_score"]
-        ].to_dict("records")
+        **stats,
+        "top_5_products": top_5
     }
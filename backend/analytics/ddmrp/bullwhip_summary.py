@@ -0,0 +1,166 @@
+"""
+Location-level bullwhip summaries, maintained where the results are written.
+
+``bullwhip_location_summary`` holds one row per location, computed from the
+latest analysis period of each pair: the product count, mean and max
+ratio, the number of critical (ratio >= 2.0) and amplified (ratio > 1.0)
+products, the top 5 and the top ``BULLWHIP_SUMMARY_TOP_K`` products.
+``bullwhip_top_candidates`` holds the overall top-K pairs, rebuilt from the
+per-location top lists (exact, since every pair of the overall top-K is in
+its location's top-K).  Dashboard reads (:func:`top_candidates`,
+:func:`location_stats`) are single-row or ``LIMIT`` reads of these tables,
+so every process sees the same, current summary.
+
+In the hosted database the tables are refreshed by statement-level
+triggers on ``bullwhip_analysis`` (``refresh_bullwhip_summary`` in
+migration ``20261017120000``), whoever writes the rows.  The local SQLite
+backend ignores triggers, so there :func:`record_bullwhip_results` runs the
+same refresh, :func:`refresh_location_summaries`, from the writer.
+
+Pairs whose ratio is undefined (a single supplier order has no sample
+std) are stored with a ``NULL`` ratio and left out of the summaries.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from backend.supabase import supabase_client as sc
+from backend.supabase.bulk import bulk_upsert, read_table
+from backend.supabase.supabase_client import supabase
+
+TOP_K = int(os.getenv("BULLWHIP_SUMMARY_TOP_K", "50"))
+CRITICAL_RATIO = 2.0
+AMPLIFIED_RATIO = 1.0
+SUMMARY_TABLE = "bullwhip_location_summary"
+TOP_TABLE = "bullwhip_top_candidates"
+
+
+def _products(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [
+        {"product_id": str(row.product_id), "bullwhip_ratio": float(row.bullwhip_ratio),
+         "bullwhip_score": None if pd.isna(row.bullwhip_score) else int(row.bullwhip_score)}
+        for row in rows.itertuples(index=False)
+    ]
+
+
+def latest_results(rows: pd.DataFrame) -> pd.DataFrame:
+    """The latest analysis period of each pair with a defined ratio."""
+    if rows.empty:
+        return rows
+    rows = rows.sort_values("analysis_period_end").drop_duplicates(["product_id", "location_id"], keep="last")
+    ratio = pd.to_numeric(rows["bullwhip_ratio"], errors="coerce")
+    return rows.assign(bullwhip_ratio=ratio)[ratio.notna()]
+
+
+def summarise_locations(latest: pd.DataFrame, top_k: int = TOP_K) -> List[Dict[str, Any]]:
+    """``bullwhip_location_summary`` rows of the locations in ``latest``."""
+    if latest.empty:
+        return []
+    ranked = latest.sort_values(["location_id", "bullwhip_ratio", "product_id"], ascending=[True, False, True])
+    now = datetime.utcnow().isoformat()
+    summaries = []
+    for location_id, rows in ranked.groupby("location_id", sort=True):
+        ratios = rows["bullwhip_ratio"]
+        summaries.append({
+            "location_id": str(location_id),
+            "total_products": int(len(rows)),
+            "avg_bullwhip_ratio": float(ratios.mean()),
+            "max_bullwhip_ratio": float(ratios.max()),
+            "critical_products": int((ratios >= CRITICAL_RATIO).sum()),
+            "products_with_amplification": int((ratios > AMPLIFIED_RATIO).sum()),
+            "top_5_products": _products(rows.head(5)),
+            "top_products": _products(rows.head(top_k)),
+            "updated_at": now,
+        })
+    return summaries
+
+
+def _json_list(value: Any) -> List[Dict[str, Any]]:
+    """``jsonb`` columns come back as text from the local backend."""
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value or [])
+
+
+def top_candidate_rows(summaries: Iterable[Dict[str, Any]], top_k: int = TOP_K) -> List[Dict[str, Any]]:
+    """Overall top-K pairs from the per-location ``top_products`` lists."""
+    pairs = [
+        {"product_id": product["product_id"], "location_id": summary["location_id"],
+         "bullwhip_ratio": float(product["bullwhip_ratio"]), "bullwhip_score": product.get("bullwhip_score")}
+        for summary in summaries
+        for product in _json_list(summary.get("top_products"))
+    ]
+    pairs.sort(key=lambda p: (-p["bullwhip_ratio"], p["product_id"], p["location_id"]))
+    now = datetime.utcnow().isoformat()
+    return [dict(pair, rank=rank, updated_at=now) for rank, pair in enumerate(pairs[:top_k], start=1)]
+
+
+def refresh_location_summaries(location_ids: Iterable[str]) -> Dict[str, int]:
+    """Recompute the summary rows of ``location_ids`` and the overall top-K.
+
+    Python twin of the ``refresh_bullwhip_summary`` database function: it
+    reads only the analysis rows of the given locations and the stored
+    per-location top lists.
+    """
+    location_ids = sorted({str(location_id) for location_id in location_ids})
+    if not location_ids:
+        return {"locations": 0, "candidates": 0}
+    rows = read_table(
+        "bullwhip_analysis", key=("product_id", "location_id", "analysis_period_end"),
+        columns="product_id, location_id, analysis_period_end, bullwhip_ratio, bullwhip_score",
+        filters=[("location_id", "in_", location_ids)],
+    )
+    summaries = summarise_locations(latest_results(rows))
+    supabase.table(SUMMARY_TABLE).delete().in_("location_id", location_ids).execute()
+    if summaries:
+        bulk_upsert(SUMMARY_TABLE, summaries, on_conflict="location_id")
+
+    stored = read_table(SUMMARY_TABLE, key="location_id", columns="location_id, top_products")
+    candidates = top_candidate_rows(stored.to_dict("records"))
+    supabase.table(TOP_TABLE).delete().gte("rank", 1).execute()
+    if candidates:
+        bulk_upsert(TOP_TABLE, candidates, on_conflict="rank")
+    return {"locations": len(summaries), "candidates": len(candidates)}
+
+
+def record_bullwhip_results(records: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    """Refresh the summaries after ``records`` were upserted to ``bullwhip_analysis``.
+
+    A no-op on the hosted database, where the triggers already did it.
+    """
+    if not records or sc.BACKEND != "local":
+        return None
+    return refresh_location_summaries(record["location_id"] for record in records)
+
+
+def top_candidates(limit: int = 20) -> List[Dict[str, Any]]:
+    """Pairs with the highest bullwhip ratios (at most ``BULLWHIP_SUMMARY_TOP_K``)."""
+    rows = supabase.table(TOP_TABLE) \
+        .select("product_id, location_id, bullwhip_ratio, bullwhip_score") \
+        .order("rank") \
+        .limit(min(limit, TOP_K)) \
+        .execute().data
+    return [dict(row, bullwhip_ratio=round(float(row["bullwhip_ratio"]), 2)) for row in rows]
+
+
+def location_stats(location_id: str) -> Optional[Dict[str, Any]]:
+    """Summary statistics of one location (``None`` when it has no results)."""
+    rows = supabase.table(SUMMARY_TABLE) \
+        .select("total_products, avg_bullwhip_ratio, max_bullwhip_ratio, critical_products, "
+                "products_with_amplification, top_5_products") \
+        .eq("location_id", location_id) \
+        .limit(1) \
+        .execute().data
+    if not rows or not rows[0]["total_products"]:
+        return None
+    row = rows[0]
+    return {
+        **row,
+        "avg_bullwhip_ratio": round(float(row["avg_bullwhip_ratio"]), 2),
+        "max_bullwhip_ratio": round(float(row["max_bullwhip_ratio"]), 2),
+        "top_5_products": _json_list(row["top_5_products"]),
+    }
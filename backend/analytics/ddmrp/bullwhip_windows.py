@@ -0,0 +1,217 @@
+"""
+Multi-window bullwhip metrics on aligned time buckets.
+
+:func:`calculate_bullwhip_analysis` compares the spread of raw sales rows
+with the spread of raw purchase-order rows over one window.  Here both
+series are first summed into the same calendar buckets (daily or weekly,
+with empty buckets counted as zero), so demand and order variability are
+measured on a comparable footing.
+
+:class:`BullwhipPrefixSums` keeps, per product-location pair and series,
+prefix sums of the bucket totals and of their squares.  The mean and
+sample standard deviation over the last ``w`` buckets are then two
+differences of those arrays::
+
+    s = S[T] - S[T - w]        q = Q[T] - Q[T - w]
+    mean = s / w               var = (q - s**2 / w) / (w - 1)
+
+so any set of windows (``BULLWHIP_WINDOWS``, 30/60/90/180 days by default)
+costs O(1) per pair per window once the buckets are built, and
+:meth:`BullwhipPrefixSums.append` extends the arrays with new buckets
+without touching the history.
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.analytics.ddmrp.bullwhip_analysis import PAIR, _score_ratios
+from backend.supabase import sales_snapshot
+from backend.supabase.bulk import read_table
+
+WINDOWS = tuple(int(w) for w in os.getenv("BULLWHIP_WINDOWS", "30,60,90,180").split(","))
+BUCKET_DAYS = {"daily": 1, "weekly": 7}
+SERIES = {"demand": ("sales_date", "quantity_sold"), "orders": ("order_date", "ordered_qty")}
+
+
+def _ordinals(values: pd.Series) -> np.ndarray:
+    days = pd.to_datetime(values).values.astype("datetime64[D]").astype(np.int64)
+    return days + date(1970, 1, 1).toordinal()
+
+
+class BullwhipPrefixSums:
+    """Prefix sums of bucketed demand and order quantities per pair."""
+
+    def __init__(self, bucket: str = "daily"):
+        if bucket not in BUCKET_DAYS:
+            raise ValueError(f"Unknown bucket '{bucket}', expected one of {sorted(BUCKET_DAYS)}")
+        self.bucket = bucket
+        self.bucket_days = BUCKET_DAYS[bucket]
+        self.pairs = pd.MultiIndex.from_tuples([], names=PAIR)
+        self.end: Optional[date] = None
+        self.first_day = 0
+        self._sum = {name: np.zeros((0, 1)) for name in SERIES}
+        self._squares = {name: np.zeros((0, 1)) for name in SERIES}
+
+    @property
+    def buckets(self) -> int:
+        return self._sum["demand"].shape[1] - 1
+
+    @classmethod
+    def build(
+        cls,
+        sales: pd.DataFrame,
+        orders: pd.DataFrame,
+        end: date,
+        history_days: int = max(WINDOWS),
+        bucket: str = "daily",
+    ) -> "BullwhipPrefixSums":
+        """Bucket ``history_days`` of sales and orders ending on ``end``."""
+        engine = cls(bucket)
+        buckets = -(-history_days // engine.bucket_days)
+        engine.end = end
+        engine.first_day = end.toordinal() - buckets * engine.bucket_days + 1
+        engine._extend(sales, orders, buckets)
+        return engine
+
+    def append(self, sales: pd.DataFrame, orders: pd.DataFrame, end: date) -> int:
+        """Add the whole buckets between the current end and ``end``.
+
+        Rows dated on or before the current end are ignored (late corrections
+        need a :meth:`build`).  Returns the number of buckets added.
+        """
+        new_buckets = (end.toordinal() - self.end.toordinal()) // self.bucket_days
+        if new_buckets <= 0:
+            return 0
+        self._extend(sales, orders, new_buckets)
+        self.end = self.end + timedelta(days=new_buckets * self.bucket_days)
+        return new_buckets
+
+    def _grow(self, pairs: pd.MultiIndex) -> None:
+        """Add zero-history rows for pairs not seen before."""
+        unseen = pairs.difference(self.pairs)
+        if not len(unseen):
+            return
+        self.pairs = self.pairs.append(unseen)
+        for store in (self._sum, self._squares):
+            for name, values in store.items():
+                store[name] = np.vstack([values, np.zeros((len(unseen), values.shape[1]))])
+
+    def _extend(self, sales: pd.DataFrame, orders: pd.DataFrame, new_buckets: int) -> None:
+        frames = {"demand": sales, "orders": orders}
+        for frame in frames.values():
+            if not frame.empty:
+                self._grow(pd.MultiIndex.from_frame(frame[PAIR].astype(str)).unique())
+
+        start = self.buckets
+        for name, (date_column, qty_column) in SERIES.items():
+            totals = np.zeros((len(self.pairs), new_buckets))
+            frame = frames[name]
+            if not frame.empty:
+                slots = (_ordinals(frame[date_column]) - self.first_day) // self.bucket_days - start
+                rows = self.pairs.get_indexer(pd.MultiIndex.from_frame(frame[PAIR].astype(str)))
+                keep = (slots >= 0) & (slots < new_buckets) & (rows >= 0)
+                np.add.at(totals, (rows[keep], slots[keep]), frame[qty_column].to_numpy(dtype=float)[keep])
+            last_sum = self._sum[name][:, -1:]
+            last_squares = self._squares[name][:, -1:]
+            self._sum[name] = np.hstack([self._sum[name], last_sum + np.cumsum(totals, axis=1)])
+            self._squares[name] = np.hstack([self._squares[name], last_squares + np.cumsum(totals ** 2, axis=1)])
+
+    def moments(self, window_days: int, series: str) -> Dict[str, np.ndarray]:
+        """Mean and sample std of the bucket totals over the last ``window_days``."""
+        width = window_days // self.bucket_days
+        if not 2 <= width <= self.buckets:
+            raise ValueError(f"Window of {window_days} days needs 2..{self.buckets} {self.bucket} buckets")
+        total = self._sum[series][:, -1] - self._sum[series][:, -1 - width]
+        squares = self._squares[series][:, -1] - self._squares[series][:, -1 - width]
+        mean = total / width
+        variance = np.maximum((squares - total * mean) / (width - 1), 0.0)
+        return {"mean": mean, "std": np.sqrt(variance), "total": total}
+
+    def metrics(self, windows: Sequence[int] = WINDOWS) -> pd.DataFrame:
+        """Bullwhip ratio and score of every pair for each window, in one frame."""
+        frames: List[pd.DataFrame] = []
+        for window in windows:
+            demand = self.moments(window, "demand")
+            orders = self.moments(window, "orders")
+            with np.errstate(divide="ignore", invalid="ignore"):
+                demand_cv = np.where(demand["mean"] > 0, demand["std"] / demand["mean"], 0.0)
+                order_cv = np.where(orders["mean"] > 0, orders["std"] / orders["mean"], 0.0)
+                ratio = np.where(demand_cv > 0, order_cv / demand_cv, 1.0)
+            scores, interpretations = _score_ratios(ratio)
+            frames.append(pd.DataFrame({
+                "product_id": self.pairs.get_level_values(0),
+                "location_id": self.pairs.get_level_values(1),
+                "window_days": window,
+                "bucket": self.bucket,
+                "customer_demand_mean": demand["mean"],
+                "customer_demand_std_dev": demand["std"],
+                "customer_demand_cv": demand_cv,
+                "order_qty_mean": orders["mean"],
+                "order_qty_std_dev": orders["std"],
+                "order_qty_cv": order_cv,
+                "bullwhip_ratio": ratio,
+                "bullwhip_score": scores,
+                "interpretation": interpretations,
+                "has_data": (demand["total"] > 0) & (orders["total"] > 0),
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+
+def load_bullwhip_history(
+    start_date: date,
+    end_date: date,
+    locations: Optional[Iterable[str]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Sales and supplier orders between the dates, one read per table."""
+    # Materialise once: both reads need the locations (they may be a generator)
+    locations = list(locations) if locations is not None else None
+    filters = [("location_id", "in_", locations)] if locations is not None else []
+    if sales_snapshot.SNAPSHOT_ENABLED:
+        sales = sales_snapshot.load_sales(
+            locations=locations,
+            columns=["product_id", "location_id", "sales_date", "quantity_sold"],
+            start_date=start_date,
+            end_date=end_date,
+        )
+    else:
+        sales = read_table(
+            "historical_sales_data", key="sales_id",
+            columns="product_id, location_id, sales_date, quantity_sold",
+            filters=filters + [
+                ("sales_date", "gte", start_date.isoformat()),
+                ("sales_date", "lte", end_date.isoformat()),
+            ],
+        )
+    orders = read_table(
+        "open_pos", key="id",
+        columns="product_id, location_id, order_date, ordered_qty",
+        filters=filters + [
+            ("order_date", "gte", start_date.isoformat()),
+            ("order_date", "lte", end_date.isoformat()),
+        ],
+    )
+    return {"sales": sales, "orders": orders}
+
+
+def calculate_bullwhip_windows(
+    windows: Sequence[int] = WINDOWS,
+    bucket: str = "daily",
+    end_date: Optional[date] = None,
+    locations: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """Bullwhip metrics of every pair for all ``windows`` from one read of the history.
+
+    Returns:
+        Long frame with one row per pair and window (see
+        :meth:`BullwhipPrefixSums.metrics`).
+    """
+    end_date = end_date or date.today()
+    bucket_days = BUCKET_DAYS[bucket]
+    history_days = -(-max(windows) // bucket_days) * bucket_days
+    history = load_bullwhip_history(end_date - timedelta(days=history_days - 1), end_date, locations)
+    engine = BullwhipPrefixSums.build(history["sales"], history["orders"], end_date, history_days, bucket)
+    return engine.metrics(windows)
@@ -1,7 +1,13 @@
+from backend.supabase.cache import cached
 from backend.supabase.supabase_client import supabase
 from typing import Dict, Optional
 import pandas as pd
 
+
+def _load_item_lead_times(item_id: str) -> Optional[Dict[str, float]]:
+    response = supabase.table("items").select("supply_lead_time, manufacturing_lead_time").eq("item_id", item_id).execute()
+    return response.data[0] if response and response.data else None
+
 def calculate_decoupled_lead_time(item_id: str, demand_data: Optional[pd.DataFrame] = None) -> Dict[str, float]:
     """
     Calculate the decoupled lead time (DLT) for a given item.
@@ -19,9 +25,8 @@ def calculate_decoupled_lead_time(item_id: str, demand_data: Optional[pd.DataFra
     avg_daily_demand: Optional[float] = None
 
     try:
-        response = supabase.table("items").select("supply_lead_time, manufacturing_lead_time").eq("item_id", item_id).execute()
-        if response and response.data:
-            record = response.data[0]
+        record = cached("items", item_id, lambda: _load_item_lead_times(item_id))
+        if record:
             supply_lt = record.get("supply_lead_time", 0)
             manufacturing_lt = record.get("manufacturing_lead_time", 0)
             dlt = supply_lt + manufacturing_lt
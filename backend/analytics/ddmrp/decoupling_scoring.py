@@ -0,0 +1,336 @@
+"""
+Vectorised 9-factor decoupling point scoring.
+
+The database scores one product-location per RPC call
+(``calculate_8factor_weighted_score`` and its factor functions).  This
+module loads the inputs of every factor once, as columns aligned to the
+candidate pairs, maps each column to its 0-100 factor score with the same
+thresholds as the SQL functions, and stacks them into an
+``(pairs x factors)`` matrix ``F``.  With the weight sets of several
+scenarios as the columns of a ``(factors x scenarios)`` matrix ``W``, the
+weighted totals of every pair under every scenario are one matrix product
+``F @ W``, so re-scoring after a weight change only repeats that product.
+
+The ninth factor is the bullwhip score over the last
+``DECOUPLING_BULLWHIP_WINDOW_DAYS`` (90 by default), computed from sales and
+supplier orders on aligned daily buckets by
+:func:`~backend.analytics.ddmrp.bullwhip_windows.calculate_bullwhip_windows`.
+Pairs without both series in that window, or every pair when the window is
+0 or the history cannot be read, keep the score of the latest
+``bullwhip_analysis`` period.  Missing inputs score a neutral 50, as in the SQL functions; this
+includes pairs without a supplier performance record, which the SQL
+reliability function would turn into a NULL total.
+
+:func:`designate_decoupling_points` applies the auto-designation rules of
+the ``auto-designate-decoupling`` edge function to the scores and inserts
+all new designations with one bulk upsert.
+
+Scenario weights: ``"default"`` is always :data:`DEFAULT_WEIGHTS`, the
+hard-coded weights of ``calculate_8factor_weighted_score``, which the edge
+function calls without a scenario.  The seeded ``'default'`` row of
+``decoupling_weights_config`` holds the 6-factor weights of
+``calculate_decoupling_score_v2`` (0.25/0.25/0.20/0.10/0.10/0.10) and is not
+used.  Other scenarios come from the active (``is_active``) rows of that
+table; an unknown or inactive scenario falls back to ``"default"``, as the
+SQL scoring functions do.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.analytics.ddmrp.bullwhip_windows import calculate_bullwhip_windows
+from backend.supabase.bulk import bulk_upsert, read_table
+
+PAIR = ["product_id", "location_id"]
+FACTORS = [
+    "variability",
+    "criticality",
+    "holding_cost",
+    "supplier_reliability",
+    "lead_time",
+    "volume",
+    "storage_intensity",
+    "moq_rigidity",
+    "bullwhip",
+]
+# Weights of ``calculate_8factor_weighted_score``; bullwhip is opt-in per scenario
+DEFAULT_SCENARIO = "default"
+DEFAULT_WEIGHTS = {
+    "variability": 0.20,
+    "criticality": 0.20,
+    "holding_cost": 0.15,
+    "supplier_reliability": 0.10,
+    "lead_time": 0.10,
+    "volume": 0.10,
+    "storage_intensity": 0.075,
+    "moq_rigidity": 0.075,
+    "bullwhip": 0.0,
+}
+NEUTRAL_SCORE = 50.0
+# Window of the bullwhip factor; 0 scores from the stored bullwhip_analysis only
+BULLWHIP_WINDOW_DAYS = int(os.getenv("DECOUPLING_BULLWHIP_WINDOW_DAYS", "90"))
+REVIEW_THRESHOLD = 50.0
+
+
+def _optional_table(table: str, key, columns: str = "*") -> pd.DataFrame:
+    """Read a factor source; a missing table only neutralises its factor."""
+    try:
+        return read_table(table, key=key, columns=columns)
+    except Exception as e:
+        print(f"Error loading {table} for decoupling scoring: {e}")
+        return pd.DataFrame()
+
+
+def _latest(frame: pd.DataFrame, keys: List[str], order: str) -> pd.DataFrame:
+    """Most recent row per ``keys`` by ``order``."""
+    if frame.empty:
+        return frame
+    return frame.sort_values(order).drop_duplicates(keys, keep="last")
+
+
+def _align(pairs: pd.DataFrame, frame: pd.DataFrame, keys: List[str], columns: List[str]) -> pd.DataFrame:
+    """Left-join ``columns`` of ``frame`` onto ``pairs`` (NaN where missing)."""
+    if frame.empty:
+        return pd.DataFrame({column: np.nan for column in columns}, index=pairs.index)
+    frame = frame.reindex(columns=keys + columns).astype({key: str for key in keys})
+    return pairs[keys].astype(str).merge(frame.drop_duplicates(keys), on=keys, how="left")[columns].set_axis(pairs.index)
+
+
+def _bullwhip_scores(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Windowed bullwhip score per pair, the latest stored analysis where it has no data."""
+    stored = _latest(
+        _optional_table("bullwhip_analysis", ("product_id", "location_id", "analysis_period_end")),
+        PAIR, "analysis_period_end",
+    )
+    if BULLWHIP_WINDOW_DAYS <= 0:
+        return stored
+    try:
+        windowed = calculate_bullwhip_windows([BULLWHIP_WINDOW_DAYS], locations=pairs["location_id"].unique())
+    except Exception as e:
+        print(f"Error computing windowed bullwhip for decoupling scoring: {e}")
+        return stored
+    windowed = windowed.loc[windowed["has_data"], PAIR + ["bullwhip_score"]]
+    if stored.empty:
+        return windowed
+    return pd.concat([windowed, stored.reindex(columns=PAIR + ["bullwhip_score"]).astype({key: str for key in PAIR})]) \
+        .drop_duplicates(PAIR, keep="first")
+
+
+def load_factor_inputs(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Raw inputs of all factors for ``pairs``, one read per source table."""
+    pairs = pairs[PAIR].astype(str).drop_duplicates().reset_index(drop=True)
+
+    products = _optional_table("product_master", "product_id")
+    pricing = _latest(_optional_table("product_pricing-master", ("product_id", "effective_date")), ["product_id"], "effective_date")
+    suppliers = _optional_table("supplier_performance", "supplier_id")
+    history = _latest(_optional_table("demand_history_analysis", "id"), PAIR, "analysis_period_end")
+    if not history.empty and "cv" not in history:
+        history["cv"] = np.where(history["mean_demand"] > 0, history["std_dev_demand"] / history["mean_demand"], 0.0)
+    moq = _latest(_optional_table("moq_data", "id"), ["product_id"], "created_at")
+    if not moq.empty and "days_coverage" not in moq:
+        moq["days_coverage"] = np.where(moq["avg_daily_demand"] > 0, moq["moq_units"] / moq["avg_daily_demand"], 0.0)
+    storage = _optional_table("storage_requirements", "id")
+    if not storage.empty:
+        storage["footprint"] = storage["cubic_meters_per_unit"].astype(float) * 1000
+    bullwhip = _bullwhip_scores(pairs)
+
+    inputs = pd.concat([
+        pairs,
+        _align(pairs, products, ["product_id"], ["shelf_life_days", "supplier_id", "buffer_profile_id"]),
+        _align(pairs, pricing, ["product_id"], ["price"]),
+        _align(pairs, history, PAIR, ["cv"]),
+        _align(pairs, _optional_table("menu_mapping", "id"), ["product_id"], ["is_core_item", "sales_impact_percentage"]),
+        _align(pairs, storage, ["product_id"], ["storage_type", "footprint"]),
+        _align(pairs, _optional_table("actual_lead_time", tuple(PAIR)), PAIR, ["actual_lead_time_days"]),
+        _align(pairs, _optional_table("usage_analysis", "id"), PAIR, ["percentage_of_total_usage"]),
+        _align(pairs, moq, ["product_id"], ["days_coverage"]),
+        _align(pairs, bullwhip, PAIR, ["bullwhip_score"]),
+    ], axis=1)
+    supplier_columns = ["on_time_delivery_rate", "quality_reject_rate", "alternate_suppliers_count"]
+    return pd.concat([inputs, _align(inputs, suppliers, ["supplier_id"], supplier_columns)], axis=1)
+
+
+def _column(inputs: pd.DataFrame, name: str) -> np.ndarray:
+    return pd.to_numeric(inputs[name], errors="coerce").to_numpy(dtype=float) if name in inputs else np.full(len(inputs), np.nan)
+
+
+def _bands(values: np.ndarray, edges: Sequence[float], scores: Sequence[float], default: float, upper: bool = False) -> np.ndarray:
+    """Score ``values`` by the first edge they fall under (``<``, or ``<=`` when ``upper``)."""
+    conditions = [values <= edge if upper else values < edge for edge in edges]
+    return np.where(np.isnan(values), NEUTRAL_SCORE, np.select(conditions, scores, default=default))
+
+
+def factor_scores(inputs: pd.DataFrame) -> np.ndarray:
+    """``(pairs x 9)`` matrix of factor scores, columns in :data:`FACTORS` order."""
+    cv = _column(inputs, "cv")
+    with np.errstate(invalid="ignore"):
+        variability = np.where(
+            np.isnan(cv), NEUTRAL_SCORE,
+            np.select([cv < 0.2, cv < 0.5], [20.0, 50.0], default=np.minimum(100.0, 80.0 + (cv - 0.5) * 40.0)),
+        )
+
+    core = inputs["is_core_item"].fillna(False).astype(bool).to_numpy() if "is_core_item" in inputs else np.zeros(len(inputs), bool)
+    impact = _column(inputs, "sales_impact_percentage")
+    criticality = np.select(
+        [core & (impact > 50), core, impact > 50, impact > 20], [90.0, 80.0, 70.0, 50.0], default=20.0
+    )
+
+    storage_type = inputs["storage_type"].fillna("").astype(str).str.upper().to_numpy() if "storage_type" in inputs else np.full(len(inputs), "")
+    shelf_life = _column(inputs, "shelf_life_days")
+    holding_cost = np.minimum(100.0, 50.0
+                              + 30.0 * (shelf_life < 7) + 20.0 * (shelf_life < 3)
+                              + 20.0 * np.isin(storage_type, ["FROZEN", "CHILLED"])
+                              + 15.0 * (_column(inputs, "price") > 100))
+
+    otif = _column(inputs, "on_time_delivery_rate")
+    reject = np.nan_to_num(_column(inputs, "quality_reject_rate"), nan=0.05)
+    alternates = np.nan_to_num(_column(inputs, "alternate_suppliers_count"), nan=1.0)
+    supplier_reliability = np.where(
+        np.isnan(otif), NEUTRAL_SCORE, np.clip(100.0 - otif * 100.0 + reject * 100.0 - alternates * 10.0, 0.0, 100.0)
+    )
+
+    lead_time = _bands(_column(inputs, "actual_lead_time_days"), [1, 3, 7, 14], [20.0, 30.0, 50.0, 70.0], 90.0, upper=True)
+    volume = _bands(-_column(inputs, "percentage_of_total_usage"), [-20, -10, -5], [90.0, 70.0, 50.0], 20.0, upper=True)
+    storage_intensity = np.minimum(100.0, 50.0 + 30.0 * (_column(inputs, "footprint") > 10)
+                                   + 20.0 * (storage_type == "FROZEN") + 10.0 * (storage_type == "CHILLED"))
+    moq_rigidity = _bands(-_column(inputs, "days_coverage"), [-14, -7, -5, -3], [90.0, 70.0, 50.0, 30.0], 20.0, upper=True)
+    bullwhip = np.nan_to_num(_column(inputs, "bullwhip_score"), nan=NEUTRAL_SCORE)
+
+    return np.round(np.column_stack([
+        variability, criticality, holding_cost, supplier_reliability, lead_time,
+        volume, storage_intensity, moq_rigidity, bullwhip,
+    ]), 2)
+
+
+def weight_matrix(scenarios: Dict[str, Dict[str, float]]) -> Tuple[List[str], np.ndarray]:
+    """``(9 x scenarios)`` weight matrix; unspecified factors weigh 0."""
+    names = list(scenarios)
+    weights = np.array([[float(scenarios[name].get(factor) or 0.0) for name in names] for factor in FACTORS])
+    return names, weights
+
+
+def load_scenarios(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, float]]:
+    """Weight sets of ``"default"`` and the active ``decoupling_weights_config`` scenarios.
+
+    Args:
+        names: Scenarios to return (all by default); unknown or inactive
+            names get the ``"default"`` weights.
+    """
+    rows = read_table("decoupling_weights_config", key="id")
+    scenarios = {DEFAULT_SCENARIO: dict(DEFAULT_WEIGHTS)}
+    if not rows.empty:
+        active = rows["is_active"].fillna(False).astype(bool) if "is_active" in rows else pd.Series(False, index=rows.index)
+        rows = rows[active & (rows["scenario_name"] != DEFAULT_SCENARIO)]
+        scenarios.update({
+            row["scenario_name"]: {factor: row.get(f"{factor}_weight") for factor in FACTORS if not pd.isna(row.get(f"{factor}_weight"))}
+            for row in rows.to_dict("records")
+        })
+    if names is not None:
+        return {name: scenarios.get(name, scenarios[DEFAULT_SCENARIO]) for name in names}
+    return scenarios
+
+
+def recommendation(scores: np.ndarray) -> np.ndarray:
+    return np.select([scores >= 70, scores >= 40], ["PULL_STORE_LEVEL", "HYBRID_DC_LEVEL"], default="PUSH_UPSTREAM")
+
+
+def score_pairs(
+    inputs: pd.DataFrame,
+    scenarios: Dict[str, Dict[str, float]],
+) -> Dict[str, Any]:
+    """Weighted totals of every pair under every scenario in one matrix product.
+
+    Returns:
+        Dictionary with the ``factors`` matrix, the ``scenarios`` names and
+        ``scores`` (``pairs x scenarios``), plus a long ``frame`` with one row
+        per pair and scenario.
+    """
+    factors = factor_scores(inputs)
+    names, weights = weight_matrix(scenarios)
+    scores = np.round(factors @ weights, 2)
+
+    frame = pd.DataFrame({
+        "product_id": np.repeat(inputs["product_id"].to_numpy(), len(names)),
+        "location_id": np.repeat(inputs["location_id"].to_numpy(), len(names)),
+        "scenario_name": np.tile(names, len(inputs)),
+        "total_score": scores.ravel(),
+    })
+    frame["recommendation"] = recommendation(frame["total_score"].to_numpy())
+    for i, factor in enumerate(FACTORS):
+        frame[f"{factor}_score"] = np.repeat(factors[:, i], len(names))
+    return {"factors": factors, "scenarios": names, "scores": scores, "frame": frame}
+
+
+def load_candidate_pairs() -> pd.DataFrame:
+    return read_table("product_location_pairs", key=tuple(PAIR), columns="product_id, location_id")
+
+
+def valid_location_pairs(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Pairs whose location is in ``location_master``, as the edge function selects them."""
+    locations = _optional_table("location_master", "location_id", "location_id")
+    if locations.empty:
+        return pairs.iloc[:0]
+    return pairs[pairs["location_id"].astype(str).isin(locations["location_id"].astype(str))]
+
+
+def designate_decoupling_points(
+    threshold: float = 70.0,
+    scenario_name: str = "default",
+    pairs: Optional[pd.DataFrame] = None,
+    persist: bool = True,
+) -> Dict[str, Any]:
+    """Score all candidate pairs and designate those at or above ``threshold``.
+
+    As in the edge function, only pairs at a ``location_master`` location
+    are scored, pairs that already are decoupling points are skipped and
+    thresholds on a 0-1 scale are read as fractions.
+
+    Returns:
+        Dictionary with a ``summary`` (counts per outcome), the bulk writer's
+        ``write_stats`` and the scored ``frame``.
+    """
+    if 0 < threshold <= 1:
+        threshold *= 100
+    pairs = valid_location_pairs(load_candidate_pairs() if pairs is None else pairs)
+    existing = read_table("decoupling_points", key="id", columns="id, product_id, location_id")
+    if not existing.empty and not pairs.empty:
+        known = pd.MultiIndex.from_frame(existing[PAIR].astype(str))
+        pairs = pairs[~pd.MultiIndex.from_frame(pairs[PAIR].astype(str)).isin(known)]
+
+    summary = {"total_analyzed": len(pairs), "auto_designated": 0, "review_required": 0,
+               "auto_rejected": 0, "threshold_used": threshold, "scenario_used": scenario_name}
+    if pairs.empty:
+        return {"summary": summary, "write_stats": None, "frame": pd.DataFrame()}
+
+    scenarios = load_scenarios([scenario_name])
+    inputs = load_factor_inputs(pairs)
+    frame = score_pairs(inputs, scenarios)["frame"]
+    total = frame["total_score"].to_numpy()
+    designate = total >= threshold
+    summary.update(
+        auto_designated=int(designate.sum()),
+        review_required=int(((total >= REVIEW_THRESHOLD) & ~designate).sum()),
+        auto_rejected=int((total < REVIEW_THRESHOLD).sum()),
+    )
+
+    write_stats = None
+    if persist and designate.any():
+        chosen = frame[designate]
+        profiles = inputs["buffer_profile_id"].to_numpy()[designate] if "buffer_profile_id" in inputs else None
+        records = pd.DataFrame({
+            "product_id": chosen["product_id"].to_numpy(),
+            "location_id": chosen["location_id"].to_numpy(),
+            "buffer_profile_id": pd.Series(profiles, dtype=object).fillna("BP_DEFAULT").to_numpy()
+            if profiles is not None else "BP_DEFAULT",
+            "is_strategic": True,
+            "designation_reason": [f"Auto: Score {score:.2f}" for score in chosen["total_score"]],
+        })
+        try:
+            write_stats = bulk_upsert("decoupling_points", records, on_conflict="product_id,location_id")
+        except Exception as e:
+            print(f"Error saving decoupling points: {e}")
+
+    return {"summary": summary, "write_stats": write_stats, "frame": frame}
@@ -0,0 +1,285 @@
+"""
+Vectorised net flow for every product-location pair.
+
+Batch counterpart of :func:`calculate_net_flow`: on-hand, open supply,
+sales orders and buffer zones are loaded once, aligned to the pairs of the
+buffer source as columnar arrays, and the net flow position, buffer ratio
+and color of all pairs are computed in one NumPy pass.
+
+Net flow position follows the DDMRP equation::
+
+    net_flow = on_hand + open_supply - qualified_demand
+
+* **on_hand** – latest ``on_hand_inventory`` snapshot of the pair.
+* **open_supply** – ``ordered_qty - received_qty`` of ``OPEN``/``PARTIAL``
+  rows in ``open_pos``.
+* **qualified_demand** – today's demand (sales orders due today or past
+  due) plus *qualified spikes*: days within the spike horizon whose total
+  order quantity reaches the spike threshold
+  (``spike_multiplier * ADU``, or half the red zone when ADU is unknown).
+
+Orders are sorted once by ``(pair, due date)`` and reduced to daily
+totals; both demand components are differences of cumulative sums at
+``searchsorted`` positions, so no Python loop runs per order or per pair.
+
+Colors use the same thresholds as :func:`calculate_net_flow`.
+
+Zones come from one source, ``NET_FLOW_BUFFER_SOURCE`` (the per-pair
+``inventory_ddmrp_buffers_view``): the item-level ``buffers`` table has no
+location and cannot be aligned with per-location on-hand and orders.
+``net_flow`` rows are keyed by ``(product_id, location_id)`` on every
+write path.
+"""
+
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.supabase.bulk import bulk_upsert, read_table
+
+BUFFER_SOURCE = os.getenv("NET_FLOW_BUFFER_SOURCE", "inventory_ddmrp_buffers_view")
+SPIKE_HORIZON_DAYS = int(os.getenv("NET_FLOW_SPIKE_HORIZON_DAYS", "30"))
+SPIKE_MULTIPLIER = float(os.getenv("NET_FLOW_SPIKE_MULTIPLIER", "3.0"))
+RED_ZONE_SPIKE_SHARE = 0.5
+
+OPEN_PO_STATUSES = ("OPEN", "PARTIAL")
+CLOSED_SO_STATUSES = ("CANCELLED", "CLOSED", "SHIPPED", "DELIVERED")
+PAIR = ["product_id", "location_id"]
+
+
+def _ordinals(values: pd.Series) -> np.ndarray:
+    days = pd.to_datetime(values).values.astype("datetime64[D]").astype(np.int64)
+    return days + date(1970, 1, 1).toordinal()
+
+
+def _codes(pairs: pd.MultiIndex, frame: pd.DataFrame) -> np.ndarray:
+    """Position of each row's pair in ``pairs`` (``-1`` when unknown)."""
+    if frame.empty:
+        return np.zeros(0, dtype=np.int64)
+    return pairs.get_indexer(pd.MultiIndex.from_frame(frame[PAIR].astype(str)))
+
+
+def latest_on_hand(pairs: pd.MultiIndex, on_hand: pd.DataFrame) -> np.ndarray:
+    """Quantity of the most recent snapshot of each pair."""
+    result = np.zeros(len(pairs))
+    if on_hand.empty:
+        return result
+    codes = _codes(pairs, on_hand)
+    stamps = pd.to_datetime(on_hand["snapshot_ts"], utc=True).values.astype("datetime64[ns]").astype(np.int64)
+    order = np.lexsort((stamps, codes))
+    codes = codes[order]
+    last = np.r_[codes[1:] != codes[:-1], True] & (codes >= 0)
+    result[codes[last]] = on_hand["qty_on_hand"].to_numpy(dtype=float)[order][last]
+    return result
+
+
+def open_supply(pairs: pd.MultiIndex, open_pos: pd.DataFrame) -> np.ndarray:
+    """Outstanding quantity of open purchase orders per pair."""
+    if open_pos.empty:
+        return np.zeros(len(pairs))
+    status = open_pos["status"].fillna("OPEN").str.upper() if "status" in open_pos else None
+    rows = open_pos[status.isin(OPEN_PO_STATUSES)] if status is not None else open_pos
+    codes = _codes(pairs, rows)
+    outstanding = np.clip(
+        rows["ordered_qty"].to_numpy(dtype=float) - rows["received_qty"].fillna(0).to_numpy(dtype=float), 0, None
+    )
+    keep = codes >= 0
+    return np.bincount(codes[keep], weights=outstanding[keep], minlength=len(pairs))
+
+
+def qualified_demand(
+    codes: np.ndarray,
+    due_days: np.ndarray,
+    quantities: np.ndarray,
+    thresholds: np.ndarray,
+    today: int,
+    horizon_days: int = SPIKE_HORIZON_DAYS,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Today's demand and qualified spike demand of every pair.
+
+    Args:
+        codes: Pair index of each order (``-1`` rows are ignored).
+        due_days: Due date of each order as a day ordinal.
+        quantities: Order quantities.
+        thresholds: Spike threshold per pair (``inf`` disables spikes).
+        today: Day ordinal of the calculation date.
+        horizon_days: Days after today that are checked for spikes.
+
+    Returns:
+        ``(today_demand, spike_demand)`` arrays, one value per pair.
+    """
+    n = len(thresholds)
+    keep = (codes >= 0) & (due_days <= today + horizon_days)
+    if not keep.any():
+        return np.zeros(n), np.zeros(n)
+    codes, due_days, quantities = codes[keep], due_days[keep], quantities[keep]
+
+    base = min(int(due_days.min()), today)
+    span = today + horizon_days - base + 1
+    keys = codes.astype(np.int64) * span + (due_days - base)
+    order = np.argsort(keys, kind="stable")
+    keys, quantities = keys[order], quantities[order]
+
+    # Daily totals per pair on the sorted (pair, day) index
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    day_keys = keys[starts]
+    daily = np.add.reduceat(quantities, starts)
+    day_pair = day_keys // span
+    is_spike = (day_keys % span > today - base) & (daily >= thresholds[day_pair])
+
+    total = np.r_[0.0, np.cumsum(daily)]
+    spikes = np.r_[0.0, np.cumsum(np.where(is_spike, daily, 0.0))]
+    pair_base = np.arange(n, dtype=np.int64) * span
+    first = np.searchsorted(day_keys, pair_base, side="left")
+    through_today = np.searchsorted(day_keys, pair_base + (today - base), side="right")
+    through_horizon = np.searchsorted(day_keys, pair_base + (span - 1), side="right")
+    return total[through_today] - total[first], spikes[through_horizon] - spikes[through_today]
+
+
+def net_flow_colors(net_flow: np.ndarray, total_buffer: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised color thresholds of :func:`calculate_net_flow`; returns ``(ratio, color)``."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(total_buffer > 0, net_flow / total_buffer, np.nan)
+    color = np.select(
+        [np.isnan(total_buffer), net_flow < 0, np.isnan(ratio), ratio < 0.33, ratio < 0.66, ratio < 1.0],
+        ["unknown", "red", "green", "red", "yellow", "green"],
+        default="blue",
+    )
+    return ratio, color
+
+
+def compute_net_flow(
+    buffers: pd.DataFrame,
+    on_hand: pd.DataFrame,
+    open_pos: pd.DataFrame,
+    open_so: pd.DataFrame,
+    today: Optional[date] = None,
+    horizon_days: int = SPIKE_HORIZON_DAYS,
+    spike_multiplier: float = SPIKE_MULTIPLIER,
+) -> pd.DataFrame:
+    """Net flow of every pair in ``buffers`` from already-loaded frames.
+
+    Args:
+        buffers: ``product_id``, ``location_id``, ``red_zone``,
+            ``yellow_zone``, ``green_zone`` and optionally ``adu``.
+        on_hand: ``on_hand_inventory`` rows.
+        open_pos: ``open_pos`` rows.
+        open_so: ``open_so`` rows (``qty``, ``confirmed_date``, ``status``).
+        today: Calculation date (default: today).
+        horizon_days: Spike horizon in days.
+        spike_multiplier: Spike threshold as a multiple of ADU.
+    """
+    buffers = buffers.drop_duplicates(PAIR)
+    pairs = pd.MultiIndex.from_frame(buffers[PAIR].astype(str))
+    today_ordinal = (today or date.today()).toordinal()
+
+    zones = buffers.reindex(columns=["red_zone", "yellow_zone", "green_zone"]).astype(float)
+    red = zones["red_zone"].fillna(0).to_numpy()
+    total_buffer = zones.sum(axis=1, min_count=1).to_numpy()
+    adu = buffers["adu"].astype(float).fillna(0).to_numpy() if "adu" in buffers else np.zeros(len(buffers))
+    thresholds = np.where(adu > 0, spike_multiplier * adu, RED_ZONE_SPIKE_SHARE * red)
+    thresholds = np.where(thresholds > 0, thresholds, np.inf)
+
+    if not open_so.empty and "status" in open_so:
+        open_so = open_so[~open_so["status"].fillna("").str.upper().isin(CLOSED_SO_STATUSES)]
+    if open_so.empty:
+        demand_today, spikes = np.zeros(len(pairs)), np.zeros(len(pairs))
+    else:
+        demand_today, spikes = qualified_demand(
+            _codes(pairs, open_so),
+            _ordinals(open_so["confirmed_date"]),
+            open_so["qty"].to_numpy(dtype=float),
+            thresholds,
+            today_ordinal,
+            horizon_days,
+        )
+
+    on_hand_qty = latest_on_hand(pairs, on_hand)
+    supply = open_supply(pairs, open_pos)
+    qualified = demand_today + spikes
+    net_flow = on_hand_qty + supply - qualified
+    ratio, color = net_flow_colors(net_flow, total_buffer)
+
+    return pd.DataFrame({
+        "product_id": pairs.get_level_values(0),
+        "location_id": pairs.get_level_values(1),
+        "on_hand": on_hand_qty,
+        "open_supply": supply,
+        "qualified_demand": qualified,
+        "spike_demand": spikes,
+        "net_flow": net_flow,
+        "ratio": ratio,
+        "color": color,
+    })
+
+
+def load_net_flow_inputs(
+    location_id: Optional[str] = None,
+    product_ids: Optional[Sequence[str]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Read buffers, on-hand, open POs and open sales orders once each.
+
+    Args:
+        location_id: Restrict every input to one location.
+        product_ids: Restrict every input to these products.
+    """
+    filters = []
+    if location_id:
+        filters.append(("location_id", "eq", location_id))
+    if product_ids is not None:
+        filters.append(("product_id", "in_", list(product_ids)))
+    return {
+        "buffers": read_table(
+            BUFFER_SOURCE, key=tuple(PAIR), filters=filters,
+            columns="product_id, location_id, adu, red_zone, yellow_zone, green_zone",
+        ),
+        "on_hand": read_table(
+            "on_hand_inventory", key="id", filters=filters,
+            columns="product_id, location_id, qty_on_hand, snapshot_ts",
+        ),
+        "open_pos": read_table(
+            "open_pos", key="id",
+            filters=filters + [("status", "in_", list(OPEN_PO_STATUSES))],
+            columns="product_id, location_id, ordered_qty, received_qty, status",
+        ),
+        "open_so": read_table(
+            "open_so", key="id", filters=filters,
+            columns="product_id, location_id, qty, confirmed_date, status",
+        ),
+    }
+
+
+def calculate_net_flow_batch(
+    location_id: Optional[str] = None,
+    today: Optional[date] = None,
+    persist: bool = True,
+) -> Dict[str, Any]:
+    """Calculate and persist the net flow of every buffered pair.
+
+    Returns:
+        Dictionary with the number of ``pairs``, a ``colors`` histogram,
+        the bulk writer's ``write_stats`` and the result ``frame``.
+    """
+    inputs = load_net_flow_inputs(location_id)
+    if inputs["buffers"].empty:
+        return {"pairs": 0, "colors": {}, "write_stats": None, "frame": pd.DataFrame()}
+
+    frame = compute_net_flow(inputs["buffers"], inputs["on_hand"], inputs["open_pos"], inputs["open_so"], today)
+    frame["calculated_at"] = datetime.utcnow().isoformat()
+
+    write_stats = None
+    if persist:
+        try:
+            write_stats = bulk_upsert("net_flow", frame, on_conflict="product_id,location_id")
+        except Exception as e:
+            print(f"Error saving net flow calculation: {e}")
+
+    return {
+        "pairs": len(frame),
+        "colors": frame["color"].value_counts().to_dict(),
+        "write_stats": write_stats,
+        "frame": frame,
+    }
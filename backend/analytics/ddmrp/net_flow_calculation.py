@@ -1,9 +1,29 @@
-from typing import Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, Optional
 
+from backend.analytics.ddmrp.net_flow_batch import BUFFER_SOURCE
+from backend.supabase.cache import cached
 from backend.supabase.supabase_client import supabase
 
 
-def calculate_net_flow(item_id: str, on_hand: float, open_supply: float, qualified_demand: float, buffer_levels: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+def _load_buffer_levels(product_id: str, location_id: str) -> Optional[Dict[str, float]]:
+    response = supabase.table(BUFFER_SOURCE) \
+        .select("red_zone, yellow_zone, green_zone") \
+        .eq("product_id", product_id) \
+        .eq("location_id", location_id) \
+        .limit(1) \
+        .execute()
+    return response.data[0] if response and response.data else None
+
+
+def calculate_net_flow(
+    item_id: str,
+    on_hand: float,
+    open_supply: float,
+    qualified_demand: float,
+    buffer_levels: Optional[Dict[str, float]] = None,
+    location_id: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     Calculate the net flow position and color for a given item based on DDMRP principles.
 
@@ -14,19 +34,25 @@ def calculate_net_flow(item_id: str, on_hand: float, open_supply: float, qualifi
     - green: stock is within the buffer range
     - blue: stock exceeds buffer range
 
-    :param item_id: Identifier of the item.
+    Buffer levels are read from the same per-pair source as the batch
+    calculation (``NET_FLOW_BUFFER_SOURCE``), so they need a location.  Only
+    located results are saved, to the ``net_flow`` row of the product-location;
+    without a location the result is returned but not stored.
+
+    :param item_id: Identifier of the item (the ``product_id`` of the pair).
     :param on_hand: Current on-hand inventory quantity.
     :param open_supply: Quantity of open supply (e.g., orders in transit).
     :param qualified_demand: Qualified demand over the planning horizon.
     :param buffer_levels: Optional dictionary containing 'red_zone', 'yellow_zone', and 'green_zone'.
+    :param location_id: Location of the pair; required to load buffer levels and to save the result.
     :return: Dictionary containing the net_flow value, ratio relative to total buffer, and color.
     """
-    # If buffer levels are not provided, attempt to fetch them from the database
-    if buffer_levels is None:
+    # If buffer levels are not provided, read the pair's zones through the cache
+    if buffer_levels is None and location_id:
         try:
-            response = supabase.table("buffers").select("*").eq("item_id", item_id).execute()
-            if response and response.data:
-                buffer_levels = response.data[0]
+            buffer_levels = cached(
+                BUFFER_SOURCE, (item_id, location_id), lambda: _load_buffer_levels(item_id, location_id)
+            )
         except Exception as e:
             print(f"Error fetching buffer levels: {e}")
             buffer_levels = None
@@ -36,9 +62,9 @@ def calculate_net_flow(item_id: str, on_hand: float, open_supply: float, qualifi
     ratio: Optional[float] = None
 
     if buffer_levels:
-        red = buffer_levels.get("red_zone", 0)
-        yellow = buffer_levels.get("yellow_zone", 0)
-        green = buffer_levels.get("green_zone", 0)
+        red = buffer_levels.get("red_zone") or 0
+        yellow = buffer_levels.get("yellow_zone") or 0
+        green = buffer_levels.get("green_zone") or 0
         total_buffer = red + yellow + green
 
         if total_buffer > 0:
@@ -61,14 +87,26 @@ def calculate_net_flow(item_id: str, on_hand: float, open_supply: float, qualifi
 
     result = {
         "item_id": item_id,
+        "location_id": location_id,
         "net_flow": net_flow,
         "ratio": ratio,
         "color": color,
     }
 
-    try:
-        supabase.table("net_flow").upsert(result).execute()
-    except Exception as e:
-        print(f"Error saving net flow calculation: {e}")
+    if location_id:
+        try:
+            supabase.table("net_flow").upsert({
+                "product_id": item_id,
+                "location_id": location_id,
+                "on_hand": on_hand,
+                "open_supply": open_supply,
+                "qualified_demand": qualified_demand,
+                "net_flow": net_flow,
+                "ratio": ratio,
+                "color": color,
+                "calculated_at": datetime.utcnow().isoformat(),
+            }, on_conflict="product_id,location_id").execute()
+        except Exception as e:
+            print(f"Error saving net flow calculation: {e}")
 
     return result
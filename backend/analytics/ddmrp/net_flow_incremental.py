@@ -0,0 +1,249 @@
+"""
+Event-driven incremental net flow.
+
+Changes to on-hand, open supply, sales orders or buffer zones are recorded
+in ``net_flow_change_log`` (by database triggers, see the
+``net_flow_change_log`` migration, or by :func:`record_changes` for writes
+that bypass them, e.g. on the local backend).  The log stands in for a
+realtime/CDC feed: :class:`IncrementalNetFlow` polls it from its
+watermark, marks the affected product-locations dirty and recomputes and
+persists only those pairs, so an intraday refresh costs in proportion to
+what changed rather than to the catalogue size.
+
+A change row with ``product_id = '*'`` (e.g. a buffer profile edit) marks
+every pair dirty and falls back to :func:`calculate_net_flow_batch`; one
+with ``location_id = '*'`` marks every location of that product.  Zones are
+read from ``NET_FLOW_BUFFER_SOURCE`` like the batch, so writes to the
+item-level ``buffers`` table do not change net flow and are not logged.
+
+The view's own inputs are logged as well: ``actual_lead_time`` per pair,
+``buffer_profile_master``, ``product_master`` and ``location_master`` as a
+wildcard per statement, and ADU as a wildcard whenever
+``refresh_component_demand_view()`` refreshes the ``component_demand_view``
+materialized view.  A ``REFRESH MATERIALIZED VIEW`` issued outside that
+function, or any writer the triggers do not see (the local backend has no
+triggers), is only caught by the periodic full recalculation: a refresh
+runs :func:`calculate_net_flow_batch` once the last full one is
+``NET_FLOW_FULL_REFRESH_SECONDS`` old (default one day, 0 disables).  Realtime subscribers can feed the same dirty set through
+:meth:`IncrementalNetFlow.mark_dirty`.
+
+Log ids come from a sequence, so a transaction can commit a lower id after
+a higher one was already read.  The watermark therefore only moves past
+rows logged more than ``NET_FLOW_LOG_SAFETY_LAG_SECONDS`` ago (longer than
+any writing transaction); newer rows are read again on the next poll, and
+the ids already marked are remembered so they are not recomputed twice.
+"""
+
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.analytics.ddmrp.net_flow_batch import (
+    PAIR,
+    calculate_net_flow_batch,
+    compute_net_flow,
+    load_net_flow_inputs,
+)
+from backend.supabase.bulk import bulk_upsert, read_table
+from backend.supabase.supabase_client import supabase
+
+CHANGE_LOG = "net_flow_change_log"
+WILDCARD = "*"
+# Products per filtered read when loading the inputs of dirty pairs
+PRODUCTS_PER_READ = int(os.getenv("NET_FLOW_PRODUCTS_PER_READ", "200"))
+# Age after which no transaction can still commit a lower change-log id
+SAFETY_LAG_SECONDS = float(os.getenv("NET_FLOW_LOG_SAFETY_LAG_SECONDS", "60"))
+# Age of the last full recalculation after which a refresh does a full one
+FULL_REFRESH_SECONDS = float(os.getenv("NET_FLOW_FULL_REFRESH_SECONDS", "86400"))
+
+Pair = Tuple[str, str]
+
+
+def record_changes(pairs: Iterable[Pair], source: str) -> int:
+    """Append change-log rows for ``pairs`` (writers not covered by triggers)."""
+    rows = [{"product_id": p, "location_id": l, "source": source} for p, l in set(pairs)]
+    if rows:
+        supabase.table(CHANGE_LOG).insert(rows).execute()
+    return len(rows)
+
+
+class IncrementalNetFlow:
+    """Dirty-set driven net flow refresher with a change-log watermark."""
+
+    def __init__(
+        self,
+        watermark: Optional[int] = None,
+        safety_lag_seconds: float = SAFETY_LAG_SECONDS,
+        full_refresh_seconds: float = FULL_REFRESH_SECONDS,
+    ):
+        """
+        Args:
+            watermark: Last change-log id already reflected in ``net_flow``.
+                ``None`` starts with a full recalculation from the current
+                end of the log.
+            safety_lag_seconds: Rows logged more recently than this are
+                re-read on the next poll instead of being passed by the
+                watermark.
+            full_refresh_seconds: Age of the last full recalculation after
+                which a refresh recalculates every pair (0 disables).
+        """
+        self.watermark = watermark
+        self.safety_lag_seconds = safety_lag_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self.last_full_refresh: Optional[datetime] = None
+        self._seen: Set[int] = set()
+        self._dirty: Set[Pair] = set()
+        self._full_refresh = False
+        self._lock = threading.Lock()
+
+    def mark_dirty(self, pairs: Iterable[Pair]) -> None:
+        """Mark pairs for recalculation (a ``'*'`` product marks everything,
+        a ``'*'`` location every location of the product)."""
+        with self._lock:
+            for product_id, location_id in pairs:
+                if product_id == WILDCARD:
+                    self._full_refresh = True
+                else:
+                    self._dirty.add((str(product_id), str(location_id)))
+
+    def _cutoff(self) -> str:
+        return (datetime.now(timezone.utc) - timedelta(seconds=self.safety_lag_seconds)).isoformat()
+
+    def poll(self) -> int:
+        """Read new change-log rows into the dirty set; returns the number of rows marked."""
+        if self.watermark is None:
+            latest = supabase.table(CHANGE_LOG).select("id").lte("changed_at", self._cutoff()) \
+                .order("id", desc=True).limit(1).execute().data
+            self.watermark = int(latest[0]["id"]) if latest else 0
+            with self._lock:
+                self._full_refresh = True
+            return 0
+        changes = read_table(
+            CHANGE_LOG, key="id", columns="id, product_id, location_id, changed_at",
+            filters=[("id", "gt", self.watermark)],
+        )
+        if changes.empty:
+            return 0
+        changes = changes.sort_values("id")
+        ids = changes["id"].astype(int).to_numpy()
+        new = ~np.isin(ids, list(self._seen))
+        self.mark_dirty(zip(changes["product_id"][new], changes["location_id"][new]))
+
+        # Advance over the leading run of rows too old to have a lower id still uncommitted
+        logged = pd.to_datetime(changes["changed_at"], utc=True)
+        settled = (logged.isna() | (logged <= pd.Timestamp(self._cutoff()))).to_numpy()
+        unsettled = np.flatnonzero(~settled)
+        settled_run = len(ids) if not len(unsettled) else unsettled[0]
+        if settled_run:
+            self.watermark = int(ids[settled_run - 1])
+        self._seen = {int(i) for i in ids[settled_run:]}
+        return int(new.sum())
+
+    def full_refresh_due(self, now: Optional[datetime] = None) -> bool:
+        """Whether the last full recalculation is ``full_refresh_seconds`` old."""
+        if self.full_refresh_seconds <= 0 or self.last_full_refresh is None:
+            return False
+        now = now or datetime.now(timezone.utc)
+        return (now - self.last_full_refresh).total_seconds() >= self.full_refresh_seconds
+
+    def _take_dirty(self) -> Tuple[bool, List[Pair]]:
+        with self._lock:
+            full, dirty = self._full_refresh, sorted(self._dirty)
+            self._full_refresh, self._dirty = False, set()
+        return full, dirty
+
+    def _restore_dirty(self, full: bool, dirty: List[Pair]) -> None:
+        with self._lock:
+            self._full_refresh |= full
+            self._dirty.update(dirty)
+
+    def recompute(self, pairs: List[Pair], today: Optional[date] = None) -> pd.DataFrame:
+        """Load the inputs of ``pairs`` only and compute their net flow.
+
+        A pair with a ``'*'`` location stands for every location of its product.
+        """
+        wanted = pd.MultiIndex.from_tuples(pairs, names=PAIR)
+        every_location = {product for product, location in pairs if location == WILDCARD}
+        products = sorted({product for product, _ in pairs})
+        frames: List[pd.DataFrame] = []
+        for start in range(0, len(products), PRODUCTS_PER_READ):
+            inputs = load_net_flow_inputs(product_ids=products[start:start + PRODUCTS_PER_READ])
+            buffers = inputs["buffers"]
+            if buffers.empty:
+                continue
+            keep = (
+                pd.MultiIndex.from_frame(buffers[PAIR].astype(str)).isin(wanted)
+                | buffers["product_id"].astype(str).isin(every_location).to_numpy()
+            )
+            frames.append(compute_net_flow(buffers[keep], inputs["on_hand"], inputs["open_pos"], inputs["open_so"], today))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def refresh(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """Poll the change log and recompute/persist the dirty pairs.
+
+        Dirty pairs are put back if the write fails, so the next refresh
+        retries them.
+
+        Returns:
+            Dictionary with ``changes`` read, ``dirty_pairs``, ``full_refresh``,
+            ``pairs_written``, the ``colors`` histogram and the ``watermark``.
+        """
+        changes = self.poll()
+        if self.full_refresh_due():
+            self.mark_dirty([(WILDCARD, WILDCARD)])
+        full, dirty = self._take_dirty()
+        result: Dict[str, Any] = {
+            "changes": changes,
+            "dirty_pairs": len(dirty),
+            "full_refresh": full,
+            "pairs_written": 0,
+            "colors": {},
+            "watermark": self.watermark,
+        }
+        if not full and not dirty:
+            return result
+
+        try:
+            if full:
+                batch = calculate_net_flow_batch(today=today)
+                self.last_full_refresh = datetime.now(timezone.utc)
+                result.update(pairs_written=batch["pairs"], colors=batch["colors"])
+                return result
+            frame = self.recompute(dirty, today)
+            if not frame.empty:
+                frame["calculated_at"] = datetime.utcnow().isoformat()
+                bulk_upsert("net_flow", frame, on_conflict="product_id,location_id")
+                result.update(pairs_written=len(frame), colors=frame["color"].value_counts().to_dict())
+        except Exception:
+            self._restore_dirty(full, dirty)
+            raise
+        return result
+
+    def prune(self) -> int:
+        """Delete change-log rows already reflected in ``net_flow``; returns the row count."""
+        if not self.watermark:
+            return 0
+        deleted = supabase.table(CHANGE_LOG).delete().lte("id", self.watermark).execute().data
+        return len(deleted or [])
+
+
+_refresher: Optional[IncrementalNetFlow] = None
+_refresher_lock = threading.Lock()
+
+
+def get_refresher() -> IncrementalNetFlow:
+    """Process-wide refresher, so the watermark survives between API calls."""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = IncrementalNetFlow()
+        return _refresher
+
+
+def refresh_net_flow(today: Optional[date] = None) -> Dict[str, Any]:
+    """Incremental net flow refresh with the process-wide refresher."""
+    return get_refresher().refresh(today)
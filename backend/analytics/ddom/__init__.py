@@ -1,9 +1,11 @@
-from .capacity_scheduling import schedule_capacity
-from .execution import execute_orders
+from .capacity_scheduling import schedule_capacity, schedule_capacity_async
+from .execution import execute_orders, execute_orders_async
 from .variance_analysis import analyze_buffer_variance
 
 __all__ = [
     "schedule_capacity",
+    "schedule_capacity_async",
     "execute_orders",
+    "execute_orders_async",
     "analyze_buffer_variance",
 ]
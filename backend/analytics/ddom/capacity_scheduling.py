@@ -6,16 +6,13 @@ This module provides a basic capacity scheduling algorithm for the Demand Driven
 from typing import List, Dict
 from datetime import datetime, timedelta
 
-from ..supabase.supabase_client import supabase
+from backend.supabase import async_client
+from backend.supabase.async_client import run_in_worker
+from backend.supabase.supabase_client import supabase
 
 
-def schedule_capacity(demand: List[Dict[str, float]], capacity_per_day: float) -> List[Dict[str, float]]:
-    """
-    Simple capacity scheduling algorithm.
-    :param demand: List of dictionaries with 'item_id' and 'quantity'.
-    :param capacity_per_day: The available production capacity per day.
-    :return: A list of scheduled orders with 'item_id', 'start_date' and 'quantity'.
-    """
+def _allocate_capacity(demand: List[Dict[str, float]], capacity_per_day: float) -> List[Dict[str, float]]:
+    """Allocate orders to days without touching the database."""
     schedule: List[Dict[str, float]] = []
     current_date = datetime.utcnow().date()
     available_capacity = capacity_per_day
@@ -35,6 +32,17 @@ def schedule_capacity(demand: List[Dict[str, float]], capacity_per_day: float) -
             })
             qty -= allocation
             available_capacity -= allocation
+    return schedule
+
+
+def schedule_capacity(demand: List[Dict[str, float]], capacity_per_day: float) -> List[Dict[str, float]]:
+    """
+    Simple capacity scheduling algorithm.
+    :param demand: List of dictionaries with 'item_id' and 'quantity'.
+    :param capacity_per_day: The available production capacity per day.
+    :return: A list of scheduled orders with 'item_id', 'start_date' and 'quantity'.
+    """
+    schedule = _allocate_capacity(demand, capacity_per_day)
 
     # Insert schedule into Supabase table 'capacity_schedule' (if exists)
     try:
@@ -43,8 +51,23 @@ def schedule_capacity(demand: List[Dict[str, float]], capacity_per_day: float) -
         # ignore errors for now (table may not exist)
         pass
 
-   
-    
+    return schedule
+
+
+async def schedule_capacity_async(demand: List[Dict[str, float]], capacity_per_day: float) -> List[Dict[str, float]]:
+    """
+    Asyncio variant of :func:`schedule_capacity` for ``async def`` API handlers.
+    The allocation loop runs on the analytics worker pool and the insert is awaited,
+    so neither blocks the event loop.
+    """
+    schedule = await run_in_worker(_allocate_capacity, demand, capacity_per_day)
+    try:
+        await async_client.insert('capacity_schedule', schedule)
+    except Exception:
+        # ignore errors for now (table may not exist)
+        pass
+    return schedule
+
 
 def schedule_capacity_dynamic(demand: List[Dict[str, float]], capacity_schedule: Dict[str, float], default_capacity: float = None) -> List[Dict[str, float]]:
     """
@@ -85,4 +108,3 @@ def schedule_capacity_dynamic(demand: List[Dict[str, float]], capacity_schedule:
     except Exception:
         pass
     return schedule
-return schedule
@@ -5,13 +5,21 @@ of DDOM performance. These utilities support higher-level DDS&OP planning and
 performance evaluation.
 """
 
-from .master_settings import get_master_settings, upsert_master_settings
+from .master_settings import (
+    get_master_settings,
+    get_master_settings_async,
+    upsert_master_settings,
+    upsert_master_settings_async,
+)
 from .variance_analysis import perform_variance_analysis
-from .simulation import simulate_ddom_performance
+from .simulation import simulate_ddom_performance, simulate_ddom_performance_async
 
 __all__ = [
     "get_master_settings",
+    "get_master_settings_async",
     "upsert_master_settings",
+    "upsert_master_settings_async",
     "perform_variance_analysis",
     "simulate_ddom_performance",
+    "simulate_ddom_performance_async",
 ]
@@ -6,22 +6,11 @@ and should be stored in a central table. Access to these values supports DDS&OP
 requires visibility into DDOM master settings as part of sales and operations planning.
 """
 
-import os
 from typing import List, Dict, Any
 
-from supabase import create_client
-from dotenv import load_dotenv
-
-# Load environment variables from .env file for local development
-load_dotenv()
-
-# Initialize the Supabase client using environment variables
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-
-supabase = None
-if SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+from backend.supabase import async_client
+from backend.supabase.cache import cached, cached_async, invalidate
+from backend.supabase.supabase_client import is_configured, supabase
 
 
 def get_master_settings() -> List[Dict[str, Any]]:
@@ -30,11 +19,13 @@ def get_master_settings() -> List[Dict[str, Any]]:
     Returns a list of dictionaries representing settings. If no settings are found or
     the Supabase client is not configured, returns an empty list.
     """
-    if supabase is None:
+    if not is_configured():
         return []
     try:
-        response = supabase.table("ddom_master_settings").select("*").execute()
-        data = response.data or []
+        data = cached(
+            "ddom_master_settings", "all",
+            lambda: supabase.table("ddom_master_settings").select("*").execute().data or [],
+        )
         # You might want to post-process or validate the settings here
         return data
     except Exception:
@@ -51,11 +42,36 @@ def upsert_master_settings(settings: List[Dict[str, Any]]) -> bool:
     Returns:
         True if the operation succeeds, False otherwise.
     """
-    if supabase is None:
+    if not is_configured():
         return False
     try:
         # Upsert ensures existing records are updated and new ones inserted
         supabase.table("ddom_master_settings").upsert(settings).execute()
+        invalidate("ddom_master_settings")
+        return True
+    except Exception:
+        return False
+
+
+async def get_master_settings_async() -> List[Dict[str, Any]]:
+    """Asyncio variant of :func:`get_master_settings` for ``async def`` API handlers."""
+    if not is_configured():
+        return []
+    try:
+        return await cached_async(
+            "ddom_master_settings", "all", lambda: async_client.fetch("ddom_master_settings")
+        )
+    except Exception:
+        return []
+
+
+async def upsert_master_settings_async(settings: List[Dict[str, Any]]) -> bool:
+    """Asyncio variant of :func:`upsert_master_settings`."""
+    if not is_configured():
+        return False
+    try:
+        await async_client.upsert("ddom_master_settings", settings)
+        invalidate("ddom_master_settings")
         return True
     except Exception:
         return False
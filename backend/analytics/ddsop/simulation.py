@@ -6,10 +6,11 @@ strategic decisions and assess system performance with respect to demand, capaci
 and inventory policies.
 """
 
+import asyncio
 from typing import List, Dict, Any
 
 # Import capacity scheduling function from the DDOM analytics package
-from ..ddom.capacity_scheduling import schedule_capacity
+from ..ddom.capacity_scheduling import schedule_capacity, schedule_capacity_async
 
 
 def simulate_ddom_performance(scenarios: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -29,9 +30,28 @@ def simulate_ddom_performance(scenarios: List[Dict[str, Any]]) -> Dict[str, Any]
         orders = scenario.get("orders", [])
         capacity = scenario.get("capacity_per_day", 0)
         try:
-            schedule = schedule_capacity(orders=orders, capacity_per_day=capacity)
+            schedule = schedule_capacity(orders, capacity_per_day=capacity)
             results[name] = schedule
         except Exception as exc:
             # In production you would log the exception and include more details
             results[name] = {"error": str(exc)}
     return results
+
+
+async def simulate_ddom_performance_async(scenarios: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Asyncio variant of :func:`simulate_ddom_performance`.
+
+    Scenarios are scheduled concurrently; the shared async client bounds how
+    many database writes are in flight at once.
+    """
+
+    async def run(scenario: Dict[str, Any]) -> Any:
+        try:
+            return await schedule_capacity_async(
+                scenario.get("orders", []), capacity_per_day=scenario.get("capacity_per_day", 0)
+            )
+        except Exception as exc:
+            return {"error": str(exc)}
+
+    schedules = await asyncio.gather(*(run(scenario) for scenario in scenarios))
+    return {scenario.get("name", "scenario"): schedule for scenario, schedule in zip(scenarios, schedules)}
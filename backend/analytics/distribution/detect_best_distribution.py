@@ -1,59 +1,181 @@
+import os
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from scipy import stats
-from backend.supabase.supabase_client import supabase
+from backend.analytics.distribution.distribution_fitting import fit_many
+from backend.supabase import sales_snapshot
+from backend.supabase.bulk import bulk_upsert, read_table
 import logging
 
 # === Logging Setup ===
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Fitting is CPU-bound: nodes are fanned out over a process pool, submitted in
+# chunks of DISTRIBUTION_CHUNK_SIZE nodes. DISTRIBUTION_WORKERS=1 fits in-process.
+WORKERS = int(os.getenv("DISTRIBUTION_WORKERS", "0")) or os.cpu_count() or 1
+CHUNK_SIZE = int(os.getenv("DISTRIBUTION_CHUNK_SIZE", "500"))
+MIN_SAMPLES = 5
+# Nodes whose stored fingerprint still matches their sales are not refitted. With a
+# positive threshold, changed nodes whose mean and std moved by at most this
+# relative amount since their last fit keep their profile as well.
+DRIFT_THRESHOLD = float(os.getenv("DISTRIBUTION_DRIFT_THRESHOLD", "0"))
+FULL_REFIT = os.getenv("DISTRIBUTION_FULL_REFIT", "0") == "1"
+FINGERPRINT_COLUMNS = ['sample_count', 'last_sales_date', 'sales_sum', 'sales_sum_squares']
+
 # === Step 1: Fetch active demand nodes ===
 def fetch_active_nodes():
-    response = supabase.table('active_demand_nodes').select('product_id, location_id').execute()
-    return pd.DataFrame(response.data or [])
+    return read_table('active_demand_nodes', key=('product_id', 'location_id'))
 
 # === Step 2: Fetch historical sales data ===
 def fetch_sales_data():
-    response = supabase.table('historical_sales_data').select('product_id, location_id, quantity_sold').execute()
-    return pd.DataFrame(response.data or [])
+    if sales_snapshot.SNAPSHOT_ENABLED:
+        # Delta-sync the local columnar snapshot, then read it without touching the network
+        sales_snapshot.sync_sales_snapshot()
+        return sales_snapshot.load_sales(columns=['product_id', 'location_id', 'sales_date', 'quantity_sold'])
+    return read_table('historical_sales_data', key='sales_id', columns='product_id, location_id, sales_date, quantity_sold')
+
+# === Step 2b: Fingerprint nodes and select the ones to refit ===
+def _as_date(values):
+    return pd.to_datetime(values, errors='coerce').dt.strftime('%Y-%m-%d')
+
+def node_fingerprints(sales_df):
+    """Row count, last sales date and sum / sum of squares of the quantities per node."""
+    frame = sales_df.dropna(subset=['quantity_sold'])
+    quantity = frame['quantity_sold'].astype(float)
+    frame = frame.assign(quantity=quantity, squares=quantity ** 2, last_sales_date=_as_date(frame['sales_date']))
+    return (
+        frame.groupby(['product_id', 'location_id'])
+        .agg(sample_count=('quantity', 'size'), last_sales_date=('last_sales_date', 'max'),
+             sales_sum=('quantity', 'sum'), sales_sum_squares=('squares', 'sum'))
+        .reset_index()
+    )
+
+def load_profile_fingerprints():
+    """Fingerprints stored with the current profiles (empty when none can be read)."""
+    try:
+        stored = read_table('demand_distribution_profile', key=('product_id', 'location_id'),
+                            columns='product_id, location_id, ' + ', '.join(FINGERPRINT_COLUMNS))
+    except Exception as e:
+        logging.warning(f"⚠️ Could not load stored fingerprints, refitting every node: {e}")
+        return pd.DataFrame()
+    if not stored.empty:
+        stored['last_sales_date'] = _as_date(stored['last_sales_date'])
+    return stored
+
+def _moments(count, total, squares):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean ** 2, 0.0))
+    return mean, std
+
+def needs_refit(current, stored, threshold=None):
+    """Boolean mask over ``current`` fingerprints: True where the node must be refitted."""
+    threshold = DRIFT_THRESHOLD if threshold is None else threshold
+    if stored.empty:
+        return np.ones(len(current), dtype=bool)
+    merged = current.merge(stored, on=['product_id', 'location_id'], how='left', suffixes=('', '_stored'))
+    count, count_0 = merged['sample_count'].to_numpy(float), merged['sample_count_stored'].to_numpy(float)
+    total, total_0 = merged['sales_sum'].to_numpy(float), merged['sales_sum_stored'].to_numpy(float)
+    squares, squares_0 = merged['sales_sum_squares'].to_numpy(float), merged['sales_sum_squares_stored'].to_numpy(float)
+    same = (
+        (count == count_0)
+        & (merged['last_sales_date'] == merged['last_sales_date_stored']).to_numpy()
+        & np.isclose(total, total_0, rtol=1e-9)
+        & np.isclose(squares, squares_0, rtol=1e-9)
+    )
+    mean, std = _moments(count, total, squares)
+    mean_0, std_0 = _moments(count_0, total_0, squares_0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drift = np.maximum(np.abs(mean - mean_0) / np.abs(mean_0), np.abs(std - std_0) / std_0)
+    drift = np.where(np.isnan(drift), np.inf, drift)
+    return ~(same | (drift <= threshold))
 
 # === Step 3: Detect best fitting distribution ===
 def detect_distribution(sales):
-    distributions = ['norm', 'lognorm', 'gamma', 'beta']
-    best_fit = None
-    best_p = 0
-
-    for dist_name in distributions:
-        dist = getattr(stats, dist_name)
-        try:
-            params = dist.fit(sales)
-            _, p_value = stats.kstest(sales, dist_name, args=params)
-            if p_value > best_p:
-                best_p = p_value
-                best_fit = (dist_name, params)
-        except Exception as e:
-            logging.warning(f"⚠️ Failed fitting {dist_name}: {e}")
-            continue
-
-    return best_fit
+    return fit_many([sales])[0]
+
+# === Step 3b: Partition sales once and fit nodes in parallel ===
+def partition_sales(sales_df):
+    """Sort the sales by node once and return ``{(product_id, location_id): quantities}``.
+
+    Each value is a slice of one sorted array, located through group offsets,
+    so building the map costs one sort instead of a mask per node.
+    """
+    if sales_df.empty:
+        return {}
+    frame = sales_df[['product_id', 'location_id', 'quantity_sold']].dropna(subset=['quantity_sold'])
+    frame = frame.sort_values(['product_id', 'location_id'], kind='mergesort')
+    products = frame['product_id'].to_numpy()
+    locations = frame['location_id'].to_numpy()
+    values = frame['quantity_sold'].to_numpy(dtype=float)
+    if not len(values):
+        return {}
+    changed = (products[1:] != products[:-1]) | (locations[1:] != locations[:-1])
+    starts = np.concatenate([[0], np.flatnonzero(changed) + 1])
+    ends = np.append(starts[1:], len(values))
+    return {(products[start], locations[start]): values[start:end] for start, end in zip(starts, ends)}
+
+def skip_reason(sales):
+    """Why a node's sales cannot be fitted, or ``None`` when they can."""
+    if len(sales) < MIN_SAMPLES:
+        return f"Not enough samples ({len(sales)})"
+    if np.any(sales <= 0):
+        return "Contains zero or negative sales"
+    return None
+
+def _fit_chunk(tasks):
+    # Top-level so it can be pickled into worker processes; the chunk's
+    # series are fitted together by the vectorised engine
+    reasons = [skip_reason(sales) for _, _, sales in tasks]
+    fits = iter(fit_many([sales for (_, _, sales), reason in zip(tasks, reasons) if reason is None]))
+    results = []
+    for (product_id, location_id, _), reason in zip(tasks, reasons):
+        best_fit = next(fits) if reason is None else None
+        if reason is None and best_fit is None:
+            reason = "No valid distribution fit"
+        if reason is not None:
+            results.append((product_id, location_id, 'skipped', reason))
+        else:
+            dist_name, params = best_fit
+            results.append((product_id, location_id, 'fitted', build_profile(product_id, location_id, dist_name, params)))
+    return results
+
+def fit_nodes(tasks, workers=None, chunk_size=None):
+    """Fit ``(product_id, location_id, sales)`` tasks, in a process pool when ``workers > 1``."""
+    workers = workers or WORKERS
+    chunk_size = max(1, chunk_size or CHUNK_SIZE)
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return [result for chunk in chunks for result in _fit_chunk(chunk)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        return [result for chunk_results in executor.map(_fit_chunk, chunks) for result in chunk_results]
 
 # === Step 4: Store results in Supabase ===
-def store_profile(product_id, location_id, distribution, params):
-    supabase.table('demand_distribution_profile').upsert({
+def build_profile(product_id, location_id, distribution, params):
+    return {
         'product_id': product_id,
         'location_id': location_id,
         'distribution_type': distribution,
         'param1': params[0],
         'param2': params[1] if len(params) > 1 else None
-    }).execute()
+    }
+
+def store_profiles(profiles):
+    return bulk_upsert('demand_distribution_profile', profiles, on_conflict='product_id,location_id')
 
 # === Main function ===
-def main():
+def main(workers=None, chunk_size=None, full_refit=None):
+    """Fit the active nodes whose sales changed since their stored profile.
+
+    Returns a summary dict with the number of nodes, fits, fits skipped
+    because the node's fingerprint was unchanged, and nodes without a valid fit.
+    """
     logging.info("📥 Fetching active demand nodes...")
     nodes = fetch_active_nodes()
     if nodes.empty:
         logging.warning("❌ No active demand nodes found. Exiting.")
-        return
+        return None
 
     logging.info(f"✅ Found {len(nodes)} active demand nodes.")
 
@@ -61,33 +183,48 @@ def main():
     sales_df = fetch_sales_data()
     if sales_df.empty:
         logging.warning("❌ No historical sales data found. Exiting.")
-        return
-
-    total_inserted = 0
-
-    for _, row in nodes.iterrows():
-        product_id, location_id = row['product_id'], row['location_id']
-        group = sales_df[(sales_df['product_id'] == product_id) & (sales_df['location_id'] == location_id)]
-        sales = group['quantity_sold'].dropna().values
-
-        if len(sales) < 5:
-            logging.info(f"🚫 Skipping {product_id} @ {location_id} → Not enough samples ({len(sales)})")
-            continue
-
-        if np.any(sales <= 0):
-            logging.info(f"🚫 Skipping {product_id} @ {location_id} → Contains zero or negative sales")
-            continue
-
-        best_fit = detect_distribution(sales)
-        if best_fit:
-            dist_name, params = best_fit
-            store_profile(product_id, location_id, dist_name, params)
-            logging.info(f"✅ Inserted {product_id} @ {location_id} → {dist_name}")
-            total_inserted += 1
+        return None
+
+    fingerprints = node_fingerprints(sales_df)
+    fingerprints = nodes[['product_id', 'location_id']].merge(fingerprints, on=['product_id', 'location_id'])
+    full_refit = FULL_REFIT if full_refit is None else full_refit
+    stored = pd.DataFrame() if full_refit else load_profile_fingerprints()
+    refit = fingerprints[needs_refit(fingerprints, stored)]
+    unchanged = len(fingerprints) - len(refit)
+    logging.info(f"🔁 {len(refit)} nodes changed, {unchanged} fits skipped (unchanged fingerprint)")
+
+    groups = partition_sales(sales_df)
+    empty = np.empty(0)
+    # Nodes without sales have no fingerprint; they are passed through to be reported as skipped
+    without_sales = ~nodes.set_index(['product_id', 'location_id']).index.isin(
+        fingerprints.set_index(['product_id', 'location_id']).index)
+    tasks = [(product_id, location_id, empty)
+             for product_id, location_id in zip(nodes['product_id'][without_sales], nodes['location_id'][without_sales])]
+    tasks += [(product_id, location_id, groups[(product_id, location_id)])
+              for product_id, location_id in zip(refit['product_id'], refit['location_id'])]
+    refit_fingerprints = refit.set_index(['product_id', 'location_id'])[FINGERPRINT_COLUMNS].to_dict('index')
+    fitted_at = datetime.utcnow().isoformat()
+
+    logging.info(f"⚙️ Fitting {len(tasks)} nodes with {workers or WORKERS} workers...")
+    profiles = []
+    for product_id, location_id, status, detail in fit_nodes(tasks, workers, chunk_size):
+        if status == 'fitted':
+            profiles.append({**detail, **refit_fingerprints[(product_id, location_id)], 'fitted_at': fitted_at})
+            logging.info(f"✅ Fitted {product_id} @ {location_id} → {detail['distribution_type']}")
         else:
-            logging.info(f"🚫 Skipping {product_id} @ {location_id} → No valid distribution fit")
-
-    logging.info(f"🎯 Distribution detection completed. Total inserted: {total_inserted}")
+            logging.info(f"🚫 Skipping {product_id} @ {location_id} → {detail}")
+
+    write_stats = store_profiles(profiles)
+    logging.info(f"💾 Stored {write_stats['rows_written']} profiles in {write_stats['chunks']} chunks "
+                 f"({write_stats['rows_per_second']} rows/s)")
+
+    logging.info(f"🎯 Distribution detection completed. Total inserted: {write_stats['rows_written']}")
+    return {
+        'nodes': len(nodes),
+        'fitted': len(profiles),
+        'skipped_unchanged': unchanged,
+        'skipped_invalid': len(tasks) - len(profiles),
+    }
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,159 @@
+"""
+Fast-path distribution fitting for many demand series at once.
+
+``scipy``'s generic ``dist.fit`` runs a numerical optimiser per candidate
+and per series.  For the candidates used by distribution detection the
+estimates have closed or near-closed forms:
+
+* ``norm``    -- MLE mean and (population) standard deviation;
+* ``lognorm`` -- MLE on ``log(x)`` with ``loc = 0``;
+* ``gamma``   -- Minka's approximation of the shape MLE with ``loc = 0``
+  (within ~1.5% of the exact root), scale = mean / shape;
+* ``beta``    -- only attempted when every value lies in ``(0, 1)``, through
+  the ``scipy`` fallback.
+
+Candidates whose support does not contain the data are skipped instead of
+being fitted and failing.  Parameters are returned in ``scipy``'s order
+(shape(s), loc, scale), so they can be passed to ``stats.<dist>`` directly.
+
+Goodness of fit is the one-sample KS test.  :func:`ks_statistics`
+concatenates the sorted series, evaluates every CDF in one call per
+candidate and reduces the per-point deviations per series with
+``np.maximum.reduceat``.  For a fixed sample size the KS p-value is strictly
+decreasing in the statistic, so the candidate with the highest p-value is
+the one with the smallest statistic and the exact p-value (the expensive
+part of ``stats.kstest``) never has to be evaluated; a fit is accepted while
+its statistic is below 1, i.e. while its p-value is positive.
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import stats
+
+CANDIDATES = ("norm", "lognorm", "gamma", "beta")
+
+Fit = Tuple[str, Tuple[float, ...]]
+
+
+def _supported(dist_name: str, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+    if dist_name in ("lognorm", "gamma"):
+        return low > 0
+    if dist_name == "beta":
+        return (low > 0) & (high < 1)
+    return np.ones(len(low), dtype=bool)
+
+
+def _segment_stats(flat: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-series mean, population std and mean/std of the logs (NaN where undefined)."""
+    mean = np.add.reduceat(flat, starts) / counts
+    centred = flat - np.repeat(mean, counts)
+    std = np.sqrt(np.add.reduceat(centred ** 2, starts) / counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log(np.where(flat > 0, flat, np.nan))
+    log_mean = np.add.reduceat(logs, starts) / counts
+    log_centred = logs - np.repeat(log_mean, counts)
+    log_std = np.sqrt(np.add.reduceat(log_centred ** 2, starts) / counts)
+    return {"mean": mean, "std": std, "log_mean": log_mean, "log_std": log_std}
+
+
+def closed_form_params(dist_name: str, moments: Dict[str, np.ndarray]) -> np.ndarray:
+    """``(m, k)`` parameter matrix in ``scipy`` order; rows are NaN when no estimate exists."""
+    mean, std = moments["mean"], moments["std"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if dist_name == "norm":
+            params = np.column_stack([mean, std])
+        elif dist_name == "lognorm":
+            params = np.column_stack([moments["log_std"], np.zeros_like(mean), np.exp(moments["log_mean"])])
+        elif dist_name == "gamma":
+            s = np.log(mean) - moments["log_mean"]
+            shape = (3 - s + np.sqrt((s - 3) ** 2 + 24 * s)) / (12 * s)
+            params = np.column_stack([shape, np.zeros_like(mean), mean / shape])
+        else:
+            return np.full((len(mean), 4), np.nan)
+    valid = np.all(np.isfinite(params), axis=1) & (params[:, -1] > 0)
+    if dist_name != "norm":
+        valid &= params[:, 0] > 0
+    params[~valid] = np.nan
+    return params
+
+
+def ks_statistics(
+    dist_name: str,
+    params: np.ndarray,
+    flat: np.ndarray,
+    starts: np.ndarray,
+    counts: np.ndarray,
+) -> np.ndarray:
+    """Two-sided KS statistics of sorted series (concatenated in ``flat``) against fitted CDFs."""
+    dist = getattr(stats, dist_name)
+    columns = [np.repeat(params[:, j], counts) for j in range(params.shape[1])]
+    cdf = dist.cdf(flat, *columns)
+    n = np.repeat(counts, counts)
+    rank = np.arange(len(flat)) - np.repeat(starts, counts) + 1
+    deviation = np.maximum(rank / n - cdf, cdf - (rank - 1) / n)
+    return np.maximum.reduceat(deviation, starts)
+
+
+def _scipy_fit(dist_name: str, series: np.ndarray) -> Optional[Tuple[Tuple[float, ...], float]]:
+    """Generic numeric fit plus KS test, for the cases the fast path cannot estimate."""
+    try:
+        params = getattr(stats, dist_name).fit(series)
+        statistic, _ = stats.kstest(series, dist_name, args=params)
+        return tuple(float(p) for p in params), float(statistic)
+    except Exception as e:
+        logging.warning(f"⚠️ Failed fitting {dist_name}: {e}")
+        return None
+
+
+def fit_many(
+    series: Sequence[np.ndarray],
+    candidates: Sequence[str] = CANDIDATES,
+) -> List[Optional[Fit]]:
+    """Best-fitting candidate (smallest KS statistic) for each series.
+
+    Returns:
+        One ``(dist_name, params)`` per series, or ``None`` when no candidate
+        could be fitted.
+    """
+    if not len(series):
+        return []
+    arrays = [np.sort(np.asarray(s, dtype=float)) for s in series]
+    counts = np.array([len(a) for a in arrays])
+    best: List[Optional[Fit]] = [None] * len(arrays)
+    best_d = np.ones(len(arrays))
+
+    usable = np.flatnonzero(counts > 0)
+    if not len(usable):
+        return best
+    flat = np.concatenate([arrays[i] for i in usable])
+    used_counts = counts[usable]
+    starts = np.concatenate([[0], np.cumsum(used_counts)[:-1]])
+    low = flat[starts]
+    high = flat[starts + used_counts - 1]
+    moments = _segment_stats(flat, starts, used_counts)
+    # Constant series have no spread to fit (scipy would return degenerate scales)
+    spread = moments["std"] > 0
+
+    for dist_name in candidates:
+        supported = _supported(dist_name, low, high) & spread
+        if not supported.any():
+            continue
+        params = closed_form_params(dist_name, moments)
+        fast = supported & ~np.isnan(params).any(axis=1)
+        # Rows without an estimate carry NaN parameters and come out as NaN
+        with np.errstate(invalid="ignore"):
+            statistics = ks_statistics(dist_name, params, flat, starts, used_counts)
+        fitted = {row: tuple(float(p) for p in params[row]) for row in np.flatnonzero(fast)}
+        for row in np.flatnonzero(supported & ~fast):
+            fallback = _scipy_fit(dist_name, arrays[usable[row]])
+            if fallback is not None:
+                fitted[row], statistics[row] = fallback
+
+        for row, row_params in fitted.items():
+            index = usable[row]
+            if statistics[row] < best_d[index]:
+                best_d[index] = statistics[row]
+                best[index] = (dist_name, row_params)
+    return best
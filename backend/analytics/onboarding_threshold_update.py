@@ -1,5 +1,6 @@
 import pandas as pd
 from datetime import datetime
+from backend.supabase.cache import invalidate
 from backend.supabase.supabase_client import supabase  # ✅ الاتصال المركزي
 
 def update_thresholds(demand_variability_threshold, decoupling_threshold):
@@ -10,6 +11,7 @@ def update_thresholds(demand_variability_threshold, decoupling_threshold):
         "first_time_adjusted": True,
         "updated_at": datetime.utcnow().isoformat()
     }).eq("id", 1).execute()
+    invalidate("threshold_config")
 
     if response.status_code == 200:
         print(f"✅ Thresholds updated successfully: DVT={demand_variability_threshold}, DT={decoupling_threshold}")
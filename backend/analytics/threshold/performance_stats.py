@@ -0,0 +1,176 @@
+"""
+Running sufficient statistics of ``performance_tracking``.
+
+Both Bayesian threshold updaters only need a few aggregates of the
+performance history: the number of periods, the count / sum / sum of
+squares of ``service_level`` (for its mean and sample variance)
+and the totals of ``stockout_count`` and ``overstock_count`` (for the
+rates).  These are kept in one ``threshold_performance_stats`` row together
+with a watermark, the largest ``THRESHOLD_STATS_WATERMARK_COLUMN`` value
+(``id`` by default) folded in so far.  :func:`refresh_performance_stats`
+reads only the rows past the watermark, adds their aggregates and saves the
+row back, so each run costs O(new periods) while the mean, variance and
+rates equal those of a full recompute.
+
+The watermark assumes the column increases with insertion order (a serial
+id or insert timestamp).  A serial id is drawn before its transaction
+commits, so a lower id can appear after a higher one was read: the
+watermark only moves over the leading run of rows last written more than
+``THRESHOLD_STATS_SAFETY_LAG_SECONDS`` ago (by ``updated_at``), and newer
+rows are folded on a later run.  Rows updated or deleted after they were
+folded in are not seen by the incremental path, so a refresh rebuilds the
+statistics from the whole table once the last rebuild is
+``THRESHOLD_STATS_FULL_REBUILD_DAYS`` old (0 disables); ``full=True``
+forces one.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.supabase.bulk import read_table
+from backend.supabase.supabase_client import supabase
+
+STATS_TABLE = "threshold_performance_stats"
+SOURCE_TABLE = "performance_tracking"
+WATERMARK_COLUMN = os.getenv("THRESHOLD_STATS_WATERMARK_COLUMN", "id")
+SERVICE_COLUMN = "service_level"
+# Last-write timestamp of a period; rows written within the lag are not folded yet
+WRITTEN_COLUMN = "updated_at"
+SAFETY_LAG_SECONDS = float(os.getenv("THRESHOLD_STATS_SAFETY_LAG_SECONDS", "60"))
+FULL_REBUILD_DAYS = float(os.getenv("THRESHOLD_STATS_FULL_REBUILD_DAYS", "7"))
+COUNTERS = ("periods", "service_count", "service_sum", "service_sum_squares", "stockout_total", "overstock_total")
+
+
+class PerformanceStats:
+    """Sufficient statistics of the performance history up to a watermark."""
+
+    def __init__(self, watermark: Any = None, full_rebuilt_at: Optional[datetime] = None, **counters: float):
+        self.watermark = watermark
+        self.full_rebuilt_at = full_rebuilt_at
+        for name in COUNTERS:
+            setattr(self, name, float(counters.get(name) or 0.0))
+
+    def fold(self, df: pd.DataFrame) -> "PerformanceStats":
+        """Add the aggregates of new performance rows and advance the watermark."""
+        if df.empty:
+            return self
+        service = pd.to_numeric(df[SERVICE_COLUMN], errors="coerce").dropna()
+        self.periods += len(df)
+        self.service_count += len(service)
+        self.service_sum += float(service.sum())
+        self.service_sum_squares += float((service ** 2).sum())
+        self.stockout_total += float(pd.to_numeric(df["stockout_count"], errors="coerce").sum())
+        self.overstock_total += float(pd.to_numeric(df["overstock_count"], errors="coerce").sum())
+        if WATERMARK_COLUMN in df:
+            latest = df[WATERMARK_COLUMN].max()
+            if self.watermark is None or latest > self.watermark:
+                self.watermark = latest.item() if isinstance(latest, np.generic) else latest
+        return self
+
+    @property
+    def service_mean(self) -> float:
+        return self.service_sum / self.service_count if self.service_count else float("nan")
+
+    @property
+    def service_variance(self) -> float:
+        """Sample variance (``ddof=1``), as ``Series.var``."""
+        if self.service_count < 2:
+            return float("nan")
+        centred = self.service_sum_squares - self.service_sum ** 2 / self.service_count
+        return max(centred, 0.0) / (self.service_count - 1)
+
+    @property
+    def stockout_rate(self) -> float:
+        return self.stockout_total / self.periods if self.periods else float("nan")
+
+    @property
+    def overstock_rate(self) -> float:
+        return self.overstock_total / self.periods if self.periods else float("nan")
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "source_table": SOURCE_TABLE,
+            "watermark": None if self.watermark is None else str(self.watermark),
+            "full_rebuilt_at": self.full_rebuilt_at.isoformat() if self.full_rebuilt_at else None,
+            **{name: getattr(self, name) for name in COUNTERS},
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+
+
+def _watermark_value(value: Any) -> Any:
+    """Stored watermarks are text; numeric ids are compared as numbers."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def load_stats() -> PerformanceStats:
+    """Saved statistics (empty ones when none are saved or the table is missing)."""
+    try:
+        rows = supabase.table(STATS_TABLE).select("*").eq("source_table", SOURCE_TABLE).limit(1).execute().data
+    except Exception as e:
+        print(f"⚠️ Could not load performance statistics, recomputing: {e}")
+        rows = []
+    if not rows:
+        return PerformanceStats()
+    row = rows[0]
+    rebuilt = pd.to_datetime(row.get("full_rebuilt_at"), utc=True)
+    return PerformanceStats(
+        _watermark_value(row.get("watermark")),
+        None if pd.isna(rebuilt) else rebuilt.to_pydatetime(),
+        **{name: row.get(name) for name in COUNTERS},
+    )
+
+
+def save_stats(stats: PerformanceStats) -> None:
+    supabase.table(STATS_TABLE).upsert(stats.to_record(), on_conflict="source_table").execute()
+
+
+def fetch_new_performance(watermark: Any = None) -> pd.DataFrame:
+    """``performance_tracking`` rows past ``watermark`` (all rows when ``None``)."""
+    filters = [(WATERMARK_COLUMN, "gt", watermark)] if watermark is not None else None
+    columns = dict.fromkeys(["id", WATERMARK_COLUMN, SERVICE_COLUMN, "stockout_count", "overstock_count", WRITTEN_COLUMN])
+    return read_table(SOURCE_TABLE, key="id", columns=", ".join(columns), filters=filters)
+
+
+def settled_rows(df: pd.DataFrame, now: Optional[datetime] = None) -> pd.DataFrame:
+    """The leading run of ``df`` (in watermark order) written before the safety lag."""
+    if df.empty or WRITTEN_COLUMN not in df:
+        return df
+    df = df.sort_values(WATERMARK_COLUMN, kind="stable")
+    cutoff = pd.Timestamp(now or datetime.now(timezone.utc)) - pd.Timedelta(seconds=SAFETY_LAG_SECONDS)
+    written = pd.to_datetime(df[WRITTEN_COLUMN], utc=True)
+    unsettled = np.flatnonzero((written > cutoff).to_numpy())
+    return df if not len(unsettled) else df.iloc[:unsettled[0]]
+
+
+def full_rebuild_due(stats: PerformanceStats, now: Optional[datetime] = None) -> bool:
+    """Whether the statistics were never rebuilt or the last rebuild is ``FULL_REBUILD_DAYS`` old."""
+    if FULL_REBUILD_DAYS <= 0:
+        return False
+    if stats.full_rebuilt_at is None:
+        return True
+    now = now or datetime.now(timezone.utc)
+    return now - stats.full_rebuilt_at >= timedelta(days=FULL_REBUILD_DAYS)
+
+
+def refresh_performance_stats(full: bool = False) -> PerformanceStats:
+    """Fold the performance rows added since the last run into the saved statistics."""
+    now = datetime.now(timezone.utc)
+    stats = None if full else load_stats()
+    if stats is None or full_rebuild_due(stats, now):
+        full, stats = True, PerformanceStats(full_rebuilt_at=now)
+    new_rows = settled_rows(fetch_new_performance(stats.watermark), now)
+    print(f"📥 Folding {len(new_rows)} new performance periods into {int(stats.periods)} seen"
+          + (" (full rebuild)" if full else ""))
+    stats.fold(new_rows)
+    if full or not new_rows.empty:
+        save_stats(stats)
+    return stats
@@ -1,19 +1,17 @@
 import pandas as pd
 from datetime import datetime
 import numpy as np
+from backend.analytics.threshold.performance_stats import PerformanceStats, refresh_performance_stats
+from backend.supabase.cache import invalidate
 from backend.supabase.supabase_client import supabase  # ✅ الاتصال المركزي
 
-# --- Step 1: Fetch historical performance data ---
-def fetch_performance_data():
-    response = supabase.table('performance_tracking').select('*').execute()
-    data = response.data
-    return pd.DataFrame(data)
-
-# --- Step 2: Bayesian Update Logic ---
+# --- Step 1: Bayesian Update Logic ---
 def bayesian_threshold_update(df):
-    total_periods = len(df)
-    stockout_rate = df['stockout_count'].sum() / total_periods
-    overstock_rate = df['overstock_count'].sum() / total_periods
+    return thresholds_from_stats(PerformanceStats().fold(df))
+
+def thresholds_from_stats(stats):
+    stockout_rate = stats.stockout_rate
+    overstock_rate = stats.overstock_rate
 
     new_demand_threshold = 0.6 + stockout_rate * 0.2 - overstock_rate * 0.1
     new_decoupling_threshold = 0.75 + stockout_rate * 0.1 - overstock_rate * 0.05
@@ -23,25 +21,26 @@ def bayesian_threshold_update(df):
 
     return new_demand_threshold, new_decoupling_threshold
 
-# --- Step 3: Update the threshold_config table ---
+# --- Step 2: Update the threshold_config table ---
 def update_threshold_config(new_demand, new_decoupling):
     supabase.table('threshold_config').update({
         "demand_variability_threshold": new_demand,
         "decoupling_threshold": new_decoupling,
         "updated_at": datetime.utcnow().isoformat()
     }).eq('id', 1).execute()
+    invalidate('threshold_config')
 
 # --- Main Execution ---
-def main():
-    print("🔄 Fetching performance data...")
-    df = fetch_performance_data()
+def main(full=False):
+    print("🔄 Fetching new performance data...")
+    stats = refresh_performance_stats(full=full)
 
-    if df.empty:
+    if not stats.periods:
         print("⚠️ No performance data found. Skipping threshold update.")
         return
 
     print("📊 Running Bayesian threshold update...")
-    new_demand, new_decoupling = bayesian_threshold_update(df)
+    new_demand, new_decoupling = thresholds_from_stats(stats)
 
     print(f"✅ New thresholds calculated: Demand = {new_demand:.2f}, Decoupling = {new_decoupling:.2f}")
 
@@ -1,13 +1,26 @@
-from fastapi import APIRouter, HTTPException
+import io
+import json
+from datetime import date
+
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 
 # Import DDMRP analytics functions
 from analytics.ddmrp.decoupled_lead_time import calculate_decoupled_lead_time
-from analytics.ddmrp.buffer_profiles import calculate_buffer_profiles
+from analytics.ddmrp.adu_engine import item_adu
+from analytics.ddmrp.buffer_profiles import calculate_buffer_profiles, calculate_buffer_profiles_batch
 from analytics.ddmrp.dynamic_buffer_adjustments import adjust_buffer_levels
+from analytics.ddmrp.adjustment_calendar import PLAN_HORIZON_DAYS, calculate_buffer_zone_plan
 from analytics.ddmrp.net_flow_calculation import calculate_net_flow
+from analytics.ddmrp.net_flow_batch import calculate_net_flow_batch
+from analytics.ddmrp.net_flow_incremental import refresh_net_flow
 from analytics.ddmrp.alerts import generate_alerts
+from analytics.ddmrp.decoupling_scoring import designate_decoupling_points
+from backend.supabase.async_client import run_in_worker
+from backend.supabase.cache import cache_stats
+from backend.supabase.supabase_client import request_counts
 
 
 router = APIRouter(prefix="/ddmrp", tags=["ddmrp"])
@@ -60,6 +73,93 @@ def run_buffer_profiles(request: BufferProfileRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+BATCH_REQUIRED_COLUMNS = ["item_id", "decoupled_lead_time", "minimum_order_quantity"]
+BATCH_NUMERIC_COLUMNS = ["average_daily_demand", "decoupled_lead_time", "minimum_order_quantity", "variability_factor"]
+
+
+class BufferProfileBatchResponse(BaseModel):
+    count: int
+    compute_seconds: float
+    write_stats: Optional[Dict[str, Any]] = None
+    profiles: Optional[List[Dict[str, Any]]] = None
+
+
+def _parse_buffer_profile_batch(body: bytes, content_type: str) -> pd.DataFrame:
+    """Parse a JSON array or an NDJSON body into a column frame."""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        frame = pd.read_json(io.BytesIO(body), lines=True, dtype=False) if body.strip() else pd.DataFrame()
+    else:
+        records = json.loads(body or b"[]")
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON array of buffer profile requests")
+        frame = pd.DataFrame.from_records(records)
+    missing = [c for c in BATCH_REQUIRED_COLUMNS if c not in frame.columns] if len(frame) else []
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    if "variability_factor" not in frame.columns:
+        frame["variability_factor"] = 1.0
+    numeric = frame.reindex(columns=BATCH_NUMERIC_COLUMNS)
+    numeric = numeric.apply(pd.to_numeric, errors="coerce")
+    numeric["variability_factor"] = numeric["variability_factor"].fillna(1.0)
+    item_ids = frame.get("item_id", pd.Series(dtype=object))
+    blank = item_ids.isna() | (item_ids.astype(str).str.strip() == "")
+    if blank.any():
+        raise ValueError(f"Missing item_id in {int(blank.sum())} row(s)")
+    # Rows without an ADU take it from the rolling ADU engine's saved state
+    no_adu = frame.reindex(columns=["average_daily_demand"])["average_daily_demand"].isna()
+    if no_adu.any():
+        locations = frame["location_id"][no_adu] if "location_id" in frame.columns else None
+        numeric.loc[no_adu, "average_daily_demand"] = item_adu(item_ids[no_adu].astype(str).tolist(), locations)
+    if numeric.isna().any(axis=None):
+        raise ValueError("Non-numeric or missing ADU, DLT or MOQ values")
+    numeric.insert(0, "item_id", item_ids.astype(str))
+    return numeric
+
+
+def _run_buffer_profile_batch(frame: pd.DataFrame, include_profiles: bool) -> BufferProfileBatchResponse:
+    result = calculate_buffer_profiles_batch(
+        frame["item_id"].to_numpy(),
+        frame["average_daily_demand"].to_numpy(),
+        frame["decoupled_lead_time"].to_numpy(),
+        frame["minimum_order_quantity"].to_numpy(),
+        frame["variability_factor"].to_numpy(),
+    )
+    profiles = None
+    if include_profiles:
+        profiles = pd.DataFrame({
+            key: result[key] for key in ("item_id", "red_zone", "yellow_zone", "green_zone")
+        }).to_dict("records")
+    return BufferProfileBatchResponse(
+        count=len(frame),
+        compute_seconds=result["compute_seconds"],
+        write_stats=result["write_stats"],
+        profiles=profiles,
+    )
+
+
+@router.post("/buffer-profiles/batch", response_model=BufferProfileBatchResponse)
+async def run_buffer_profiles_batch(request: Request, include_profiles: bool = True):
+    """Endpoint to calculate and persist buffer profiles for many items in one request.
+
+    Accepts a JSON array, or NDJSON (``Content-Type: application/x-ndjson``)
+    with one object per line.  Each object carries ``item_id``,
+    ``average_daily_demand``, ``decoupled_lead_time``,
+    ``minimum_order_quantity`` and optionally ``variability_factor``.
+    ``average_daily_demand`` may be left out (or null) to use the rolling ADU
+    engine's saved state: the ADU of the row's ``location_id``, or the
+    item's total over its locations when no location is given.
+    """
+    body = await request.body()
+    try:
+        frame = await run_in_worker(_parse_buffer_profile_batch, body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        return await run_in_worker(_run_buffer_profile_batch, frame, include_profiles)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 class BufferAdjustmentRequest(BaseModel):
     item_id: str
     adjustment_factor: float
@@ -82,8 +182,31 @@ def run_buffer_adjustments(request: BufferAdjustmentRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class BufferZonePlanRequest(BaseModel):
+    start_date: Optional[date] = None
+    horizon_days: int = PLAN_HORIZON_DAYS
+
+
+class BufferZonePlanResponse(BaseModel):
+    pairs: int
+    horizon_days: int
+    rows_changed: int
+    write_stats: Optional[Dict[str, Any]] = None
+
+
+@router.post("/buffer-adjustments/plan", response_model=BufferZonePlanResponse)
+async def run_buffer_zone_plan(request: BufferZonePlanRequest):
+    """Endpoint to plan time-phased buffer zones from the DAF/ZAF/LTAF calendars."""
+    try:
+        result = await run_in_worker(calculate_buffer_zone_plan, request.start_date, request.horizon_days)
+        return BufferZonePlanResponse(**{k: v for k, v in result.items() if k != "plan"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 class NetFlowRequest(BaseModel):
     item_id: str
+    location_id: str
     on_hand: float
     open_supply: float
     qualified_demand: float
@@ -91,16 +214,18 @@ class NetFlowRequest(BaseModel):
 
 class NetFlowResponse(BaseModel):
     item_id: str
+    location_id: str
     net_flow: float
     color: str
 
 
 @router.post("/net-flow", response_model=NetFlowResponse)
 def run_net_flow(request: NetFlowRequest):
-    """Endpoint to calculate the net flow position and color status for an item."""
+    """Endpoint to calculate the net flow position and color status for an item at a location."""
     try:
         result = calculate_net_flow(
             item_id=request.item_id,
+            location_id=request.location_id,
             on_hand=request.on_hand,
             open_supply=request.open_supply,
             qualified_demand=request.qualified_demand,
@@ -110,6 +235,64 @@ def run_net_flow(request: NetFlowRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class NetFlowBatchRequest(BaseModel):
+    location_id: Optional[str] = None
+
+
+class NetFlowBatchResponse(BaseModel):
+    pairs: int
+    colors: Dict[str, int]
+    write_stats: Optional[Dict[str, Any]] = None
+
+
+@router.post("/net-flow/batch", response_model=NetFlowBatchResponse)
+async def run_net_flow_batch(request: NetFlowBatchRequest):
+    """Endpoint to recalculate net flow and color for every buffered product-location."""
+    try:
+        result = await run_in_worker(calculate_net_flow_batch, request.location_id)
+        return NetFlowBatchResponse(pairs=result["pairs"], colors=result["colors"], write_stats=result["write_stats"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class NetFlowRefreshResponse(BaseModel):
+    changes: int
+    dirty_pairs: int
+    full_refresh: bool
+    pairs_written: int
+    colors: Dict[str, int]
+    watermark: int
+
+
+@router.post("/net-flow/refresh", response_model=NetFlowRefreshResponse)
+async def run_net_flow_refresh():
+    """Endpoint to recalculate net flow for the product-locations changed since the last refresh."""
+    try:
+        return NetFlowRefreshResponse(**await run_in_worker(refresh_net_flow))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class DecouplingDesignationRequest(BaseModel):
+    threshold: float = 70.0
+    scenario_name: str = "default"
+
+
+class DecouplingDesignationResponse(BaseModel):
+    summary: Dict[str, Any]
+    write_stats: Optional[Dict[str, Any]] = None
+
+
+@router.post("/decoupling/designate", response_model=DecouplingDesignationResponse)
+async def run_decoupling_designation(request: DecouplingDesignationRequest):
+    """Endpoint to score every candidate product-location and designate decoupling points in bulk."""
+    try:
+        result = await run_in_worker(designate_decoupling_points, request.threshold, request.scenario_name)
+        return DecouplingDesignationResponse(summary=result["summary"], write_stats=result["write_stats"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 class AlertsResponse(BaseModel):
     alerts: List[Dict[str, Any]]
 
@@ -122,3 +305,14 @@ def run_alerts():
         return AlertsResponse(alerts=alerts)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+class CacheStatsResponse(BaseModel):
+    caches: Dict[str, Dict[str, Any]]
+    request_counts: Dict[str, int]
+
+
+@router.get("/cache-stats", response_model=CacheStatsResponse)
+def get_cache_stats():
+    """Hit/miss counters of the config-table cache next to the per-table database round-trips."""
+    return CacheStatsResponse(caches=cache_stats(), request_counts=request_counts())
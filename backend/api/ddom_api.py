@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
-from analytics.ddom import schedule_capacity, execute_orders, analyze_buffer_variance
+from analytics.ddom import schedule_capacity_async, execute_orders_async, analyze_buffer_variance
 from analytics.ddom.capacity_scheduling import schedule_capacity_dynamic
+from backend.supabase.async_client import run_in_worker
 import pandas as pd
 
 router = APIRouter(prefix='/ddom', tags=['ddom'])
@@ -30,7 +31,7 @@ async def run_schedule(req: ScheduleRequest) -> List[Dict[str, Any]]:
     '''Schedule orders based on capacity per day.'''
     try:
         orders_list = [o.dict() for o in req.orders]
-        schedule = schedule_capacity(orders=orders_list, capacity_per_day=req.capacity_per_day)
+        schedule = await schedule_capacity_async(orders_list, capacity_per_day=req.capacity_per_day)
         return schedule
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -40,7 +41,7 @@ async def run_execute(req: ExecuteRequest) -> List[Dict[str, Any]]:
     '''Execute orders by updating their status.'''
     try:
         orders_list = [o.dict() for o in req.orders]
-        result = execute_orders(orders=orders_list)
+        result = await execute_orders_async(orders_list)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -50,7 +51,7 @@ async def compute_variance(req: VarianceRequest) -> VarianceResponse:
     '''Compute mean and standard deviation for buffer levels.'''
     try:
         df = pd.DataFrame({'level': req.levels})
-        result = analyze_buffer_variance(df)
+        result = await run_in_worker(analyze_buffer_variance, df)
         return VarianceResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -65,8 +66,9 @@ async def run_dynamic_schedule(req: DynamicScheduleRequest) -> List[Dict[str, An
     """Schedule orders based on a dynamic capacity schedule."""
     try:
         orders_list = [o.dict() for o in req.orders]
-        schedule = schedule_capacity_dynamic(
-            orders=orders_list,
+        schedule = await run_in_worker(
+            schedule_capacity_dynamic,
+            orders_list,
             capacity_schedule=req.capacity_schedule,
             default_capacity=req.default_capacity
         )
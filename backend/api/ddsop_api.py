@@ -2,11 +2,12 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any
 from analytics.ddsop import (
-    get_master_settings,
-    upsert_master_settings,
+    get_master_settings_async,
+    upsert_master_settings_async,
     perform_variance_analysis,
-    simulate_ddom_performance,
+    simulate_ddom_performance_async,
 )
+from backend.supabase.async_client import run_in_worker
 import pandas as pd
 
 router = APIRouter(prefix='/ddsop', tags=['ddsop'])
@@ -18,10 +19,10 @@ class MasterSettings(BaseModel):
     # Add other settings fields as needed
 
 @router.get('/master-settings')
-async def get_master() -> Dict[str, Any]:
+async def get_master() -> List[Dict[str, Any]]:
     """Retrieve current DDOM master settings."""
     try:
-        settings = get_master_settings()
+        settings = await get_master_settings_async()
         return settings
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -30,7 +31,7 @@ async def get_master() -> Dict[str, Any]:
 async def upsert_master(settings: Dict[str, Any]) -> Dict[str, Any]:
     """Create or update DDOM master settings."""
     try:
-        upsert_master_settings(settings)
+        await upsert_master_settings_async(settings)
         return {'status': 'success'}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -49,7 +50,7 @@ async def variance_analysis(req: VarianceAnalysisRequest) -> VarianceAnalysisRes
     """Perform variance analysis between actual and planned data."""
     try:
         df = pd.DataFrame({'actual': req.actual, 'planned': req.planned})
-        result = perform_variance_analysis(df)
+        result = await run_in_worker(perform_variance_analysis, df)
         return VarianceAnalysisResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -68,14 +69,18 @@ class SimulationRequest(BaseModel):
     capacity_per_day: float
 
 @router.post('/simulation')
-async def run_simulation(req: SimulationRequest) -> List[Dict[str, Any]]:
+async def run_simulation(req: SimulationRequest) -> Dict[str, Any]:
     """Simulate DDOM performance for multiple scenarios."""
     try:
-        demand_data = [
-            {'name': scenario.name, 'orders': [order.dict() for order in scenario.orders]}
+        scenarios = [
+            {
+                'name': scenario.name,
+                'orders': [order.dict() for order in scenario.orders],
+                'capacity_per_day': req.capacity_per_day,
+            }
             for scenario in req.scenarios
         ]
-        results = simulate_ddom_performance(demand_data=demand_data, capacity_per_day=req.capacity_per_day)
+        results = await simulate_ddom_performance_async(scenarios)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
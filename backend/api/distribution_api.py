@@ -21,11 +21,12 @@ router = APIRouter(prefix="/distribution", tags=["distribution"])
 class DistributionResponse(BaseModel):
     status: str
     error: str | None = None
+    summary: dict | None = None
 
 @router.post("/run", response_model=DistributionResponse)
-def run_distribution_api() -> DistributionResponse:
+def run_distribution_api(full_refit: bool = False) -> DistributionResponse:
     try:
-        run_distribution()
-        return {"status": "Distribution detection completed successfully"}
+        summary = run_distribution(full_refit=full_refit)
+        return {"status": "Distribution detection completed successfully", "summary": summary}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
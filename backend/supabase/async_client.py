@@ -0,0 +1,200 @@
+# backend/supabase/async_client.py
+"""
+Asyncio variant of the shared Supabase data-access layer.
+
+FastAPI handlers declared with ``async def`` must not call the synchronous
+client in :mod:`backend.supabase.supabase_client` – every ``.execute()``
+would block the event loop for all concurrent requests.  This module
+provides awaitable ``fetch``/``upsert``/``insert``/``update`` helpers on top
+of a lazily created ``AsyncClient`` that shares the credentials, pool
+limits, timeouts and per-table request counters of the sync client.
+
+Concurrency is bounded by a semaphore (``SUPABASE_ASYNC_MAX_CONCURRENCY``,
+default 10) so a burst of requests cannot exhaust the connection pool, and
+CPU-heavy work (pandas, scipy) can be pushed off the event loop with
+:func:`run_in_worker` (``ANALYTICS_WORKER_THREADS``, default 4).
+
+With ``SUPABASE_BACKEND=local`` the helpers run against the same
+in-process database as the sync client.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+import httpx
+from supabase import AsyncClient, acreate_client
+from supabase.lib.client_options import AsyncClientOptions
+
+from backend.supabase import supabase_client as _sync
+from backend.supabase.supabase_client import Filters, apply_filters
+
+T = TypeVar("T")
+
+MAX_CONCURRENCY = int(os.getenv("SUPABASE_ASYNC_MAX_CONCURRENCY", "10"))
+WORKER_THREADS = int(os.getenv("ANALYTICS_WORKER_THREADS", "4"))
+
+_client: Optional[AsyncClient] = None
+_http_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_client_lock: Optional[asyncio.Lock] = None
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+async def _count_request(request: httpx.Request) -> None:
+    _sync._count_request(request)
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=_sync.POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=_sync.POOL_MAX_KEEPALIVE,
+            keepalive_expiry=_sync.POOL_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(_sync.READ_TIMEOUT, connect=_sync.CONNECT_TIMEOUT),
+        follow_redirects=True,
+        http2=True,
+        event_hooks={"request": [_count_request]},
+    )
+
+
+def _bind_to_running_loop() -> None:
+    """Reset loop-bound state when called from a different event loop.
+
+    The async connection pool and the semaphore belong to the loop that
+    created them; test clients and CLI scripts may start fresh loops.
+    """
+    global _client, _http_client, _semaphore, _loop, _client_lock
+    loop = asyncio.get_running_loop()
+    if loop is not _loop:
+        _client = None
+        _http_client = None
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        _client_lock = asyncio.Lock()
+        _loop = loop
+
+
+async def get_async_client() -> AsyncClient:
+    """Return the async Supabase client for the running loop, creating it on first use.
+
+    Raises:
+        ValueError: If the Supabase credentials are not set.
+    """
+    global _client, _http_client
+    _bind_to_running_loop()
+    if _client is not None:
+        return _client
+
+    async with _client_lock:
+        if _client is None:
+            if _sync.BACKEND == "local":
+                from backend.supabase.local_backend import AsyncLocalClient
+
+                _client = AsyncLocalClient(_sync.get_client())
+                return _client
+            if not _sync.is_configured():
+                raise ValueError("Supabase credentials not set in .env")
+            _http_client = _build_http_client()
+            options = AsyncClientOptions(httpx_client=_http_client)
+            _client = await acreate_client(_sync.SUPABASE_URL, _sync.SUPABASE_SERVICE_KEY, options=options)
+    return _client
+
+
+async def close_async_client() -> None:
+    """Close the async connection pool (call on application shutdown)."""
+    global _client, _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _client = None
+    _http_client = None
+
+
+async def _execute(build: Callable[[AsyncClient], Any]) -> List[Dict[str, Any]]:
+    """Build a query against the client and execute it under the concurrency bound."""
+    client = await get_async_client()
+    async with _semaphore:
+        response = await build(client).execute()
+    return response.data or []
+
+
+async def fetch(
+    table: str,
+    columns: str = "*",
+    filters: Optional[Filters] = None,
+    order: Optional[str] = None,
+    desc: bool = False,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Select rows from ``table``.
+
+    Args:
+        table: Table or view name.
+        columns: Comma-separated column projection.
+        filters: Filter spec, see :func:`backend.supabase.supabase_client.apply_filters`.
+        order: Optional column to order by.
+        desc: Order descending when ``True``.
+        limit: Optional maximum number of rows.
+
+    Returns:
+        The selected rows as a list of dictionaries.
+    """
+
+    def build(client: AsyncClient):
+        query = apply_filters(client.table(table).select(columns), filters)
+        if order:
+            query = query.order(order, desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    return await _execute(build)
+
+
+async def upsert(
+    table: str,
+    records: List[Dict[str, Any]],
+    on_conflict: str = "",
+) -> List[Dict[str, Any]]:
+    """Upsert ``records`` into ``table`` in a single request."""
+    if not records:
+        return []
+    return await _execute(lambda client: client.table(table).upsert(records, on_conflict=on_conflict))
+
+
+async def insert(table: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert ``records`` into ``table`` in a single request."""
+    if not records:
+        return []
+    return await _execute(lambda client: client.table(table).insert(records))
+
+
+async def update(table: str, values: Dict[str, Any], filters: Filters) -> List[Dict[str, Any]]:
+    """Update rows of ``table`` matching ``filters`` with ``values``."""
+    return await _execute(lambda client: apply_filters(client.table(table).update(values), filters))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="analytics")
+    return _executor
+
+
+async def run_in_worker(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a CPU-heavy callable (pandas, scipy) on the analytics worker pool.
+
+    NumPy, pandas and SciPy release the GIL in their compiled kernels, so a
+    thread pool keeps the event loop responsive without pickling frames
+    across processes.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
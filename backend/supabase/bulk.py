@@ -0,0 +1,355 @@
+# backend/supabase/bulk.py
+"""
+Bulk table I/O on top of the shared Supabase client.
+
+``iter_batches`` reads large tables and views with keyset (seek) pagination
+instead of OFFSET ``.range()`` loops, so every page costs the same no
+matter how deep into the table it is, and results are never silently
+truncated at the PostgREST row cap.  The key space is cut into contiguous
+ranges from a handful of split-point probes and the ranges are scanned
+concurrently on a thread pool.  Pages are streamed to the caller as pandas
+``DataFrame`` batches; ``read_table`` concatenates them when the whole
+frame is needed.
+
+``bulk_upsert`` is the write-side counterpart: it takes a DataFrame or any
+iterable of records and upserts them in sized chunks on a thread pool,
+retrying failed chunks with exponential backoff, instead of one HTTP call
+per row.
+
+Defaults are configurable through ``SUPABASE_PAGE_SIZE`` (1000, the
+PostgREST ``max-rows`` default), ``SUPABASE_READ_WORKERS`` (4),
+``SUPABASE_UPSERT_CHUNK_SIZE`` (500), ``SUPABASE_WRITE_WORKERS`` (4) and
+``SUPABASE_WRITE_RETRIES`` (3).
+"""
+
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from postgrest.types import CountMethod
+
+from backend.supabase.supabase_client import Filters, apply_filters, get_client
+
+PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+READ_WORKERS = int(os.getenv("SUPABASE_READ_WORKERS", "4"))
+UPSERT_CHUNK_SIZE = int(os.getenv("SUPABASE_UPSERT_CHUNK_SIZE", "500"))
+WRITE_WORKERS = int(os.getenv("SUPABASE_WRITE_WORKERS", "4"))
+WRITE_RETRIES = int(os.getenv("SUPABASE_WRITE_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("SUPABASE_RETRY_BACKOFF", "0.5"))
+
+Key = Union[str, Sequence[str]]
+KeyValue = Tuple[Any, ...]
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries a worker exception across the batch queue."""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def _key_columns(key: Key) -> List[str]:
+    return [key] if isinstance(key, str) else list(key)
+
+
+def _projection(columns: str, keys: List[str]) -> str:
+    """Make sure the key columns are selected so the next page can seek past them."""
+    if columns.strip() == "*":
+        return columns
+    selected = [c.strip() for c in columns.split(",") if c.strip()]
+    return ", ".join(selected + [k for k in keys if k not in selected])
+
+
+def _quote(value: Any) -> str:
+    """Quote a value for use inside a PostgREST logic tree (``or=(...)``)."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def _seek_condition(keys: List[str], values: KeyValue, last: str, strict: str) -> str:
+    """Row-value comparison ``(k1, k2, ...) <op> (v1, v2, ...)`` as a PostgREST logic tree.
+
+    ``strict`` is the operator for earlier columns (``gt``/``lt``) and
+    ``last`` the operator for the final column (``gt``/``lte``).
+    """
+    terms = []
+    for i, column in enumerate(keys):
+        op = last if i == len(keys) - 1 else strict
+        parts = [f"{keys[j]}.eq.{_quote(values[j])}" for j in range(i)]
+        parts.append(f"{column}.{op}.{_quote(values[i])}")
+        terms.append(parts[0] if len(parts) == 1 else f"and({','.join(parts)})")
+    return terms[0] if len(terms) == 1 else f"or({','.join(terms)})"
+
+
+def _apply_bounds(query, keys: List[str], lower: Optional[KeyValue], upper: Optional[KeyValue]):
+    """Restrict ``query`` to keys in the half-open range ``(lower, upper]``."""
+    if len(keys) == 1:
+        if lower is not None:
+            query = query.gt(keys[0], lower[0])
+        if upper is not None:
+            query = query.lte(keys[0], upper[0])
+        return query
+
+    conditions = []
+    if lower is not None:
+        conditions.append(_seek_condition(keys, lower, last="gt", strict="gt"))
+    if upper is not None:
+        conditions.append(_seek_condition(keys, upper, last="lte", strict="lt"))
+    if not conditions:
+        return query
+    return query.or_(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+
+
+def _ordered(query, keys: List[str]):
+    for column in keys:
+        query = query.order(column)
+    return query
+
+
+def _split_points(table: str, keys: List[str], filters: Optional[Filters], page_size: int, ranges: int) -> List[KeyValue]:
+    """Return up to ``ranges - 1`` key values that cut the filtered table into equal parts.
+
+    One ``count`` request plus one single-row probe per split point; the
+    probes use OFFSET once each, which is negligible next to the scan.
+    """
+    if ranges <= 1:
+        return []
+    client = get_client()
+    head = apply_filters(client.table(table).select(keys[0], count=CountMethod.exact, head=True), filters)
+    total = head.execute().count or 0
+    ranges = min(ranges, total // page_size)
+    if ranges <= 1:
+        return []
+
+    points: List[KeyValue] = []
+    for i in range(1, ranges):
+        offset = total * i // ranges
+        probe = _ordered(apply_filters(client.table(table).select(",".join(keys)), filters), keys)
+        rows = probe.range(offset, offset).execute().data
+        if rows:
+            point = tuple(rows[0][k] for k in keys)
+            if not points or point != points[-1]:
+                points.append(point)
+    return points
+
+
+def _scan_range(
+    table: str,
+    keys: List[str],
+    columns: str,
+    filters: Optional[Filters],
+    page_size: int,
+    lower: Optional[KeyValue],
+    upper: Optional[KeyValue],
+) -> Iterator[pd.DataFrame]:
+    """Keyset-page through ``(lower, upper]`` yielding one DataFrame per page.
+
+    A short page does not end the range: the server may cap responses below
+    ``page_size`` (PostgREST ``max-rows``), so only an empty page does.
+    """
+    client = get_client()
+    last = lower
+    while True:
+        query = apply_filters(client.table(table).select(columns), filters)
+        query = _ordered(_apply_bounds(query, keys, last, upper), keys)
+        rows = query.limit(page_size).execute().data or []
+        if not rows:
+            return
+        yield pd.DataFrame(rows)
+        last = tuple(rows[-1][k] for k in keys)
+
+
+def iter_batches(
+    table: str,
+    key: Key,
+    columns: str = "*",
+    filters: Optional[Filters] = None,
+    page_size: int = PAGE_SIZE,
+    max_workers: int = READ_WORKERS,
+) -> Iterator[pd.DataFrame]:
+    """Stream a table or view as DataFrame batches using concurrent keyset pagination.
+
+    Args:
+        table: Table or view name.
+        key: Column (or columns) that uniquely order the rows, e.g. ``"id"``
+            or ``("product_id", "location_id")``.
+        columns: Comma-separated projection; key columns are added if missing.
+        filters: Filter spec, see :func:`backend.supabase.supabase_client.apply_filters`.
+        page_size: Rows per request; the server may return fewer.
+        max_workers: Number of key ranges scanned concurrently.
+
+    Yields:
+        One DataFrame per page.  With ``max_workers > 1`` batches from
+        different key ranges interleave, so the overall order is not sorted.
+    """
+    keys = _key_columns(key)
+    select = _projection(columns, keys)
+    points = _split_points(table, keys, filters, page_size, max_workers)
+    bounds = list(zip([None] + points, points + [None]))
+
+    if len(bounds) == 1:
+        yield from _scan_range(table, keys, select, filters, page_size, None, None)
+        return
+
+    batches: "queue.Queue[Any]" = queue.Queue(maxsize=2 * len(bounds))
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan(lower: Optional[KeyValue], upper: Optional[KeyValue]) -> None:
+        try:
+            for batch in _scan_range(table, keys, select, filters, page_size, lower, upper):
+                if not put(batch):
+                    return
+        except BaseException as exc:  # re-raised in the consuming thread
+            put(_Failure(exc))
+        finally:
+            put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=len(bounds), thread_name_prefix="bulk-read")
+    try:
+        for lower, upper in bounds:
+            executor.submit(scan, lower, upper)
+        remaining = len(bounds)
+        while remaining:
+            item = batches.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, _Failure):
+                raise item.exc
+            else:
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+def read_table(
+    table: str,
+    key: Key,
+    columns: str = "*",
+    filters: Optional[Filters] = None,
+    page_size: int = PAGE_SIZE,
+    max_workers: int = READ_WORKERS,
+) -> pd.DataFrame:
+    """Read a whole table or view into one DataFrame via :func:`iter_batches`."""
+    frames = list(iter_batches(table, key, columns, filters, page_size, max_workers))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def _json_value(value: Any) -> Any:
+    """Convert pandas/NumPy scalars to JSON-serialisable Python values."""
+    if isinstance(value, (list, tuple, dict, np.ndarray)):
+        return value
+    if pd.isna(value):
+        return None
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _iter_records(rows: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    if isinstance(rows, pd.DataFrame):
+        columns = list(rows.columns)
+        for values in rows.itertuples(index=False, name=None):
+            yield {column: _json_value(value) for column, value in zip(columns, values)}
+    else:
+        for record in rows:
+            yield {column: _json_value(value) for column, value in record.items()}
+
+
+def _upsert_chunk(table: str, chunk: List[Dict[str, Any]], on_conflict: str, retries: int, backoff: float) -> int:
+    """Upsert one chunk, retrying with exponential backoff; returns the row count."""
+    for attempt in range(retries + 1):
+        try:
+            get_client().table(table).upsert(chunk, on_conflict=on_conflict).execute()
+            return len(chunk)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+    return 0
+
+
+def bulk_upsert(
+    table: str,
+    rows: Union[pd.DataFrame, Iterable[Dict[str, Any]]],
+    on_conflict: str = "",
+    chunk_size: int = UPSERT_CHUNK_SIZE,
+    max_workers: int = WRITE_WORKERS,
+    retries: int = WRITE_RETRIES,
+    backoff: float = RETRY_BACKOFF,
+) -> Dict[str, Any]:
+    """Upsert a DataFrame or record iterator into ``table`` in parallel chunks.
+
+    At most ``2 * max_workers`` chunks are buffered, so a streaming iterator
+    is never materialised in full.
+
+    Args:
+        table: Target table.
+        rows: DataFrame or iterable of dictionaries.  NaN/NaT become ``None``
+            and NumPy/pandas scalars are converted for JSON.
+        on_conflict: Comma-separated conflict target, e.g. ``"product_id,location_id"``.
+        chunk_size: Rows per request.
+        max_workers: Chunks in flight concurrently.
+        retries: Retries per chunk before the error is raised.
+        backoff: Initial retry delay in seconds, doubled on every attempt.
+
+    Returns:
+        Dictionary with ``rows_written``, ``chunks``, ``seconds`` and
+        ``rows_per_second``.
+
+    Raises:
+        Exception: The last error of a chunk that still failed after ``retries``.
+    """
+    started = time.perf_counter()
+    records = _iter_records(rows)
+    written = 0
+    chunks = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-write") as executor:
+        pending = set()
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if chunk:
+                pending.add(executor.submit(_upsert_chunk, table, chunk, on_conflict, retries, backoff))
+                chunks += 1
+            if pending and (not chunk or len(pending) >= 2 * max_workers):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED if chunk else ALL_COMPLETED)
+                for future in done:
+                    written += future.result()
+            if not chunk and not pending:
+                break
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows_written": written,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(written / seconds, 1) if seconds > 0 else float(written),
+    }
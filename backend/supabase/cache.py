@@ -0,0 +1,169 @@
+# backend/supabase/cache.py
+"""
+Process-local read-through cache for read-mostly configuration tables.
+
+``threshold_config``, ``ddom_master_settings``, the lead-time columns of
+``items`` and the buffer zones of ``inventory_ddmrp_buffers_view`` change
+rarely but used to be re-read on every call (``calculate_net_flow`` fetched
+the pair's zones on every ``/ddmrp/net-flow`` request).  Each table gets its
+own bounded LRU with a per-table TTL; code that writes one of these tables
+calls :func:`invalidate` so the next read goes back to the database.  The
+view is derived from sales, lead times and buffer profiles, which this
+backend does not write, so its entries only expire after their (short) TTL.
+
+Misses (``None`` results) are cached as well, so an item without a buffer
+row does not cost a round-trip per request either.  Loader exceptions are
+never cached.
+
+Configuration:
+
+* ``CONFIG_CACHE_ENABLED`` – set to ``0`` to bypass the cache entirely
+* ``CONFIG_CACHE_MAX_ENTRIES`` – LRU size per table (default 10000)
+* ``CONFIG_CACHE_TTL_<TABLE>`` – TTL in seconds, e.g. ``CONFIG_CACHE_TTL_ITEMS`` or
+  ``CONFIG_CACHE_TTL_INVENTORY_DDMRP_BUFFERS_VIEW``
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+CACHE_ENABLED = os.getenv("CONFIG_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+MAX_ENTRIES = int(os.getenv("CONFIG_CACHE_MAX_ENTRIES", "10000"))
+
+DEFAULT_TTLS: Dict[str, float] = {
+    "threshold_config": 300.0,
+    "ddom_master_settings": 300.0,
+    "items": 600.0,
+    "inventory_ddmrp_buffers_view": 60.0,
+}
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being stored."""
+
+    def __init__(self, ttl: float, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation so a load that raced with a write is
+        # returned to its caller but not stored.
+        self._generation = 0
+
+    def _lookup(self, key: Hashable) -> tuple:
+        """Return ``(True, value)`` on a hit or ``(False, generation)`` on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+            self.misses += 1
+            return False, self._generation
+
+    def _store(self, key: Hashable, value: Any, generation: int) -> Any:
+        with self._lock:
+            if generation != self._generation:
+                return copy.deepcopy(value)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return copy.deepcopy(value)
+
+    def get(self, key: Hashable, loader: Callable[[], T]) -> T:
+        """Return the cached value for ``key``, calling ``loader`` on a miss or expiry."""
+        found, value = self._lookup(key)
+        if found:
+            return value
+        return self._store(key, loader(), value)
+
+    async def aget(self, key: Hashable, loader: Callable[[], Awaitable[T]]) -> T:
+        """:meth:`get` for an async ``loader``."""
+        found, value = self._lookup(key)
+        if found:
+            return value
+        return self._store(key, await loader(), value)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or every entry when ``key`` is ``None``."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_caches: Dict[str, TTLCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(table: str) -> TTLCache:
+    """Return the cache of ``table``, creating it with its configured TTL."""
+    cache = _caches.get(table)
+    if cache is None:
+        with _registry_lock:
+            cache = _caches.get(table)
+            if cache is None:
+                env_ttl = os.getenv(f"CONFIG_CACHE_TTL_{table.upper()}")
+                ttl = float(env_ttl) if env_ttl else DEFAULT_TTLS.get(table, 60.0)
+                cache = _caches[table] = TTLCache(ttl)
+    return cache
+
+
+def cached(table: str, key: Hashable, loader: Callable[[], T]) -> T:
+    """Read ``key`` of ``table`` through the cache (or directly when disabled)."""
+    if not CACHE_ENABLED:
+        return loader()
+    return get_cache(table).get(key, loader)
+
+
+async def cached_async(table: str, key: Hashable, loader: Callable[[], Awaitable[T]]) -> T:
+    """:func:`cached` for an async ``loader``."""
+    if not CACHE_ENABLED:
+        return await loader()
+    return await get_cache(table).aget(key, loader)
+
+
+def invalidate(table: str, key: Optional[Hashable] = None) -> None:
+    """Invalidate one key of ``table`` (or the whole table) after a write."""
+    cache = _caches.get(table)
+    if cache is not None:
+        cache.invalidate(key)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters per cached table."""
+    return {table: cache.stats() for table, cache in sorted(_caches.items())}
+
+
+def clear_caches() -> None:
+    """Drop every cache and its counters (tests, or after a bulk reload)."""
+    with _registry_lock:
+        _caches.clear()
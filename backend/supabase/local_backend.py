@@ -0,0 +1,690 @@
+# backend/supabase/local_backend.py
+"""
+In-process stand-in for the Supabase table API, backed by SQLite.
+
+Selecting ``SUPABASE_BACKEND=local`` makes :func:`get_client` (and the async
+client) return a :class:`LocalClient` instead of a network client, so the
+planning pipeline can be profiled, load-tested and unit-tested on one
+machine without credentials or network.  ``LOCAL_DB_PATH`` chooses the
+database file (default ``:memory:``).
+
+The query builder implements the subset of the PostgREST builder that the
+analytics modules use::
+
+    table().select(columns, count=..., head=...)
+           .eq() .neq() .gt() .gte() .lt() .lte() .in_() .is_() .like() .ilike() .or_()
+           .order() .limit() .range()
+    table().insert(rows) / .upsert(rows, on_conflict=...) / .update(values) / .delete()
+
+The schema is seeded from the ``CREATE TABLE`` / ``ALTER TABLE ... ADD
+COLUMN`` / ``DROP TABLE`` statements in ``supabase/migrations`` (and
+``backend/supabase/migrations``), applied in file-name order.  Tables that
+only exist in the hosted project are created on first write from the
+columns of the written rows, and new columns are added the same way.
+Policies, functions, triggers and views are ignored; ``rpc`` is not
+supported.
+"""
+
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MIGRATION_DIRS = [
+    os.path.join(_REPO_ROOT, "backend", "supabase", "migrations"),
+    os.path.join(_REPO_ROOT, "supabase", "migrations"),
+]
+
+# Conflict keys for tables that the analytics modules upsert into without an
+# explicit ``on_conflict`` and whose DDL is not part of the migrations.
+DEFAULT_KEYS: Dict[str, Tuple[str, ...]] = {
+    "buffers": ("item_id",),
+    "items": ("item_id",),
+    "orders": ("order_id",),
+    "threshold_config": ("id",),
+    "ddom_master_settings": ("id",),
+    "performance_tracking": ("id",),
+    "historical_sales_data": ("sales_id",),
+    "product_classification": ("product_id", "location_id"),
+    "demand_distribution_profile": ("product_id", "location_id"),
+}
+
+_INTEGER_TYPES = ("serial", "bigserial", "smallserial", "int", "bigint", "smallint", "integer")
+_REAL_TYPES = ("numeric", "decimal", "real", "double", "float")
+_UUID_DEFAULT = re.compile(r"default\s+(gen_random_uuid|uuid_generate_v4)\s*\(", re.I)
+_LITERAL_DEFAULT = re.compile(r"default\s+('(?:[^']|'')*'|-?\d+(?:\.\d+)?|true|false)", re.I)
+_NOW_DEFAULT = re.compile(r"default\s+(now\(\)|clock_timestamp\(\)|current_timestamp|current_date|timezone\()", re.I)
+_IDENT = r'(?:"[^"]+"|[A-Za-z_][A-Za-z0-9_]*)'
+_TABLE_NAME = rf"(?:{_IDENT}\.)?({_IDENT})"
+
+
+class LocalResponse:
+    """Mimics the ``APIResponse`` returned by ``postgrest``."""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"LocalResponse(rows={len(self.data)}, count={self.count})"
+
+
+class _TableInfo:
+    def __init__(self, name: str):
+        self.name = name
+        self.columns: Dict[str, str] = {}
+        self.primary_key: Tuple[str, ...] = ()
+        self.uuid_columns: Set[str] = set()
+
+
+def _unquote_ident(name: str) -> str:
+    return name[1:-1] if name.startswith('"') else name.lower()
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# --------------------------------------------------------------------------- #
+# Migration parsing
+# --------------------------------------------------------------------------- #
+
+def split_statements(sql: str) -> List[str]:
+    """Split a Postgres script on top-level ``;`` (quotes, comments and ``$$`` aware)."""
+    statements, current = [], []
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        if ch == "$":
+            match = re.match(r"\$[A-Za-z0-9_]*\$", sql[i:])
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, i + len(tag))
+                end = n if end == -1 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+                continue
+        if ch in ("'", '"'):
+            j = i + 1
+            while j < n:
+                if sql[j] == ch:
+                    if j + 1 < n and sql[j + 1] == ch:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            current.append(sql[i:j + 1])
+            i = j + 1
+            continue
+        if ch == ";":
+            statements.append("".join(current).strip())
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    tail = "".join(current).strip()
+    if tail:
+        statements.append(tail)
+    return [s for s in statements if s]
+
+
+def _split_top_level(body: str) -> List[str]:
+    parts, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(body):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(body[start:i].strip())
+            start = i + 1
+    parts.append(body[start:].strip())
+    return [p for p in parts if p]
+
+
+def _sqlite_type(pg_type: str) -> str:
+    pg_type = pg_type.lower()
+    if pg_type.startswith(_INTEGER_TYPES) or pg_type == "boolean" or pg_type == "bool":
+        return "INTEGER"
+    if pg_type.startswith(_REAL_TYPES):
+        return "REAL"
+    return "TEXT"
+
+
+def _column_ddl(definition: str) -> Tuple[str, str, str, bool, bool, bool]:
+    """Return ``(name, sqlite_type, default_sql, primary_key, unique, uuid_default)``."""
+    match = re.match(rf"({_IDENT})\s+(.*)$", definition, re.S)
+    name = _unquote_ident(match.group(1))
+    rest = match.group(2)
+    pg_type = re.match(r"[A-Za-z_][A-Za-z0-9_ ]*?(?=\s*(?:\(|\[|$|\s(?:not|null|default|primary|unique|references|check|constraint|generated|collate)\b))",
+                       rest, re.I)
+    sqlite_type = _sqlite_type(pg_type.group(0) if pg_type else rest.split()[0])
+    if "[]" in rest.split(" ")[0] or re.match(r"jsonb?\b", rest, re.I):
+        sqlite_type = "TEXT"
+
+    default_sql = ""
+    if _NOW_DEFAULT.search(rest):
+        default_sql = " DEFAULT CURRENT_TIMESTAMP"
+    else:
+        literal = _LITERAL_DEFAULT.search(rest)
+        if literal:
+            value = literal.group(1)
+            value = {"true": "1", "false": "0"}.get(value.lower(), value)
+            default_sql = f" DEFAULT {value}"
+    return (
+        name,
+        sqlite_type,
+        default_sql,
+        bool(re.search(r"\bprimary\s+key\b", rest, re.I)),
+        bool(re.search(r"\bunique\b", rest, re.I)),
+        bool(_UUID_DEFAULT.search(rest)),
+    )
+
+
+# --------------------------------------------------------------------------- #
+# PostgREST logic trees (``or=(...)``)
+# --------------------------------------------------------------------------- #
+
+_COMPARISONS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _parse_value(text: str) -> Any:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", text[1:-1])
+    return text
+
+
+def _logic_tree_sql(tree: str) -> Tuple[str, List[Any]]:
+    """Translate the inside of ``or=(...)`` / ``and(...)`` into SQL."""
+
+    def split_terms(text: str) -> List[str]:
+        terms, depth, in_quote, escaped, start = [], 0, False, False, 0
+        for i, ch in enumerate(text):
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_quote = not in_quote
+            elif not in_quote and ch == "(":
+                depth += 1
+            elif not in_quote and ch == ")":
+                depth -= 1
+            elif not in_quote and depth == 0 and ch == ",":
+                terms.append(text[start:i])
+                start = i + 1
+        terms.append(text[start:])
+        return [t.strip() for t in terms if t.strip()]
+
+    def term_sql(term: str) -> Tuple[str, List[Any]]:
+        for joiner in ("and", "or"):
+            if term.startswith(f"{joiner}(") and term.endswith(")"):
+                return group_sql(term[len(joiner) + 1:-1], joiner.upper())
+        column, op, value = term.split(".", 2)
+        if op in _COMPARISONS:
+            return f"{_quote_ident(column)} {_COMPARISONS[op]} ?", [_parse_value(value)]
+        if op == "in":
+            values = [_parse_value(v) for v in split_terms(value.strip()[1:-1])]
+            return f"{_quote_ident(column)} IN ({', '.join('?' for _ in values)})", values
+        if op == "is":
+            return f"{_quote_ident(column)} IS {'NULL' if value == 'null' else value.upper()}", []
+        raise NotImplementedError(f"Unsupported operator in logic tree: {op}")
+
+    def group_sql(text: str, joiner: str) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for term in split_terms(text):
+            clause, term_params = term_sql(term)
+            clauses.append(f"({clause})")
+            params.extend(term_params)
+        return f" {joiner} ".join(clauses), params
+
+    return group_sql(tree, "OR")
+
+
+# --------------------------------------------------------------------------- #
+# Client and query builder
+# --------------------------------------------------------------------------- #
+
+def _to_sql_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _infer_type(value: Any) -> str:
+    if isinstance(value, (bool, int)):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "REAL"
+    return "TEXT"
+
+
+class LocalClient:
+    """SQLite-backed replacement for ``supabase.Client`` (table API only)."""
+
+    def __init__(self, path: str = ":memory:", migration_dirs: Optional[Sequence[str]] = None):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._tables: Dict[str, _TableInfo] = {}
+        self._load_existing_tables()
+        self.apply_migrations(MIGRATION_DIRS if migration_dirs is None else migration_dirs)
+
+    # -- schema -------------------------------------------------------------
+
+    def _load_existing_tables(self) -> None:
+        rows = self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        for row in rows:
+            info = _TableInfo(row["name"])
+            for column in self._conn.execute(f"PRAGMA table_info({_quote_ident(info.name)})"):
+                info.columns[column["name"]] = column["type"]
+            pk = [c["name"] for c in self._conn.execute(f"PRAGMA table_info({_quote_ident(info.name)})") if c["pk"]]
+            info.primary_key = tuple(pk)
+            self._tables[info.name] = info
+
+    def apply_migrations(self, directories: Iterable[str]) -> None:
+        """Apply the table DDL of every ``*.sql`` file, ordered by file name."""
+        files = []
+        for directory in directories:
+            if os.path.isdir(directory):
+                files.extend(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".sql"))
+        for path in sorted(files, key=os.path.basename):
+            with open(path, encoding="utf-8") as fh:
+                for statement in split_statements(fh.read()):
+                    self._apply_statement(statement)
+
+    def _apply_statement(self, statement: str) -> None:
+        create = re.match(rf"create\s+(?:unlogged\s+)?table\s+(?:if\s+not\s+exists\s+)?{_TABLE_NAME}\s*\((.*)\)\s*$",
+                          statement, re.I | re.S)
+        if create:
+            self._create_table(_unquote_ident(create.group(1)), create.group(2))
+            return
+        drop = re.match(rf"drop\s+table\s+(?:if\s+exists\s+)?{_TABLE_NAME}", statement, re.I)
+        if drop:
+            name = _unquote_ident(drop.group(1))
+            with self._lock:
+                self._conn.execute(f"DROP TABLE IF EXISTS {_quote_ident(name)}")
+                self._tables.pop(name, None)
+            return
+        alter = re.match(rf"alter\s+table\s+(?:if\s+exists\s+)?(?:only\s+)?{_TABLE_NAME}\s+(.*)$", statement, re.I | re.S)
+        if alter:
+            name = _unquote_ident(alter.group(1))
+            if name not in self._tables:
+                return
+            for action in _split_top_level(alter.group(2)):
+                add = re.match(r"add\s+column\s+(?:if\s+not\s+exists\s+)?(.*)$", action, re.I | re.S)
+                if add:
+                    column, sqlite_type, default_sql, _, _, is_uuid = _column_ddl(add.group(1))
+                    self._add_column(name, column, sqlite_type, default_sql)
+                    if is_uuid:
+                        self._tables[name].uuid_columns.add(column)
+                    continue
+                unique = re.match(r"add\s+constraint\s+\S+\s+unique\s*\(([^)]*)\)", action, re.I)
+                if unique:
+                    self._ensure_unique(name, [_unquote_ident(c.strip()) for c in unique.group(1).split(",")])
+
+    def _create_table(self, name: str, body: str) -> None:
+        if name in self._tables:
+            return
+        info = _TableInfo(name)
+        columns, uniques, table_pk = [], [], []
+        for item in _split_top_level(body):
+            item = re.sub(rf"^constraint\s+{_IDENT}\s+", "", item, flags=re.I)
+            pk = re.match(r"primary\s+key\s*\(([^)]*)\)", item, re.I)
+            unique = re.match(r"unique\s*\(([^)]*)\)", item, re.I)
+            if pk:
+                table_pk = [_unquote_ident(c.strip()) for c in pk.group(1).split(",")]
+            elif unique:
+                uniques.append([_unquote_ident(c.strip()) for c in unique.group(1).split(",")])
+            elif re.match(r"(foreign\s+key|check|exclude)\b", item, re.I):
+                continue
+            else:
+                column, sqlite_type, default_sql, is_pk, is_unique, is_uuid = _column_ddl(item)
+                info.columns[column] = sqlite_type
+                columns.append((column, sqlite_type, default_sql))
+                if is_pk:
+                    table_pk = [column]
+                if is_unique:
+                    uniques.append([column])
+                if is_uuid:
+                    info.uuid_columns.add(column)
+        info.primary_key = tuple(table_pk) or DEFAULT_KEYS.get(name, ())
+        self._create_sqlite_table(info, columns)
+        for unique_columns in uniques:
+            self._ensure_unique(name, unique_columns)
+
+    def _create_sqlite_table(self, info: _TableInfo, columns: List[Tuple[str, str, str]]) -> None:
+        definitions = []
+        single_integer_pk = len(info.primary_key) == 1 and info.columns.get(info.primary_key[0]) == "INTEGER"
+        for column, sqlite_type, default_sql in columns:
+            definition = f"{_quote_ident(column)} {sqlite_type}{default_sql}"
+            if single_integer_pk and column == info.primary_key[0]:
+                definition = f"{_quote_ident(column)} INTEGER PRIMARY KEY"
+            definitions.append(definition)
+        if info.primary_key and not single_integer_pk:
+            definitions.append(f"PRIMARY KEY ({', '.join(_quote_ident(c) for c in info.primary_key)})")
+        with self._lock:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote_ident(info.name)} ({', '.join(definitions)})")
+            self._tables[info.name] = info
+
+    def _add_column(self, table: str, column: str, sqlite_type: str, default_sql: str = "") -> None:
+        info = self._tables[table]
+        if column in info.columns:
+            return
+        with self._lock:
+            self._conn.execute(
+                f"ALTER TABLE {_quote_ident(table)} ADD COLUMN {_quote_ident(column)} {sqlite_type}{default_sql}"
+            )
+            info.columns[column] = sqlite_type
+
+    def _ensure_unique(self, table: str, columns: Sequence[str]) -> None:
+        if not columns or tuple(columns) == self._tables[table].primary_key:
+            return
+        for column in columns:
+            self._add_column(table, column, "TEXT")
+        index = f"ux_{table}_{'_'.join(columns)}"
+        with self._lock:
+            self._conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote_ident(index)} ON {_quote_ident(table)} "
+                f"({', '.join(_quote_ident(c) for c in columns)})"
+            )
+
+    def _ensure_table(self, table: str, rows: List[Dict[str, Any]], conflict: Sequence[str] = ()) -> _TableInfo:
+        """Create ``table`` / missing columns from the written rows."""
+        if table not in self._tables:
+            info = _TableInfo(table)
+            info.primary_key = tuple(conflict) or DEFAULT_KEYS.get(table, ())
+            columns: Dict[str, str] = {}
+            for row in rows:
+                for column, value in row.items():
+                    if column not in columns or (columns[column] == "TEXT" and value is not None):
+                        columns[column] = _infer_type(value) if value is not None else "TEXT"
+            for column in info.primary_key:
+                columns.setdefault(column, "TEXT")
+            info.columns = dict(columns)
+            if len(info.primary_key) == 1 and columns[info.primary_key[0]] == "TEXT":
+                info.uuid_columns.add(info.primary_key[0])
+            self._create_sqlite_table(info, [(c, t, "") for c, t in columns.items()])
+        info = self._tables[table]
+        for row in rows:
+            for column, value in row.items():
+                if column not in info.columns:
+                    self._add_column(table, column, _infer_type(value))
+        return info
+
+    # -- public API ---------------------------------------------------------
+
+    def table(self, table_name: str) -> "LocalQuery":
+        return LocalQuery(self, table_name)
+
+    def from_(self, table_name: str) -> "LocalQuery":
+        return self.table(table_name)
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None):
+        raise NotImplementedError(f"rpc('{fn}') is not available on the local backend")
+
+    def execute_sql(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Run raw SQL against the local database (benchmarks and test fixtures)."""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class LocalQuery:
+    """Chainable query builder mirroring ``postgrest``'s request builders."""
+
+    def __init__(self, client: LocalClient, table: str):
+        self._client = client
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._count: Optional[str] = None
+        self._head = False
+        self._rows: List[Dict[str, Any]] = []
+        self._values: Dict[str, Any] = {}
+        self._on_conflict: Tuple[str, ...] = ()
+        self._ignore_duplicates = False
+        self._where: List[Tuple[str, List[Any]]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    # -- operations ---------------------------------------------------------
+
+    def select(self, *columns: str, count: Optional[Any] = None, head: Optional[bool] = None) -> "LocalQuery":
+        self._operation = "select"
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = str(getattr(count, "value", count)) if count else None
+        self._head = bool(head)
+        return self
+
+    def insert(self, json: Any, **_: Any) -> "LocalQuery":
+        self._operation = "insert"
+        self._rows = json if isinstance(json, list) else [json]
+        return self
+
+    def upsert(self, json: Any, on_conflict: str = "", ignore_duplicates: bool = False, **_: Any) -> "LocalQuery":
+        self._operation = "upsert"
+        self._rows = json if isinstance(json, list) else [json]
+        self._on_conflict = tuple(c.strip() for c in on_conflict.split(",") if c.strip())
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json: Dict[str, Any], **_: Any) -> "LocalQuery":
+        self._operation = "update"
+        self._values = json
+        return self
+
+    def delete(self, **_: Any) -> "LocalQuery":
+        self._operation = "delete"
+        return self
+
+    # -- filters and modifiers ---------------------------------------------
+
+    def _filter(self, column: str, sql_op: str, value: Any) -> "LocalQuery":
+        self._where.append((f"{_quote_ident(column)} {sql_op} ?", [_to_sql_value(value)]))
+        return self
+
+    def eq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "=", value)
+
+    def neq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "<>", value)
+
+    def gt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, ">", value)
+
+    def gte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, ">=", value)
+
+    def lt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "<", value)
+
+    def lte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "<=", value)
+
+    def like(self, column: str, pattern: str) -> "LocalQuery":
+        return self._filter(column, "GLOB", pattern.replace("%", "*").replace("_", "?"))
+
+    def ilike(self, column: str, pattern: str) -> "LocalQuery":
+        return self._filter(column, "LIKE", pattern)
+
+    def in_(self, column: str, values: Iterable[Any]) -> "LocalQuery":
+        values = [_to_sql_value(v) for v in values]
+        if not values:
+            self._where.append(("0", []))
+        else:
+            self._where.append((f"{_quote_ident(column)} IN ({', '.join('?' for _ in values)})", values))
+        return self
+
+    def is_(self, column: str, value: Any) -> "LocalQuery":
+        keyword = "NULL" if value in (None, "null") else str(value).upper()
+        self._where.append((f"{_quote_ident(column)} IS {keyword}", []))
+        return self
+
+    def or_(self, filters: str, reference_table: Optional[str] = None) -> "LocalQuery":
+        self._where.append(_logic_tree_sql(filters))
+        return self
+
+    def order(self, column: str, *, desc: bool = False, nullsfirst: Optional[bool] = None, **_: Any) -> "LocalQuery":
+        # Postgres sorts NULLs last ascending and first descending
+        nulls_first = desc if nullsfirst is None else nullsfirst
+        self._order.append(f"({_quote_ident(column)} IS NULL) {'DESC' if nulls_first else 'ASC'}")
+        self._order.append(f"{_quote_ident(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int, **_: Any) -> "LocalQuery":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **_: Any) -> "LocalQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # -- execution ----------------------------------------------------------
+
+    def _where_sql(self) -> Tuple[str, List[Any]]:
+        if not self._where:
+            return "", []
+        params: List[Any] = []
+        clauses = []
+        for clause, clause_params in self._where:
+            clauses.append(f"({clause})")
+            params.extend(clause_params)
+        return " WHERE " + " AND ".join(clauses), params
+
+    def _projection(self) -> str:
+        columns = [c.strip() for c in self._columns.split(",") if c.strip()]
+        if not columns or "*" in columns:
+            return "*"
+        return ", ".join(_quote_ident(c) for c in columns)
+
+    def execute(self) -> LocalResponse:
+        from backend.supabase.supabase_client import _count_table
+
+        _count_table(self._table)
+        client = self._client
+        with client._lock:
+            if self._operation == "select":
+                return self._execute_select()
+            if self._operation in ("insert", "upsert"):
+                return self._execute_write()
+            if self._table not in client._tables:
+                return LocalResponse([])
+            where, params = self._where_sql()
+            table = _quote_ident(self._table)
+            if self._operation == "update":
+                client._ensure_table(self._table, [self._values])
+                assignments = ", ".join(f"{_quote_ident(c)} = ?" for c in self._values)
+                sql = f"UPDATE {table} SET {assignments}{where} RETURNING *"
+                params = [_to_sql_value(v) for v in self._values.values()] + params
+            else:
+                sql = f"DELETE FROM {table}{where} RETURNING *"
+            return LocalResponse([dict(r) for r in client._conn.execute(sql, params).fetchall()])
+
+    def _execute_select(self) -> LocalResponse:
+        client = self._client
+        if self._table not in client._tables:
+            return LocalResponse([], 0 if self._count else None)
+        where, params = self._where_sql()
+        table = _quote_ident(self._table)
+        count = None
+        if self._count:
+            count = client._conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+        if self._head:
+            return LocalResponse([], count)
+        sql = f"SELECT {self._projection()} FROM {table}{where}"
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None or self._offset is not None:
+            sql += f" LIMIT {-1 if self._limit is None else int(self._limit)} OFFSET {int(self._offset or 0)}"
+        rows = client._conn.execute(sql, params).fetchall()
+        return LocalResponse([dict(r) for r in rows], count)
+
+    def _execute_write(self) -> LocalResponse:
+        client = self._client
+        if not self._rows:
+            return LocalResponse([])
+        info = client._ensure_table(self._table, self._rows, self._on_conflict)
+        conflict = self._on_conflict or info.primary_key
+        if self._operation == "upsert" and self._on_conflict:
+            client._ensure_unique(self._table, list(self._on_conflict))
+
+        columns: List[str] = []
+        for row in self._rows:
+            columns.extend(c for c in row if c not in columns)
+        generated = [c for c in info.uuid_columns if c not in columns]
+        all_columns = columns + generated
+
+        sql = (
+            f"INSERT INTO {_quote_ident(self._table)} ({', '.join(_quote_ident(c) for c in all_columns)}) "
+            f"VALUES ({', '.join('?' for _ in all_columns)})"
+        )
+        if self._operation == "upsert" and conflict:
+            updates = [c for c in columns if c not in conflict]
+            target = ", ".join(_quote_ident(c) for c in conflict)
+            if updates and not self._ignore_duplicates:
+                assignments = ", ".join(f"{_quote_ident(c)} = excluded.{_quote_ident(c)}" for c in updates)
+                sql += f" ON CONFLICT ({target}) DO UPDATE SET {assignments}"
+            else:
+                sql += f" ON CONFLICT ({target}) DO NOTHING"
+        sql += " RETURNING *"
+
+        written = []
+        client._conn.execute("BEGIN")
+        try:
+            for row in self._rows:
+                values = [_to_sql_value(row.get(c)) for c in columns]
+                values += [str(uuid.uuid4()) for _ in generated]
+                written.extend(dict(r) for r in client._conn.execute(sql, values).fetchall())
+            client._conn.execute("COMMIT")
+        except Exception:
+            client._conn.execute("ROLLBACK")
+            raise
+        return LocalResponse(written)
+
+
+class AsyncLocalClient:
+    """Awaitable facade over a :class:`LocalClient` for the async data layer."""
+
+    def __init__(self, client: LocalClient):
+        self._client = client
+
+    def table(self, table_name: str) -> "AsyncLocalQuery":
+        return AsyncLocalQuery(self._client, table_name)
+
+    def from_(self, table_name: str) -> "AsyncLocalQuery":
+        return self.table(table_name)
+
+
+class AsyncLocalQuery(LocalQuery):
+    async def execute(self) -> LocalResponse:  # type: ignore[override]
+        return LocalQuery.execute(self)
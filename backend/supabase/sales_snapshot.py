@@ -0,0 +1,343 @@
+# backend/supabase/sales_snapshot.py
+"""
+Local columnar snapshot of ``historical_sales_data``.
+
+Jobs that need sales history (distribution detection, bullwhip analysis)
+read it from an on-disk Arrow IPC snapshot instead of pulling the full
+table from Supabase on every run.  The snapshot is partitioned by location
+(one directory per ``location_id``); every sync appends one immutable part
+file per location that received rows, and partitions are compacted into a
+single file once they accumulate ``SALES_SNAPSHOT_MAX_PARTS`` parts.
+
+``sync_sales_snapshot`` only fetches rows whose ``sales_date`` is on or
+after the stored watermark minus ``SALES_SNAPSHOT_LOOKBACK_DAYS``, so a
+rerun costs a delta fetch rather than a full history reload.  Rows in that
+range that are already in the snapshot are skipped by ``sales_id``.
+
+Backdated rows (inserted after the sync with a ``sales_date`` before the
+watermark) are picked up by the lookback when they are at most that many
+days old.  Anything older, and edits or deletes of stored rows, only reach
+the snapshot through a full reload: the sync does one automatically when
+the last full reload is ``SALES_SNAPSHOT_FULL_RESYNC_DAYS`` old.
+
+A full reload is written to a new versioned directory next to the
+snapshot, ``historical_sales_data.<timestamp>``.  Once every part file and
+the watermark are in place, the ``historical_sales_data`` symlink is
+atomically repointed at it and the previous version is removed.  Readers
+therefore see either the old or the new snapshot, never a partial one, and
+a failed reload leaves the old snapshot in place.
+
+Reads memory-map the uncompressed IPC files, so ``load_sales_table``
+returns Arrow data without copying it off disk.
+
+Configuration:
+
+* ``SALES_SNAPSHOT_DIR`` – snapshot root (default ``backend/.snapshots``)
+* ``SALES_SNAPSHOT_ENABLED`` – set to ``1`` to make analytics read from it
+* ``SALES_SNAPSHOT_MAX_PARTS`` – parts per location before compaction (default 16)
+* ``SALES_SNAPSHOT_LOOKBACK_DAYS`` – days before the watermark re-read by a delta sync (default 3)
+* ``SALES_SNAPSHOT_FULL_RESYNC_DAYS`` – days between automatic full reloads (default 7, 0 disables)
+"""
+
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import quote, unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from backend.supabase.bulk import iter_batches
+
+SNAPSHOT_DIR = os.getenv(
+    "SALES_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".snapshots"),
+)
+SNAPSHOT_ENABLED = os.getenv("SALES_SNAPSHOT_ENABLED", "0").lower() in ("1", "true", "yes")
+MAX_PARTS = int(os.getenv("SALES_SNAPSHOT_MAX_PARTS", "16"))
+LOOKBACK_DAYS = int(os.getenv("SALES_SNAPSHOT_LOOKBACK_DAYS", "3"))
+FULL_RESYNC_DAYS = int(os.getenv("SALES_SNAPSHOT_FULL_RESYNC_DAYS", "7"))
+
+TABLE = "historical_sales_data"
+SCHEMA = pa.schema([
+    ("sales_id", pa.string()),
+    ("product_id", pa.string()),
+    ("location_id", pa.string()),
+    ("sales_date", pa.date32()),
+    ("quantity_sold", pa.float64()),
+    ("unit_price", pa.float64()),
+    ("revenue", pa.float64()),
+])
+_COLUMNS = ", ".join(SCHEMA.names)
+_WATERMARK_FILE = "_watermark.json"
+
+DateLike = Union[str, date]
+
+
+def _table_dir(root: Optional[str] = None) -> str:
+    return os.path.join(root or SNAPSHOT_DIR, TABLE)
+
+
+def _location_dir(table_dir: str, location_id: str) -> str:
+    return os.path.join(table_dir, f"location_id={quote(str(location_id), safe='')}")
+
+
+def _partition_dir(location_id: str, root: Optional[str] = None) -> str:
+    return _location_dir(_table_dir(root), location_id)
+
+
+def _part_files(partition: str) -> List[str]:
+    if not os.path.isdir(partition):
+        return []
+    return sorted(
+        os.path.join(partition, name) for name in os.listdir(partition) if name.endswith(".arrow")
+    )
+
+
+def snapshot_locations(root: Optional[str] = None) -> List[str]:
+    """Return the location ids present in the snapshot."""
+    table_dir = _table_dir(root)
+    if not os.path.isdir(table_dir):
+        return []
+    return sorted(
+        unquote(name.split("=", 1)[1])
+        for name in os.listdir(table_dir)
+        if name.startswith("location_id=")
+    )
+
+
+def _read_state(root: Optional[str] = None) -> Dict[str, str]:
+    path = os.path.join(_table_dir(root), _WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def read_watermark(root: Optional[str] = None) -> Optional[str]:
+    """Return the latest ``sales_date`` in the snapshot (ISO string) or ``None``."""
+    return _read_state(root).get("sales_date")
+
+
+def _write_watermark(sales_date: str, full_synced_at: Optional[str], table_dir: str) -> None:
+    path = os.path.join(table_dir, _WATERMARK_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump({"sales_date": sales_date, "full_synced_at": full_synced_at}, fh)
+    os.replace(tmp, path)
+
+
+def full_resync_due(root: Optional[str] = None, now: Optional[datetime] = None) -> bool:
+    """Whether the last full reload is ``SALES_SNAPSHOT_FULL_RESYNC_DAYS`` old (or unknown)."""
+    state = _read_state(root)
+    if not state or FULL_RESYNC_DAYS <= 0:
+        return False
+    last = state.get("full_synced_at")
+    now = now or datetime.utcnow()
+    return last is None or now - datetime.fromisoformat(last) >= timedelta(days=FULL_RESYNC_DAYS)
+
+
+def _read_ipc(path: str) -> pa.Table:
+    """Memory-map one IPC file; the returned table references the mapped pages."""
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).read_all()
+
+
+def _write_ipc(path: str, table: pa.Table) -> None:
+    tmp = f"{path}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, SCHEMA) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    df = df.reindex(columns=SCHEMA.names)
+    df["sales_date"] = pd.to_datetime(df["sales_date"]).dt.date
+    for column in ("quantity_sold", "unit_price", "revenue"):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def _known_ids_since(sales_date: str, root: Optional[str]) -> set:
+    """``sales_id`` values already stored on or after ``sales_date``."""
+    table = load_sales_table(columns=["sales_id"], start_date=sales_date, root=root)
+    return set(table.column("sales_id").to_pylist())
+
+
+def _swap_in(version_dir: str, root: Optional[str] = None) -> None:
+    """Atomically point the snapshot at ``version_dir`` and remove older versions."""
+    link = _table_dir(root)
+    swap = f"{link}.swap"
+    if os.path.lexists(swap):
+        os.remove(swap)
+    os.symlink(os.path.basename(version_dir), swap)
+    if os.path.isdir(link) and not os.path.islink(link):
+        # A snapshot written before versioned directories: move it aside once
+        os.rename(link, f"{link}.legacy")
+    os.replace(swap, link)
+    parent, prefix = os.path.dirname(link), f"{TABLE}."
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        if name.startswith(prefix) and path != version_dir and os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def compact_partition(location_id: str, root: Optional[str] = None) -> None:
+    """Merge all part files of one location into a single file."""
+    partition = _partition_dir(location_id, root)
+    parts = _part_files(partition)
+    if len(parts) <= 1:
+        return
+    merged = pa.concat_tables([_read_ipc(path) for path in parts]).combine_chunks()
+    _write_ipc(os.path.join(partition, "part-00000000.arrow"), merged)
+    for path in parts:
+        if not path.endswith("part-00000000.arrow"):
+            os.remove(path)
+
+
+def sync_sales_snapshot(root: Optional[str] = None, full: bool = False) -> Dict[str, object]:
+    """Bring the snapshot up to date with Supabase.
+
+    Args:
+        root: Snapshot root directory (defaults to ``SALES_SNAPSHOT_DIR``).
+        full: Ignore the watermark and reload the whole history (also done
+            when :func:`full_resync_due`).
+
+    Returns:
+        Dictionary with ``rows_added``, ``locations_touched``, the new
+        ``watermark`` and whether it was a ``full`` reload.
+    """
+    # A first sync is a full load as well
+    full = full or read_watermark(root) is None or full_resync_due(root)
+    now = datetime.utcnow()
+    full_synced_at = now.isoformat() if full else _read_state(root).get("full_synced_at")
+    # A full reload goes to a new version directory, swapped in once complete
+    table_dir = f"{_table_dir(root)}.{now:%Y%m%dT%H%M%S%f}" if full else _table_dir(root)
+    os.makedirs(table_dir, exist_ok=True)
+
+    watermark = None if full else read_watermark(root)
+    since = (_as_date(watermark) - timedelta(days=LOOKBACK_DAYS)).isoformat() if watermark else None
+    filters = [("sales_date", "gte", since)] if since else None
+    known = _known_ids_since(since, root) if since else set()
+
+    writers: Dict[str, ipc.RecordBatchFileWriter] = {}
+    sinks: Dict[str, pa.OSFile] = {}
+    paths: Dict[str, str] = {}
+    rows_added = 0
+    new_watermark = watermark
+
+    try:
+        for batch in iter_batches(TABLE, key="sales_id", columns=_COLUMNS, filters=filters):
+            if known:
+                batch = batch[~batch["sales_id"].isin(known)]
+            if batch.empty:
+                continue
+            batch_max = pd.to_datetime(batch["sales_date"]).max().date().isoformat()
+            new_watermark = max(new_watermark or batch_max, batch_max)
+            rows_added += len(batch)
+
+            for location_id, group in batch.groupby("location_id", sort=False):
+                if location_id not in writers:
+                    partition = _location_dir(table_dir, location_id)
+                    os.makedirs(partition, exist_ok=True)
+                    seq = len(_part_files(partition))
+                    paths[location_id] = os.path.join(partition, f"part-{seq:08d}.arrow")
+                    sinks[location_id] = pa.OSFile(f"{paths[location_id]}.tmp", "wb")
+                    writers[location_id] = ipc.new_file(sinks[location_id], SCHEMA)
+                writers[location_id].write_table(_to_arrow(group))
+    except BaseException:
+        for location_id, writer in writers.items():
+            writer.close()
+            sinks[location_id].close()
+            os.remove(f"{paths[location_id]}.tmp")
+        if full:
+            shutil.rmtree(table_dir, ignore_errors=True)
+        raise
+
+    for location_id, writer in writers.items():
+        writer.close()
+        sinks[location_id].close()
+        os.replace(f"{paths[location_id]}.tmp", paths[location_id])
+        if not full and len(_part_files(_partition_dir(location_id, root))) > MAX_PARTS:
+            compact_partition(location_id, root)
+
+    # The watermark only moves once every part file is in place, so an
+    # interrupted sync simply refetches the same delta next time.
+    if new_watermark and (new_watermark != watermark or full):
+        _write_watermark(new_watermark, full_synced_at, table_dir)
+    if full:
+        _swap_in(table_dir, root)
+
+    return {
+        "rows_added": rows_added,
+        "locations_touched": len(writers),
+        "watermark": new_watermark,
+        "full": full,
+    }
+
+
+def load_sales_table(
+    locations: Optional[Iterable[str]] = None,
+    columns: Optional[List[str]] = None,
+    start_date: Optional[DateLike] = None,
+    end_date: Optional[DateLike] = None,
+    product_ids: Optional[Iterable[str]] = None,
+    root: Optional[str] = None,
+) -> pa.Table:
+    """Read sales rows from the memory-mapped snapshot as an Arrow table.
+
+    Args:
+        locations: Restrict to these locations (only their partitions are opened).
+        columns: Column projection; defaults to every snapshot column.
+        start_date: Inclusive lower bound on ``sales_date``.
+        end_date: Inclusive upper bound on ``sales_date``.
+        product_ids: Restrict to these products.
+        root: Snapshot root directory.
+    """
+    locations = snapshot_locations(root) if locations is None else list(locations)
+    tables = [
+        _read_ipc(path)
+        for location_id in locations
+        for path in _part_files(_partition_dir(location_id, root))
+    ]
+    if not tables:
+        return SCHEMA.empty_table().select(columns or SCHEMA.names)
+    table = pa.concat_tables(tables)
+
+    mask = None
+    if start_date is not None:
+        mask = pc.greater_equal(table.column("sales_date"), pa.scalar(_as_date(start_date), pa.date32()))
+    if end_date is not None:
+        upper = pc.less_equal(table.column("sales_date"), pa.scalar(_as_date(end_date), pa.date32()))
+        mask = upper if mask is None else pc.and_(mask, upper)
+    if product_ids is not None:
+        wanted = pc.is_in(table.column("product_id"), value_set=pa.array(list(product_ids), pa.string()))
+        mask = wanted if mask is None else pc.and_(mask, wanted)
+    if mask is not None:
+        table = table.filter(mask)
+    return table.select(columns or SCHEMA.names)
+
+
+def load_sales(
+    locations: Optional[Iterable[str]] = None,
+    columns: Optional[List[str]] = None,
+    start_date: Optional[DateLike] = None,
+    end_date: Optional[DateLike] = None,
+    product_ids: Optional[Iterable[str]] = None,
+    root: Optional[str] = None,
+) -> pd.DataFrame:
+    """``load_sales_table`` converted to a pandas DataFrame."""
+    table = load_sales_table(locations, columns, start_date, end_date, product_ids, root)
+    return table.to_pandas()
+
+
+def _as_date(value: DateLike) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+if __name__ == "__main__":
+    print(sync_sales_snapshot())
@@ -1,16 +1,199 @@
 # backend/supabase/supabase_client.py
+"""
+Shared Supabase data-access layer.
+
+Every analytics module goes through this module instead of calling
+``create_client`` itself.  The client is created lazily on first use (so
+importing an analytics module no longer opens an HTTP session or fails when
+credentials are missing) and is backed by a single keep-alive ``httpx``
+connection pool that is reused for every ``.execute()`` made by the process.
+
+The pool size and timeouts are configurable through environment variables:
+
+* ``SUPABASE_POOL_MAX_CONNECTIONS`` – maximum open connections (default 20)
+* ``SUPABASE_POOL_MAX_KEEPALIVE`` – idle connections kept alive (default 10)
+* ``SUPABASE_POOL_KEEPALIVE_EXPIRY`` – seconds an idle connection lives (default 30)
+* ``SUPABASE_CONNECT_TIMEOUT`` / ``SUPABASE_READ_TIMEOUT`` – seconds (defaults 5 / 60)
+
+Every HTTP request is counted per table so jobs can report how many
+round-trips they made (see :func:`request_counts`).
+
+Setting ``SUPABASE_BACKEND=local`` swaps the network client for the
+SQLite-backed :class:`backend.supabase.local_backend.LocalClient`
+(``LOCAL_DB_PATH``, default ``:memory:``), seeded from the migrations, so
+jobs and tests run offline without credentials.
+"""
 
-from supabase import create_client
 import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import httpx
 from dotenv import load_dotenv
+from supabase import Client, create_client
+from supabase.lib.client_options import SyncClientOptions
 
 # تحميل متغيرات البيئة من ملف .env
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+# ``SUPABASE_SERVICE_ROLE_KEY`` is the documented name (see .env.example and
+# app_settings.py); ``SUPABASE_SERVICE_KEY`` is still accepted for older setups.
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_SERVICE_KEY")
+
+POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", "60"))
+
+BACKEND = os.getenv("SUPABASE_BACKEND", "supabase").lower()
+LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH", ":memory:")
+
+_REST_PREFIX = "/rest/v1/"
+
+# ``{"column": value}`` or ``[("column", "operator", value), ...]``
+Filters = Union[Dict[str, Any], Iterable[Tuple[str, str, Any]]]
+
+_client: Optional[Client] = None
+_http_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+_request_counts: Counter = Counter()
+_counts_lock = threading.Lock()
+
+
+def is_configured() -> bool:
+    """Return ``True`` if Supabase credentials are available or the local backend is selected."""
+    return BACKEND == "local" or bool(SUPABASE_URL and SUPABASE_SERVICE_KEY)
+
+
+def _table_from_path(path: str) -> str:
+    """Extract the table (or ``rpc/<function>``) name from a PostgREST URL path."""
+    if _REST_PREFIX in path:
+        return path.split(_REST_PREFIX, 1)[1].strip("/") or "<root>"
+    return path.strip("/") or "<root>"
+
+
+def _count_table(table: str) -> None:
+    with _counts_lock:
+        _request_counts[table] += 1
+
+
+def _count_request(request: httpx.Request) -> None:
+    """``httpx`` request hook: count one round-trip against its table."""
+    _count_table(_table_from_path(request.url.path))
+
+
+def _build_http_client() -> httpx.Client:
+    """Create the pooled keep-alive HTTP client shared by all table requests."""
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        follow_redirects=True,
+        http2=True,
+        event_hooks={"request": [_count_request]},
+    )
+
+
+def get_client() -> Client:
+    """Return the process-wide Supabase client, creating it on first use.
+
+    Raises:
+        ValueError: If the Supabase credentials are not set.
+    """
+    global _client, _http_client
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            if BACKEND == "local":
+                from backend.supabase.local_backend import LocalClient
+
+                _client = LocalClient(LOCAL_DB_PATH)
+                return _client
+            if not is_configured():
+                raise ValueError("Supabase credentials not set in .env")
+            _http_client = _build_http_client()
+            options = SyncClientOptions(httpx_client=_http_client)
+            _client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY, options=options)
+    return _client
+
+
+def use_local_backend(path: str = ":memory:"):
+    """Switch this process to a fresh local backend and return its client."""
+    global BACKEND, LOCAL_DB_PATH
+    close_client()
+    BACKEND, LOCAL_DB_PATH = "local", path
+    return get_client()
+
+
+def apply_filters(query, filters: Optional[Filters] = None):
+    """Apply a filter spec to a PostgREST query builder.
+
+    ``filters`` is either a mapping of ``column -> value`` (``eq``, or ``in_``
+    when the value is a list/tuple/set) or an iterable of
+    ``(column, operator, value)`` triples where ``operator`` is a query
+    builder method name such as ``"gte"``, ``"lte"`` or ``"neq"``.
+    """
+    if not filters:
+        return query
+    if isinstance(filters, dict):
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                query = query.in_(column, list(value))
+            else:
+                query = query.eq(column, value)
+        return query
+    for column, operator, value in filters:
+        query = getattr(query, operator)(column, value)
+    return query
+
+
+def close_client() -> None:
+    """Close the connection pool and drop the client (e.g. after a fork or in tests)."""
+    global _client, _http_client
+    with _client_lock:
+        if _http_client is not None:
+            _http_client.close()
+        if BACKEND == "local" and _client is not None:
+            _client.close()
+        _client = None
+        _http_client = None
+
+
+def request_counts() -> Dict[str, int]:
+    """Return the number of HTTP requests made so far, keyed by table name."""
+    with _counts_lock:
+        return dict(_request_counts)
+
+
+def reset_request_counts() -> None:
+    """Reset the per-table request counters."""
+    with _counts_lock:
+        _request_counts.clear()
+
+
+class _LazyClient:
+    """Proxy that forwards attribute access to :func:`get_client`.
+
+    Keeps ``from backend.supabase.supabase_client import supabase`` working
+    for existing modules while deferring client construction to the first
+    ``supabase.table(...)`` call.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_client(), name)
+
+    def __repr__(self) -> str:
+        state = "connected" if _client is not None else "not initialised"
+        return f"<lazy Supabase client ({state})>"
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
-    raise ValueError("Supabase credentials not set in .env")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+supabase = _LazyClient()
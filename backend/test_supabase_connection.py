@@ -1,15 +1,4 @@
-from supabase import create_client, Client
-
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+from backend.supabase.supabase_client import supabase
 
 # --- Test Query ---
 def test_connection():
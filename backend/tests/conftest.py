@@ -0,0 +1,15 @@
+import pytest
+
+from backend.supabase import supabase_client as sc
+
+
+@pytest.fixture
+def local_client():
+    """Fresh in-process SQLite backend seeded from the migrations."""
+    backend = sc.BACKEND
+    client = sc.use_local_backend()
+    try:
+        yield client
+    finally:
+        sc.close_client()
+        sc.BACKEND = backend
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.analytics.clustering import abc_xyz
+from backend.analytics.clustering.product_classification import main
+
+
+def _reference_abc(frame):
+    """Per-location loop with the same Pareto rule."""
+    out = {}
+    for _, group in frame.groupby("location_id"):
+        group = group.sort_values("value", ascending=False, kind="mergesort")
+        total, before = group["value"].sum(), 0.0
+        for index, value in group["value"].items():
+            share = before / total if total > 0 else 1.0
+            out[index] = "A" if share < abc_xyz.ABC_A_SHARE else "B" if share < abc_xyz.ABC_B_SHARE else "C"
+            before += value
+    return pd.Series(out)
+
+
+def test_abc_matches_per_location_loop():
+    rng = np.random.default_rng(11)
+    frame = pd.DataFrame({
+        "product_id": [f"P{i}" for i in range(500)],
+        "location_id": rng.choice(["L1", "L2", "L3", "L4"], 500),
+        "value": rng.pareto(1.5, 500) * 100,
+        "cv": rng.uniform(0, 1.5, 500),
+        "lead_time_days": rng.uniform(1, 40, 500),
+    })
+    segmented = abc_xyz.segment(frame)
+    assert (segmented["abc_class"] == _reference_abc(frame).loc[frame.index]).all()
+    top = segmented.loc[segmented.groupby("location_id")["value"].idxmax()]
+    assert (top["abc_class"] == "A").all() and (top["rank"] == 1).all()
+    assert set(segmented["segment"]) <= {a + x for a in "ABC" for x in "XYZ"}
+
+    matrix = abc_xyz.segment_matrix(segmented)
+    assert len(matrix) == 9 and matrix["products"].sum() == 500
+    assert matrix["value"].sum() == pytest.approx(frame["value"].sum())
+    assert len(abc_xyz.segment_matrix(segmented, by_location=True)) == 36
+
+
+def test_xyz_and_lead_time_bins():
+    assert list(abc_xyz.xyz_classes([0.1, 0.5, 0.7, 1.0, 2.0, np.nan])) == ["X", "X", "Y", "Y", "Z", "Z"]
+    assert list(abc_xyz.lead_time_categories([3, 7, 10, 21, 30])) == ["Short", "Short", "Medium", "Medium", "Long"]
+
+
+def test_abc_xyz_mode_stores_classification(local_client):
+    local_client.table("inventory_planning_view").insert([
+        {"product_id": "P1", "location_id": "L1", "average_daily_usage": 100.0, "demand_variability": 0.2, "lead_time_days": 5},
+        {"product_id": "P2", "location_id": "L1", "average_daily_usage": 10.0, "demand_variability": 0.8, "lead_time_days": 5},
+        {"product_id": "P3", "location_id": "L1", "average_daily_usage": 1.0, "demand_variability": 1.4, "lead_time_days": 5},
+    ]).execute()
+    local_client.table("items").insert([{"item_id": "P1", "supply_lead_time": 20, "manufacturing_lead_time": 10}]).execute()
+    main(mode="abc_xyz")
+    rows = {r["product_id"]: r for r in local_client.table("product_classification").select("*").execute().data}
+    assert rows["P1"]["classification_label"] == "A" and rows["P1"]["lead_time_category"] == "Long"
+    assert rows["P2"]["classification_label"] == "B" and rows["P2"]["variability_level"] == "Medium"
+    assert rows["P3"]["classification_label"] == "C" and rows["P3"]["lead_time_category"] == "Short"
+
+
+def test_locations_with_unpriced_rows_rank_by_adu(local_client):
+    local_client.table("inventory_planning_view").insert([
+        {"product_id": "P1", "location_id": "L1", "average_daily_usage": 1.0, "demand_variability": 0.2, "lead_time_days": 5},
+        {"product_id": "P2", "location_id": "L1", "average_daily_usage": 50.0, "demand_variability": 0.2, "lead_time_days": 5},
+        {"product_id": "P1", "location_id": "L2", "average_daily_usage": 1.0, "demand_variability": 0.2, "lead_time_days": 5},
+        {"product_id": "P3", "location_id": "L2", "average_daily_usage": 50.0, "demand_variability": 0.2, "lead_time_days": 5},
+    ]).execute()
+    local_client.table("product_pricing-master").insert([
+        {"product_id": "P1", "effective_date": "2026-01-01", "price": 500.0},
+        {"product_id": "P2", "effective_date": "2026-01-01", "price": 1.0},
+    ]).execute()
+    inputs = abc_xyz.load_segmentation_inputs().set_index(["location_id", "product_id"])
+    # L1 is fully priced: P1 (500 per day) outranks P2 (50 per day)
+    assert inputs.loc[("L1", "P1"), "value"] == 500.0 and inputs.loc[("L1", "P2"), "value_basis"] == "price"
+    # P3 has no price, so L2 ranks by ADU only
+    assert inputs.loc[("L2", "P1"), "value"] == 1.0 and inputs.loc[("L2", "P3"), "value_basis"] == "adu"
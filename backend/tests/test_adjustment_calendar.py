@@ -0,0 +1,74 @@
+from datetime import date
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from backend.analytics.ddmrp import adjustment_calendar
+from backend.analytics.ddmrp.adjustment_calendar import (
+    AdjustmentCalendar,
+    calculate_buffer_zone_plan,
+    plan_buffer_zones,
+)
+from backend.supabase.bulk import read_table
+
+START = date(2024, 6, 1)
+BASE = pd.DataFrame({
+    "product_id": ["A", "B"],
+    "location_id": ["L1", "L1"],
+    "adu": [10.0, 4.0],
+    "dlt": [5.0, 10.0],
+    "lt_factor": [1.0, 1.0],
+    "variability_factor": [0.5, 0.5],
+    "order_cycle_days": [7.0, 7.0],
+    "moq": [0.0, 0.0],
+    "rounding_multiple": [0.0, 0.0],
+})
+
+
+def _range(product, start, end, value, column, ramp=0):
+    return {"product_id": product, "location_id": "L1", "start_date": start, "end_date": end, column: value, "ramp_days": ramp}
+
+
+def test_factor_grid_precedence_and_ramp():
+    calendar = AdjustmentCalendar({
+        "daf": pd.DataFrame([
+            _range("*", "2024-06-01", "2024-06-10", 2.0, "daf"),
+            _range("A", "2024-06-03", "2024-06-04", 0.5, "daf"),
+            _range("B", "2024-05-30", "2024-06-02", 3.0, "daf", ramp=4),
+        ]),
+    })
+    pairs = pd.MultiIndex.from_tuples([("A", "L1"), ("B", "L1")])
+    grid = calendar.factor_grid("daf", pairs, START, 12)
+    np.testing.assert_allclose(grid[0], [2, 2, 0.5, 0.5, 2, 2, 2, 2, 2, 2, 1, 1])
+    # B's ramp started on 05-30: day 3 and 4 of 4, then the segment range takes over
+    np.testing.assert_allclose(grid[1, :4], [2.5, 3.0, 2.0, 2.0])
+
+
+def test_plan_zones_and_persist_only_changes(local_client):
+    calendar = AdjustmentCalendar({"ltaf": pd.DataFrame([_range("A", "2024-06-02", "2024-06-02", 2.0, "ltaf")])})
+    plan = plan_buffer_zones(BASE, calendar, START, 3)
+    np.testing.assert_allclose(plan["red_zone"][0], [25.0, 50.0, 25.0])
+    np.testing.assert_allclose(plan["green_zone"][1], [28.0, 28.0, 28.0])
+
+    local_client.table("inventory_ddmrp_buffers_view").insert(BASE.to_dict("records")).execute()
+    first = calculate_buffer_zone_plan(START, horizon_days=3)
+    assert first["rows_changed"] == 6
+    assert calculate_buffer_zone_plan(START, horizon_days=3)["rows_changed"] == 0
+
+    local_client.table("demand_adjustment_factor").insert(
+        {"product_id": "B", "location_id": "L1", "start_date": "2024-06-03", "end_date": "2024-06-30", "daf": 1.5}
+    ).execute()
+    assert calculate_buffer_zone_plan(START, horizon_days=3)["rows_changed"] == 1
+    stored = local_client.table("buffer_zone_plan").select("*").eq("product_id", "B").eq("plan_date", "2024-06-03").execute().data
+    assert stored[0]["red_zone"] == 30.0
+
+
+def test_load_keeps_daf_ranges_sharing_a_start_date(local_client, monkeypatch):
+    monkeypatch.setattr(adjustment_calendar, "read_table", partial(read_table, page_size=1, max_workers=1))
+    local_client.table("demand_adjustment_factor").insert([
+        {"product_id": "A", "location_id": "L1", "start_date": "2024-06-01", "end_date": end, "daf": value}
+        for end, value in [("2024-06-02", 2.0), ("2024-06-05", 3.0), ("2024-06-09", 4.0)]
+    ]).execute()
+    calendar = AdjustmentCalendar.load(START, horizon_days=10)
+    assert sorted(calendar.calendars["daf"]["daf"].astype(float)) == [2.0, 3.0, 4.0]
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+
+from backend.analytics.ddmrp.alerts import generate_alerts
+from backend.supabase.local_backend import split_statements
+
+
+def _set_colors(client, colors):
+    client.table("net_flow").upsert(
+        [{"product_id": p, "location_id": "L1", "color": c} for p, c in colors.items()],
+        on_conflict="product_id,location_id",
+    ).execute()
+
+
+def test_alerts_follow_color_transitions(local_client):
+    _set_colors(local_client, {"A": "red", "B": "yellow", "C": "green"})
+    local_client.table("net_flow").insert({"product_id": "SOLO", "location_id": "L2", "color": "red"}).execute()
+
+    first = generate_alerts()
+    assert {(a["item_id"], a["color"]) for a in first} == {("A", "red"), ("B", "yellow"), ("SOLO", "red")}
+    assert generate_alerts() == []
+
+    _set_colors(local_client, {"A": "green", "B": "red", "C": "yellow"})
+    second = generate_alerts()
+    assert {(a["item_id"], a["color"], a["previous_color"]) for a in second} == {("B", "red", "yellow"), ("C", "yellow", None)}
+
+    alerts = local_client.table("alerts").select("item_id, color, status").execute().data
+    open_alerts = {(a["item_id"], a["color"]) for a in alerts if a["status"] == "open"}
+    assert open_alerts == {("B", "red"), ("C", "yellow"), ("SOLO", "red")}
+    assert len(alerts) == 5
+
+
+def test_migration_backfill_keeps_one_open_alert_per_item():
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "supabase", "migrations", "20261017100000_alert_transitions.sql")
+    with open(path, encoding="utf-8") as fh:
+        statements = [s.replace("public.", "") for s in split_statements(fh.read())]
+    backfill = [s for s in statements if s.lstrip().upper().startswith(("WITH", "CREATE UNIQUE INDEX"))]
+    assert len(backfill) == 2
+
+    # An alerts table as the previous generator left it: one row per run
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE alerts (id INTEGER PRIMARY KEY, item_id TEXT, location_id TEXT, color TEXT, created_at TEXT)")
+    db.executemany("INSERT INTO alerts (item_id, location_id, color, created_at) VALUES (?, ?, ?, ?)", [
+        ("A", None, "red", "2024-01-01"), ("A", None, "red", "2024-01-02"), ("A", None, "yellow", "2024-01-03"),
+        ("B", "L1", "red", "2024-01-01"), ("B", "L1", "red", "2024-01-02"), ("B", "L2", "red", "2024-01-01"),
+    ])
+    for column in ("status", "resolved_at", "previous_color"):
+        db.execute(f"ALTER TABLE alerts ADD COLUMN {column} TEXT")
+    for statement in backfill:
+        db.execute(statement)
+
+    rows = db.execute("SELECT item_id, location_id, color, created_at FROM alerts WHERE status = 'open' ORDER BY item_id, location_id").fetchall()
+    assert rows == [("A", None, "yellow", "2024-01-03"), ("B", "L1", "red", "2024-01-02"), ("B", "L2", "red", "2024-01-01")]
+    assert db.execute("SELECT COUNT(*) FROM alerts WHERE status = 'resolved' AND resolved_at IS NOT NULL").fetchone()[0] == 3
@@ -0,0 +1,36 @@
+import numpy as np
+
+from backend.analytics.ddmrp.buffer_profiles import (
+    calculate_buffer_profiles,
+    calculate_buffer_profiles_batch,
+    compute_buffer_zones,
+)
+
+
+def test_batch_matches_scalar_profiles(local_client):
+    rng = np.random.default_rng(0)
+    adu, dlt, moq, var = rng.uniform(0, 20, (4, 50))
+    ids = [f"I{i}" for i in range(50)]
+
+    result = calculate_buffer_profiles_batch(ids, adu, dlt, moq, var)
+    assert result["write_stats"]["rows_written"] == 50
+
+    for i in range(50):
+        expected = calculate_buffer_profiles(ids[i], adu[i], dlt[i], moq[i], var[i])
+        assert np.isclose(result["red_zone"][i], expected["red_zone"])
+        assert np.isclose(result["yellow_zone"][i], expected["yellow_zone"])
+        assert np.isclose(result["green_zone"][i], expected["green_zone"])
+    stored = local_client.table("buffers").select("*", count="exact", head=True).execute()
+    assert stored.count == 50
+
+
+def test_zones_broadcast_scalars_and_arrays():
+    red, yellow, green = compute_buffer_zones(5.0, 10.0, 1.0)
+    assert (red, yellow, green) == (50.0, 25.0, 100.0)
+
+    red, _, _ = compute_buffer_zones(5.0, 10.0, [1, 2, 300])
+    np.testing.assert_allclose(red, [50.0, 50.0, 300.0])
+
+    red, _, green = compute_buffer_zones([1.0, 2.0], 10.0, 0.0, [[1.0], [0.5]])
+    np.testing.assert_allclose(red, [[10.0, 20.0], [5.0, 10.0]])
+    np.testing.assert_allclose(green, 2 * red)
@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+
+import pytest
+
+from backend.analytics.ddmrp.bullwhip_analysis import (
+    _compute_bullwhip,
+    analyze_bullwhip_by_location,
+    batch_calculate_bullwhip,
+    compute_bullwhip_batch,
+    get_top_bullwhip_candidates,
+)
+
+PAIRS = [("A", "L1"), ("B", "L1"), ("C", "L2"), ("D", "L2")]
+
+
+@pytest.fixture
+def client(local_client):
+    today = date.today()
+    sales, orders = [], []
+    for i in range(20):
+        day = (today - timedelta(days=i + 1)).isoformat()
+        sales.append({"sales_id": f"A{i}", "product_id": "A", "location_id": "L1", "sales_date": day, "quantity_sold": 10 + i % 3})
+        sales.append({"sales_id": f"B{i}", "product_id": "B", "location_id": "L1", "sales_date": day, "quantity_sold": 5 + i % 5})
+        sales.append({"sales_id": f"C{i}", "product_id": "C", "location_id": "L2", "sales_date": day, "quantity_sold": 7})
+        if i % 4 == 0:
+            orders.append({"id": f"PA{i}", "product_id": "A", "location_id": "L1", "order_date": day, "ordered_qty": 20 + 15 * (i % 8)})
+            orders.append({"id": f"PC{i}", "product_id": "C", "location_id": "L2", "order_date": day, "ordered_qty": 30 + i})
+    orders.append({"id": "PB", "product_id": "B", "location_id": "L1", "order_date": today.isoformat(), "ordered_qty": 40})
+    # Outside the analysis window
+    sales.append({"sales_id": "old", "product_id": "A", "location_id": "L1", "sales_date": (today - timedelta(days=400)).isoformat(), "quantity_sold": 999})
+    local_client.table("historical_sales_data").insert(sales).execute()
+    local_client.table("open_pos").insert(orders).execute()
+    return local_client
+
+
+def _same(a, b):
+    assert a.keys() == b.keys()
+    for key in a:
+        if isinstance(a[key], float) and a[key] != a[key]:
+            assert b[key] != b[key]
+        elif a[key] is None:
+            assert b[key] is None
+        else:
+            assert a[key] == pytest.approx(b[key]), key
+
+
+def test_batch_matches_per_pair(client):
+    results, records = compute_bullwhip_batch(PAIRS, 90)
+    assert [r["status"] for r in results] == ["success", "success", "success", "insufficient_data"]
+    single = [_compute_bullwhip(p, l, 90) for p, l in PAIRS]
+    for batch_result, (result, _) in zip(results, single):
+        _same(batch_result, result)
+    for batch_record, expected in zip(records, [r for _, r in single if r is not None]):
+        _same(batch_record, expected)
+
+
+def test_batch_persists_and_summarises(client):
+    summary = batch_calculate_bullwhip(PAIRS)
+    assert summary["successful"] == 3 and summary["insufficient_data"] == 1
+    stored = client.table("bullwhip_analysis").select("product_id").execute().data
+    assert sorted(r["product_id"] for r in stored) == ["A", "B", "C"]
+
+
+def test_single_order_leaves_the_ratio_undefined(client):
+    results, records = compute_bullwhip_batch(PAIRS)
+    assert results[1]["status"] == "success"
+    assert results[1]["bullwhip_ratio"] != results[1]["bullwhip_ratio"]
+    assert [r["bullwhip_ratio"] is None for r in records] == [False, True, False]
+
+
+def test_summary_follows_upserts(client):
+    results, _ = compute_bullwhip_batch(PAIRS)
+    ratios = {r["product_id"]: r["bullwhip_ratio"] for r in results
+              if r["status"] == "success" and r["bullwhip_ratio"] == r["bullwhip_ratio"]}
+    batch_calculate_bullwhip(PAIRS)
+
+    top = get_top_bullwhip_candidates(2)
+    assert [c["product_id"] for c in top] == sorted(ratios, key=ratios.get, reverse=True)[:2]
+
+    # B's undefined ratio is left out of L1's summary
+    stats = analyze_bullwhip_by_location("L1")
+    assert stats["total_products"] == 1
+    assert stats["max_bullwhip_ratio"] == stats["avg_bullwhip_ratio"] == ratios["A"]
+    assert [p["product_id"] for p in stats["top_5_products"]] == ["A"]
+    assert analyze_bullwhip_by_location("L9")["status"] == "no_data"
+
+    stored = client.table("bullwhip_location_summary").select("location_id, total_products").execute().data
+    assert sorted((r["location_id"], r["total_products"]) for r in stored) == [("L1", 1), ("L2", 1)]
+    persisted = client.table("bullwhip_top_candidates").select("rank, product_id").order("rank").execute().data
+    assert [r["product_id"] for r in persisted] == sorted(ratios, key=ratios.get, reverse=True)
@@ -0,0 +1,33 @@
+import random
+
+import pandas as pd
+
+from backend.analytics.ddmrp.bullwhip_summary import latest_results, summarise_locations, top_candidate_rows
+
+
+def test_summaries_match_full_recount():
+    rng = random.Random(7)
+    rows = [
+        {"product_id": f"P{rng.randrange(40)}", "location_id": f"L{rng.randrange(4)}",
+         "analysis_period_end": f"2026-10-{rng.randrange(1, 29):02d}",
+         "bullwhip_ratio": None if rng.random() < 0.1 else round(rng.uniform(0.2, 4.0), 3), "bullwhip_score": 50}
+        for _ in range(500)
+    ]
+    latest = latest_results(pd.DataFrame(rows))
+    summaries = {s["location_id"]: s for s in summarise_locations(latest, top_k=5)}
+
+    current = {}
+    for row in sorted(rows, key=lambda r: r["analysis_period_end"]):
+        current[(row["product_id"], row["location_id"])] = row["bullwhip_ratio"]
+    current = {pair: ratio for pair, ratio in current.items() if ratio is not None}
+    for location_id, summary in summaries.items():
+        ratios = [r for (_, l), r in current.items() if l == location_id]
+        assert summary["total_products"] == len(ratios)
+        assert abs(summary["avg_bullwhip_ratio"] - sum(ratios) / len(ratios)) < 1e-9
+        assert summary["critical_products"] == sum(r >= 2.0 for r in ratios)
+        assert summary["products_with_amplification"] == sum(r > 1.0 for r in ratios)
+        assert [p["bullwhip_ratio"] for p in summary["top_products"]] == sorted(ratios, reverse=True)[:5]
+
+    top = top_candidate_rows(summaries.values(), top_k=5)
+    assert [c["bullwhip_ratio"] for c in top] == sorted(current.values(), reverse=True)[:5]
+    assert [c["rank"] for c in top] == [1, 2, 3, 4, 5]
@@ -0,0 +1,77 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from backend.analytics.ddmrp import bullwhip_windows
+from backend.analytics.ddmrp.bullwhip_windows import BullwhipPrefixSums
+
+END = date(2024, 6, 30)
+
+
+def _history(seed=0, days=120):
+    rng = np.random.default_rng(seed)
+    dates = [END - timedelta(days=i) for i in range(days)]
+    sales = pd.DataFrame({
+        "product_id": np.repeat(["A", "B"], days),
+        "location_id": "L1",
+        "sales_date": dates * 2,
+        "quantity_sold": rng.integers(0, 20, 2 * days).astype(float),
+    })
+    orders = sales.iloc[::5].rename(columns={"sales_date": "order_date", "quantity_sold": "ordered_qty"})
+    orders["ordered_qty"] *= 5
+    return sales, orders
+
+
+def test_window_moments_match_direct_computation():
+    sales, orders = _history()
+    engine = BullwhipPrefixSums.build(sales, orders, END, history_days=90)
+    metrics = engine.metrics([30, 90])
+
+    for window in (30, 90):
+        start = END - timedelta(days=window - 1)
+        for product in ("A", "B"):
+            daily = sales[(sales.product_id == product) & (sales.sales_date >= start)]["quantity_sold"]
+            ordered = orders[(orders.product_id == product) & (orders.order_date >= start)]
+            order_daily = ordered.groupby("order_date")["ordered_qty"].sum().reindex(
+                pd.date_range(start, END).date, fill_value=0.0
+            )
+            row = metrics[(metrics.product_id == product) & (metrics.window_days == window)].iloc[0]
+            assert np.isclose(row.customer_demand_std_dev, daily.std())
+            assert np.isclose(row.order_qty_mean, order_daily.mean())
+            assert np.isclose(row.order_qty_std_dev, order_daily.std())
+            expected = (order_daily.std() / order_daily.mean()) / (daily.std() / daily.mean())
+            assert np.isclose(row.bullwhip_ratio, expected)
+
+
+def test_append_matches_rebuild_and_weekly_buckets():
+    sales, orders = _history()
+    cutoff = END - timedelta(days=14)
+    engine = BullwhipPrefixSums.build(
+        sales[sales.sales_date <= cutoff], orders[orders.order_date <= cutoff], cutoff, history_days=60
+    )
+    assert engine.append(sales[sales.sales_date > cutoff], orders[orders.order_date > cutoff], END) == 14
+    rebuilt = BullwhipPrefixSums.build(sales, orders, END, history_days=60)
+    pd.testing.assert_frame_equal(engine.metrics([30, 60]), rebuilt.metrics([30, 60]))
+
+    weekly = BullwhipPrefixSums.build(sales, orders, END, history_days=84, bucket="weekly")
+    demand = weekly.moments(28, "demand")
+    last_four = sales[(sales.product_id == "A") & (sales.sales_date > END - timedelta(days=28))]
+    assert np.isclose(demand["mean"][0], last_four["quantity_sold"].sum() / 4)
+
+
+def test_history_reads_share_a_location_generator(local_client, monkeypatch):
+    seen = {}
+
+    def load_sales(locations=None, **kwargs):
+        seen["sales"] = list(locations)
+        return pd.DataFrame()
+
+    monkeypatch.setattr(bullwhip_windows.sales_snapshot, "SNAPSHOT_ENABLED", True)
+    monkeypatch.setattr(bullwhip_windows.sales_snapshot, "load_sales", load_sales)
+    local_client.table("open_pos").insert([
+        {"id": "1", "product_id": "A", "location_id": "L1", "order_date": "2024-01-05", "ordered_qty": 5},
+    ]).execute()
+    history = bullwhip_windows.load_bullwhip_history(date(2024, 1, 1), date(2024, 1, 31), (l for l in ["L1", "L2"]))
+    assert seen["sales"] == ["L1", "L2"]
+    assert len(history["orders"]) == 1
@@ -0,0 +1,39 @@
+from backend.supabase.cache import TTLCache
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = TTLCache(ttl=60, max_entries=2)
+    loads = []
+
+    def loader(key):
+        return lambda: loads.append(key) or {"key": key}
+
+    assert cache.get("a", loader("a")) == {"key": "a"}
+    cache.get("a", loader("a"))
+    cache.get("b", loader("b"))
+    cache.get("c", loader("c"))
+    cache.get("a", loader("a"))
+    assert loads == ["a", "b", "c", "a"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["evictions"] == 2
+
+
+def test_expiry_and_invalidation():
+    cache = TTLCache(ttl=0)
+    assert cache.get("a", lambda: 1) == 1
+    assert cache.get("a", lambda: 2) == 2
+
+    cache = TTLCache(ttl=60)
+    cache.get("a", lambda: 1)
+    cache.invalidate("a")
+    assert cache.get("a", lambda: 2) == 2
+
+
+def test_load_racing_an_invalidation_is_not_stored():
+    cache = TTLCache(ttl=60)
+
+    def stale_loader():
+        cache.invalidate("a")
+        return "stale"
+
+    assert cache.get("a", stale_loader) == "stale"
+    assert cache.get("a", lambda: "fresh") == "fresh"
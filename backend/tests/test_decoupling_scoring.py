@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from backend.analytics.ddmrp.bullwhip_windows import calculate_bullwhip_windows
+from backend.analytics.ddmrp.decoupling_scoring import (
+    BULLWHIP_WINDOW_DAYS,
+    DEFAULT_WEIGHTS,
+    FACTORS,
+    designate_decoupling_points,
+    factor_scores,
+    load_factor_inputs,
+    load_scenarios,
+    score_pairs,
+)
+
+PAIRS = pd.DataFrame({"product_id": ["A", "B", "C"], "location_id": ["L1", "L1", "L2"]})
+
+
+def _seed(client):
+    client.table("product_master").insert([
+        {"product_id": "A", "shelf_life_days": 2, "supplier_id": "S1", "buffer_profile_id": "BP_FAST"},
+        {"product_id": "B", "shelf_life_days": 30, "supplier_id": "S2"},
+    ]).execute()
+    client.table("supplier_performance").insert([
+        {"supplier_id": "S1", "on_time_delivery_rate": 0.6},
+        {"supplier_id": "S2", "on_time_delivery_rate": 0.99},
+    ]).execute()
+    client.table("demand_history_analysis").insert([
+        {"id": "1", "sku": "A", "product_id": "A", "location_id": "L1", "analysis_period_start": "2024-01-01",
+         "analysis_period_end": "2024-03-31", "mean_demand": 10, "std_dev_demand": 9, "cv": 0.9},
+        {"id": "2", "sku": "B", "product_id": "B", "location_id": "L1", "analysis_period_start": "2024-01-01",
+         "analysis_period_end": "2024-03-31", "mean_demand": 10, "std_dev_demand": 1, "cv": 0.1},
+    ]).execute()
+    client.table("menu_mapping").insert([
+        {"id": "1", "sku": "A", "product_id": "A", "is_core_item": True, "sales_impact_percentage": 60},
+    ]).execute()
+    client.table("storage_requirements").insert([
+        {"id": "1", "sku": "A", "product_id": "A", "storage_type": "FROZEN", "cubic_meters_per_unit": 0.02},
+    ]).execute()
+    client.table("usage_analysis").insert([
+        {"id": "1", "sku": "A", "product_id": "A", "location_id": "L1", "percentage_of_total_usage": 25},
+        {"id": "2", "sku": "B", "product_id": "B", "location_id": "L1", "percentage_of_total_usage": 1},
+    ]).execute()
+    client.table("moq_data").insert([
+        {"id": "1", "sku": "A", "product_id": "A", "moq_units": 200, "avg_daily_demand": 10, "days_coverage": 20},
+    ]).execute()
+
+
+def test_factor_scores_follow_sql_rules(local_client):
+    _seed(local_client)
+    inputs = load_factor_inputs(PAIRS)
+    factors = dict(zip(FACTORS, factor_scores(inputs)[0]))
+    assert factors == {
+        "variability": 96.0, "criticality": 90.0, "holding_cost": 100.0, "supplier_reliability": 35.0,
+        "lead_time": 50.0, "volume": 90.0, "storage_intensity": 100.0, "moq_rigidity": 90.0, "bullwhip": 50.0,
+    }
+    # No inputs at all: neutral where the SQL defaults are neutral
+    assert list(factor_scores(inputs)[2]) == [50.0, 20.0, 50.0, 50.0, 50.0, 50.0, 50.0, 50.0, 50.0]
+
+    scenarios = {"default": DEFAULT_WEIGHTS, "bullwhip_heavy": {"bullwhip": 0.5, "variability": 0.5}}
+    result = score_pairs(inputs, scenarios)
+    for j, weights in enumerate(scenarios.values()):
+        expected = result["factors"] @ np.array([weights.get(f, 0.0) for f in FACTORS])
+        np.testing.assert_allclose(result["scores"][:, j], np.round(expected, 2))
+    assert len(result["frame"]) == 6
+
+
+def test_scenarios_use_active_rows_and_8factor_default(local_client):
+    local_client.table("decoupling_weights_config").insert([
+        {"id": "1", "scenario_name": "default", "variability_weight": 0.25, "is_active": True},
+        {"id": "2", "scenario_name": "bullwhip_heavy", "bullwhip_weight": 0.5, "variability_weight": 0.5, "is_active": True},
+        {"id": "3", "scenario_name": "retired", "volume_weight": 1.0, "is_active": False},
+    ]).execute()
+    scenarios = load_scenarios()
+    # The seeded 'default' row is ignored: "default" is the 8-factor weight set
+    assert set(scenarios) == {"default", "bullwhip_heavy"} and scenarios["default"] == DEFAULT_WEIGHTS
+    assert load_scenarios(["retired"]) == {"retired": DEFAULT_WEIGHTS}
+    assert load_scenarios(["bullwhip_heavy"])["bullwhip_heavy"]["bullwhip"] == 0.5
+
+
+def test_designation_is_bulk_and_skips_existing(local_client):
+    _seed(local_client)
+    local_client.table("location_master").insert([{"location_id": "L1"}, {"location_id": "L2"}]).execute()
+    local_client.table("decoupling_points").insert({"id": "dp1", "product_id": "C", "location_id": "L2"}).execute()
+    # L3 is not in location_master, so the edge function would not score it
+    pairs = pd.concat([PAIRS, pd.DataFrame({"product_id": ["A"], "location_id": ["L3"]})], ignore_index=True)
+    result = designate_decoupling_points(threshold=0.7, pairs=pairs)
+    assert result["summary"]["total_analyzed"] == 2
+    assert result["summary"]["auto_designated"] == 1 and result["summary"]["auto_rejected"] == 1
+
+    points = local_client.table("decoupling_points").select("product_id, buffer_profile_id").order("product_id").execute().data
+    assert points == [{"product_id": "A", "buffer_profile_id": "BP_FAST"}, {"product_id": "C", "buffer_profile_id": "BP_DEFAULT"}]
+
+
+def test_bullwhip_factor_uses_the_window_and_falls_back_to_stored(local_client):
+    today = date.today()
+    local_client.table("historical_sales_data").insert([
+        {"sales_id": f"A{i}", "product_id": "A", "location_id": "L1",
+         "sales_date": (today - timedelta(days=i)).isoformat(), "quantity_sold": 10 + i % 3}
+        for i in range(90)
+    ]).execute()
+    local_client.table("open_pos").insert([
+        {"id": f"PA{i}", "product_id": "A", "location_id": "L1",
+         "order_date": (today - timedelta(days=i)).isoformat(), "ordered_qty": 300}
+        for i in range(0, 90, 30)
+    ]).execute()
+    local_client.table("bullwhip_analysis").insert([
+        {"product_id": "A", "location_id": "L1", "analysis_period_end": "2024-03-31", "bullwhip_score": 10},
+        {"product_id": "B", "location_id": "L1", "analysis_period_end": "2024-03-31", "bullwhip_score": 80},
+    ]).execute()
+
+    inputs = load_factor_inputs(PAIRS)
+    windowed = calculate_bullwhip_windows([BULLWHIP_WINDOW_DAYS], locations=["L1"])
+    expected = windowed.loc[windowed.product_id == "A", "bullwhip_score"].iloc[0]
+    assert expected != 10
+    assert inputs["bullwhip_score"].tolist()[:2] == [expected, 80]
+    assert np.isnan(inputs["bullwhip_score"].iloc[2])
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.analytics.distribution import detect_best_distribution as dbd
+
+
+def _sales():
+    rng = np.random.default_rng(7)
+    rows = []
+    for p in range(4):
+        for loc in ("L1", "L2"):
+            for i, qty in enumerate(rng.gamma(2.0 + p, 3.0, size=40)):
+                rows.append({"sales_id": f"S{p}{loc}{i:03d}", "product_id": f"P{p}", "location_id": loc,
+                             "sales_date": f"2024-02-{1 + i % 28:02d}", "quantity_sold": float(qty) + 0.1})
+    rows.append({"sales_id": "short", "product_id": "P9", "location_id": "L1", "sales_date": "2024-02-01", "quantity_sold": 3.0})
+    return rows
+
+
+@pytest.fixture
+def client(local_client):
+    local_client.table("historical_sales_data").insert(_sales()).execute()
+    nodes = [{"product_id": f"P{p}", "location_id": loc} for p in range(4) for loc in ("L1", "L2")]
+    nodes.append({"product_id": "P9", "location_id": "L1"})
+    local_client.table("active_demand_nodes").insert(nodes).execute()
+    return local_client
+
+
+def test_partition_matches_masks():
+    sales = pd.DataFrame(_sales()).sample(frac=1.0, random_state=1)
+    groups = dbd.partition_sales(sales)
+    assert len(groups) == 9
+    for (product_id, location_id), values in groups.items():
+        mask = (sales["product_id"] == product_id) & (sales["location_id"] == location_id)
+        assert sorted(values) == sorted(sales.loc[mask, "quantity_sold"])
+
+
+def test_parallel_matches_serial(client):
+    groups = dbd.partition_sales(pd.DataFrame(_sales()))
+    tasks = [(p, l, v) for (p, l), v in groups.items()]
+    serial = dbd.fit_nodes(tasks, workers=1)
+    parallel = dbd.fit_nodes(tasks, workers=2, chunk_size=3)
+    assert [r[:3] for r in serial] == [r[:3] for r in parallel]
+    assert ("P9", "L1", "skipped") in [r[:3] for r in serial]
+
+    dbd.main(workers=2, chunk_size=3)
+    stored = client.table("demand_distribution_profile").select("*").execute().data
+    assert len(stored) == 8
+    assert {r["distribution_type"] for r in stored} <= {"norm", "lognorm", "gamma", "beta"}
+
+
+def test_incremental_refit_skips_unchanged_nodes(client):
+    first = dbd.main(workers=1)
+    assert first["fitted"] == 8 and first["skipped_unchanged"] == 0
+    stored = {(r["product_id"], r["location_id"]): r for r in client.table("demand_distribution_profile").select("*").execute().data}
+    assert stored[("P0", "L1")]["sample_count"] == 40
+
+    second = dbd.main(workers=1)
+    assert second["fitted"] == 0 and second["skipped_unchanged"] == 8
+
+    client.table("historical_sales_data").insert([
+        {"sales_id": "new", "product_id": "P1", "location_id": "L2", "sales_date": "2024-03-01", "quantity_sold": 9.0},
+    ]).execute()
+    third = dbd.main(workers=1)
+    assert third["fitted"] == 1 and third["skipped_unchanged"] == 7
+    row = client.table("demand_distribution_profile").select("*").eq("product_id", "P1").eq("location_id", "L2").execute().data[0]
+    assert row["sample_count"] == 41 and str(row["last_sales_date"]).startswith("2024-03-01")
+
+    assert dbd.main(workers=1, full_refit=True)["fitted"] == 8
+
+
+def test_drift_threshold_keeps_small_changes():
+    current = pd.DataFrame({"product_id": ["A", "B"], "location_id": ["L", "L"], "sample_count": [11, 10],
+                            "last_sales_date": ["2024-01-11", "2024-01-10"], "sales_sum": [110.0, 100.0],
+                            "sales_sum_squares": [1110.0, 1000.0]})
+    stored = current.assign(sample_count=[10, 10], last_sales_date=["2024-01-10"] * 2,
+                            sales_sum=[100.0, 100.0], sales_sum_squares=[1010.0, 1000.0])
+    assert list(dbd.needs_refit(current, stored, threshold=0)) == [True, False]
+    assert list(dbd.needs_refit(current, stored, threshold=0.5)) == [False, False]
+    assert list(dbd.needs_refit(current, stored.iloc[1:], threshold=0.5)) == [True, False]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from backend.analytics.distribution.distribution_fitting import (
+    _segment_stats,
+    closed_form_params,
+    fit_many,
+    ks_statistics,
+)
+
+
+def _series():
+    rng = np.random.default_rng(3)
+    return [np.sort(rng.gamma(1.5 + i, 2.0, size=20 + 7 * i)) for i in range(5)]
+
+
+def _flat(series):
+    counts = np.array([len(s) for s in series])
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return np.concatenate(series), starts, counts
+
+
+def test_closed_form_matches_scipy_mle():
+    series = _series()
+    flat, starts, counts = _flat(series)
+    moments = _segment_stats(flat, starts, counts)
+    norm = closed_form_params("norm", moments)
+    lognorm = closed_form_params("lognorm", moments)
+    gamma = closed_form_params("gamma", moments)
+    for i, s in enumerate(series):
+        assert norm[i] == pytest.approx(stats.norm.fit(s))
+        assert lognorm[i] == pytest.approx(stats.lognorm.fit(s, floc=0), rel=1e-6)
+        assert gamma[i] == pytest.approx(stats.gamma.fit(s, floc=0), rel=0.02)
+
+
+def test_batched_ks_matches_kstest():
+    series = _series()
+    flat, starts, counts = _flat(series)
+    params = closed_form_params("gamma", _segment_stats(flat, starts, counts))
+    statistics = ks_statistics("gamma", params, flat, starts, counts)
+    for i, s in enumerate(series):
+        assert statistics[i] == pytest.approx(stats.kstest(s, "gamma", args=tuple(params[i])).statistic)
+
+
+def test_fit_many_support_and_degenerate_series():
+    series = _series()
+    fits = fit_many(series + [np.full(6, 5.0), np.array([-2.0, 1, 3, 4, 6]), np.array([0.2, 0.3, 0.5, 0.6, 0.7])])
+    assert all(fit[0] in ("norm", "lognorm", "gamma") for fit in fits[:5])
+    assert fits[5] is None
+    assert fits[6][0] == "norm"
+    assert fits[7] is not None
+    # The reported winner has the smallest KS statistic among the fast candidates
+    name, params = fits[0]
+    best = stats.kstest(series[0], name, args=params).statistic
+    for other in ("norm", "lognorm", "gamma"):
+        flat, starts, counts = _flat(series[:1])
+        other_params = closed_form_params(other, _segment_stats(flat, starts, counts))
+        assert best <= ks_statistics(other, other_params, flat, starts, counts)[0] + 1e-12
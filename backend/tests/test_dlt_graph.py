@@ -0,0 +1,58 @@
+from functools import partial
+
+import pytest
+
+from backend.analytics.ddmrp import dlt_graph
+from backend.analytics.ddmrp.dlt_graph import DLTGraph
+from backend.supabase.bulk import read_table
+
+
+def _graph(decoupled=()):
+    # FG <- SUB <- RAW1, FG <- RAW2
+    return DLTGraph(
+        ["FG", "SUB", "RAW1", "RAW2"],
+        [2, 3, 10, 4],
+        [("FG", "SUB"), ("SUB", "RAW1"), ("FG", "RAW2")],
+        decoupled,
+    )
+
+
+def test_longest_unprotected_path():
+    graph = _graph()
+    assert dict(zip(graph.item_ids, graph.dlt)) == {"FG": 15, "SUB": 13, "RAW1": 10, "RAW2": 4}
+    assert graph.critical_path("FG") == ["FG", "SUB", "RAW1"]
+
+
+def test_decoupling_point_stops_the_path():
+    graph = _graph(decoupled=["SUB"])
+    assert graph.dlt[graph.item_ids.index("FG")] == 6
+
+
+def test_incremental_updates_match_rebuild():
+    graph = _graph()
+    assert graph.set_decoupled("SUB") == ["FG"]
+    assert graph.update_lead_time("RAW1", 20) == ["RAW1", "SUB"]
+    assert graph.update_lead_time("RAW2", 1) == ["RAW2", "FG"]
+    rebuilt = DLTGraph(graph.item_ids, graph.lead_time, [("FG", "SUB"), ("SUB", "RAW1"), ("FG", "RAW2")], ["SUB"])
+    assert list(graph.dlt) == list(rebuilt.dlt)
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError):
+        DLTGraph(["A", "B"], [1, 1], [("A", "B"), ("B", "A")])
+
+
+def test_bom_is_paged_on_its_id(local_client, monkeypatch):
+    local_client.table("items").insert([
+        {"item_id": item, "supply_lead_time": lt, "manufacturing_lead_time": 0}
+        for item, lt in [("FG", 2), ("SUB", 3), ("RAW1", 10), ("RAW2", 4)]
+    ]).execute()
+    # One edge per page, so every page boundary is crossed on the id key
+    local_client.table("product_bom").insert([
+        {"parent_product_id": "FG", "child_product_id": "SUB", "bom_level": 1, "quantity_per": 1},
+        {"parent_product_id": "SUB", "child_product_id": "RAW1", "bom_level": 2, "quantity_per": 1},
+        {"parent_product_id": "FG", "child_product_id": "RAW2", "bom_level": 1, "quantity_per": 1},
+    ]).execute()
+    monkeypatch.setattr(dlt_graph, "read_table", partial(read_table, page_size=1, max_workers=1))
+    graph = dlt_graph.load_dlt_graph()
+    assert dict(zip(graph.item_ids, graph.dlt)) == {"FG": 15, "SUB": 13, "RAW1": 10, "RAW2": 4}
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from backend.supabase import async_client
+from backend.supabase.bulk import bulk_upsert, read_table
+from backend.supabase.local_backend import LocalQuery
+
+
+@pytest.fixture
+def db(local_client):
+    return local_client
+
+
+def _sales(n):
+    return [
+        {
+            "sales_id": f"S{i:05d}",
+            "product_id": f"P{i % 7}",
+            "location_id": f"L{i % 3}",
+            "sales_date": f"2024-01-{1 + i % 28:02d}",
+            "quantity_sold": float(i % 11),
+        }
+        for i in range(n)
+    ]
+
+
+def test_schema_seeded_from_migrations(db):
+    resp = db.table("open_pos").select("*", count="exact", head=True).execute()
+    assert resp.count == 0
+
+
+def test_filters_order_and_range(db):
+    db.table("historical_sales_data").insert(_sales(100)).execute()
+    resp = (
+        db.table("historical_sales_data")
+        .select("sales_id, quantity_sold", count="exact")
+        .eq("location_id", "L1")
+        .gte("sales_date", "2024-01-10")
+        .order("sales_id", desc=True)
+        .range(0, 4)
+        .execute()
+    )
+    assert resp.count == len([r for r in _sales(100) if r["location_id"] == "L1" and r["sales_date"] >= "2024-01-10"])
+    assert [r["sales_id"] for r in resp.data] == sorted([r["sales_id"] for r in resp.data], reverse=True)
+    assert len(resp.data) == 5
+
+
+def test_upsert_on_composite_conflict(db):
+    rows = [{"product_id": "P1", "location_id": "L1", "best_distribution": "norm"}]
+    db.table("demand_distribution_profile").upsert(rows, on_conflict="product_id,location_id").execute()
+    rows[0]["best_distribution"] = "gamma"
+    db.table("demand_distribution_profile").upsert(rows, on_conflict="product_id,location_id").execute()
+    data = db.table("demand_distribution_profile").select("*").execute().data
+    assert len(data) == 1 and data[0]["best_distribution"] == "gamma"
+
+
+def test_bulk_reader_and_writer(db):
+    stats = bulk_upsert("historical_sales_data", _sales(1500), on_conflict="sales_id", chunk_size=200)
+    assert stats["rows_written"] == 1500
+    df = read_table("historical_sales_data", key="sales_id", page_size=250)
+    assert len(df) == 1500 and df["sales_id"].is_unique
+
+
+def test_reader_is_not_truncated_by_a_server_row_cap(db, monkeypatch):
+    db.table("historical_sales_data").insert(_sales(700)).execute()
+    # Like PostgREST ``max-rows``: pages larger than the cap come back short
+    limit = LocalQuery.limit
+    monkeypatch.setattr(LocalQuery, "limit", lambda self, size, **kw: limit(self, min(size, 100), **kw))
+    df = read_table("historical_sales_data", key="sales_id", page_size=250, max_workers=2)
+    assert len(df) == 700 and df["sales_id"].is_unique
+
+
+def test_update_delete_and_async_fetch(db):
+    db.table("historical_sales_data").insert(_sales(30)).execute()
+    db.table("historical_sales_data").update({"quantity_sold": 99}).eq("sales_id", "S00001").execute()
+    db.table("historical_sales_data").delete().neq("location_id", "L1").execute()
+    rows = asyncio.run(async_client.fetch("historical_sales_data", filters={"sales_id": ["S00001", "S00002"]}))
+    assert rows == [dict(_sales(30)[1], quantity_sold=99.0)]
@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from backend.analytics.ddmrp.net_flow_batch import calculate_net_flow_batch, compute_net_flow, qualified_demand
+from backend.analytics.ddmrp.net_flow_calculation import calculate_net_flow
+
+TODAY = date(2024, 5, 1)
+
+
+def test_qualified_demand_counts_today_and_spikes_only():
+    today = TODAY.toordinal()
+    codes = np.array([0, 0, 0, 0, 0, 1])
+    days = np.array([today - 2, today, today + 3, today + 3, today + 40, today + 1])
+    qty = np.array([1.0, 2.0, 6.0, 5.0, 100.0, 4.0])
+    demand_today, spikes = qualified_demand(codes, days, qty, np.array([10.0, 5.0]), today, horizon_days=30)
+    assert list(demand_today) == [3.0, 0.0]
+    assert list(spikes) == [11.0, 0.0]
+
+
+def test_colors_match_single_item_calculation(local_client):
+    buffers = pd.DataFrame({
+        "product_id": ["A", "B", "C"],
+        "location_id": ["L1"] * 3,
+        "red_zone": [10.0, 10.0, 10.0],
+        "yellow_zone": [10.0, 10.0, 10.0],
+        "green_zone": [10.0, 10.0, 10.0],
+    })
+    on_hand = pd.DataFrame({
+        "product_id": ["A", "B", "C"],
+        "location_id": ["L1"] * 3,
+        "qty_on_hand": [5.0, 15.0, 40.0],
+        "snapshot_ts": ["2024-04-30T00:00:00Z"] * 3,
+    })
+    empty = pd.DataFrame()
+    frame = compute_net_flow(buffers, on_hand, empty, empty, today=TODAY)
+
+    for row in frame.itertuples():
+        single = calculate_net_flow(row.product_id, row.on_hand, 0.0, 0.0, {"red_zone": 10, "yellow_zone": 10, "green_zone": 10})
+        assert single["color"] == row.color
+
+
+def test_batch_reads_and_persists_through_the_data_layer(local_client):
+    local_client.table("inventory_ddmrp_buffers_view").insert([
+        {"product_id": "A", "location_id": "L1", "adu": 2.0, "red_zone": 10.0, "yellow_zone": 10.0, "green_zone": 10.0},
+    ]).execute()
+    local_client.table("on_hand_inventory").insert([
+        {"product_id": "A", "location_id": "L1", "qty_on_hand": 30.0, "snapshot_ts": "2024-04-30T00:00:00Z"},
+    ]).execute()
+    local_client.table("open_so").insert([
+        {"product_id": "A", "location_id": "L1", "qty": 4.0, "confirmed_date": TODAY.isoformat()},
+        {"product_id": "A", "location_id": "L1", "qty": 8.0, "confirmed_date": (TODAY + timedelta(days=5)).isoformat()},
+    ]).execute()
+
+    result = calculate_net_flow_batch(today=TODAY)
+    assert result["pairs"] == 1
+    stored = local_client.table("net_flow").select("*").eq("product_id", "A").execute().data[0]
+    assert stored["qualified_demand"] == 12.0 and stored["net_flow"] == 18.0 and stored["color"] == "yellow"
+
+    # The single-pair path reads the same zones and writes the same row
+    single = calculate_net_flow("A", 30.0, 0.0, 20.0, location_id="L1")
+    assert (single["ratio"], single["color"]) == (10.0 / 30.0, "yellow")
+    rows = local_client.table("net_flow").select("*").execute().data
+    assert len(rows) == 1 and "item_id" not in rows[0] and rows[0]["net_flow"] == 10.0
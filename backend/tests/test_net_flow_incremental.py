@@ -0,0 +1,71 @@
+from datetime import date, datetime, timedelta, timezone
+
+from backend.analytics.ddmrp.net_flow_incremental import CHANGE_LOG, WILDCARD, IncrementalNetFlow, record_changes
+
+TODAY = date(2024, 5, 1)
+
+
+def test_only_changed_pairs_are_recomputed(local_client):
+    local_client.table("inventory_ddmrp_buffers_view").insert([
+        {"product_id": p, "location_id": "L1", "adu": 1.0, "red_zone": 10.0, "yellow_zone": 10.0, "green_zone": 10.0}
+        for p in ("A", "B", "C")
+    ]).execute()
+    local_client.table("on_hand_inventory").insert([
+        {"product_id": p, "location_id": "L1", "qty_on_hand": 25.0, "snapshot_ts": "2024-04-30T00:00:00Z"}
+        for p in ("A", "B", "C")
+    ]).execute()
+
+    refresher = IncrementalNetFlow(safety_lag_seconds=0)
+    first = refresher.refresh(TODAY)
+    assert first["full_refresh"] and first["pairs_written"] == 3
+
+    assert refresher.refresh(TODAY)["pairs_written"] == 0
+
+    local_client.table("on_hand_inventory").update({"qty_on_hand": 5.0}).eq("product_id", "B").execute()
+    record_changes([("B", "L1")], "on_hand")
+    result = refresher.refresh(TODAY)
+    assert result["changes"] == 1 and result["pairs_written"] == 1
+    assert result["colors"] == {"red": 1}
+
+    colors = {r["product_id"]: r["color"] for r in local_client.table("net_flow").select("product_id, color").execute().data}
+    assert colors == {"A": "green", "B": "red", "C": "green"}
+
+    # A product-level change marks the product at every location
+    record_changes([("A", WILDCARD)], "buffer")
+    result = refresher.refresh(TODAY)
+    assert result["changes"] == 1 and result["pairs_written"] == 1
+    assert refresher.prune() == 2
+
+
+def test_late_commit_of_a_lower_id_is_not_skipped(local_client):
+    now = datetime.now(timezone.utc)
+    row = lambda i, product, at: {"id": i, "product_id": product, "location_id": "L1", "source": "on_hand", "changed_at": at.isoformat()}
+    local_client.table(CHANGE_LOG).insert([row(1, "A", now - timedelta(minutes=5)), row(3, "C", now)]).execute()
+
+    refresher = IncrementalNetFlow(watermark=0, safety_lag_seconds=60)
+    assert refresher.poll() == 2
+    assert refresher.watermark == 1
+
+    # id 2 commits after id 3 was read; only the new row is marked again
+    local_client.table(CHANGE_LOG).insert([row(2, "B", now)]).execute()
+    assert refresher.poll() == 1
+    assert refresher.watermark == 1
+    assert refresher._take_dirty() == (False, [("A", "L1"), ("B", "L1"), ("C", "L1")])
+
+
+def test_periodic_full_refresh_catches_unlogged_zone_changes(local_client):
+    local_client.table("inventory_ddmrp_buffers_view").insert(
+        {"product_id": "A", "location_id": "L1", "adu": 1.0, "red_zone": 10.0, "yellow_zone": 10.0, "green_zone": 10.0}
+    ).execute()
+    local_client.table("on_hand_inventory").insert(
+        {"product_id": "A", "location_id": "L1", "qty_on_hand": 25.0, "snapshot_ts": "2024-04-30T00:00:00Z"}
+    ).execute()
+    refresher = IncrementalNetFlow(safety_lag_seconds=0, full_refresh_seconds=3600)
+    assert refresher.refresh(TODAY)["colors"] == {"green": 1}
+
+    # New ADU shrinks the zones without a change-log row
+    local_client.table("inventory_ddmrp_buffers_view").update({"red_zone": 2.0, "yellow_zone": 2.0, "green_zone": 2.0}).execute()
+    assert refresher.refresh(TODAY)["pairs_written"] == 0
+    refresher.last_full_refresh -= timedelta(hours=1)
+    result = refresher.refresh(TODAY)
+    assert result["full_refresh"] and result["colors"] == {"blue": 1}
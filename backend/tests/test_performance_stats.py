@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.analytics.threshold import performance_stats as ps
+from backend.analytics.bayesian_threshold_update import update_thresholds
+from backend.analytics.threshold.threshold_bayesian_update import bayesian_threshold_update, main
+from backend.supabase.cache import invalidate
+
+
+def _periods(start, n):
+    rng = np.random.default_rng(start)
+    return [{"id": i, "service_level": float(rng.uniform(0.8, 1.0)),
+             "stockout_count": int(rng.integers(0, 3)), "overstock_count": int(rng.integers(0, 2))}
+            for i in range(start, start + n)]
+
+
+@pytest.fixture
+def client(local_client):
+    local_client.table("performance_tracking").insert(_periods(1, 30)).execute()
+    local_client.table("threshold_config").insert([{"id": 1, "demand_variability_threshold": 0.6, "decoupling_threshold": 0.75}]).execute()
+    invalidate("threshold_config")
+    try:
+        yield local_client
+    finally:
+        invalidate("threshold_config")
+
+
+def test_incremental_fold_matches_full_recompute(client):
+    first = ps.refresh_performance_stats()
+    assert first.periods == 30 and first.watermark == 30
+
+    client.table("performance_tracking").insert(_periods(31, 12)).execute()
+    assert len(ps.fetch_new_performance(ps.load_stats().watermark)) == 12
+    stats = ps.refresh_performance_stats()
+    assert stats.periods == 42 and stats.watermark == 42
+
+    full = pd.DataFrame(_periods(1, 30) + _periods(31, 12))
+    assert stats.service_mean == pytest.approx(full["service_level"].mean())
+    assert stats.service_variance == pytest.approx(full["service_level"].var())
+    assert stats.stockout_rate == pytest.approx(full["stockout_count"].sum() / 42)
+    assert ps.refresh_performance_stats(full=True).periods == 42
+
+    # Nothing new: the saved statistics are reused as they are
+    assert ps.refresh_performance_stats().periods == 42
+
+    main()
+    config = client.table("threshold_config").select("*").eq("id", 1).execute().data[0]
+    assert (config["demand_variability_threshold"], config["decoupling_threshold"]) == pytest.approx(bayesian_threshold_update(full))
+
+
+def test_recent_rows_wait_for_the_lag_and_edits_are_caught_by_the_rebuild(client, monkeypatch):
+    assert ps.refresh_performance_stats().periods == 30
+    now = datetime.now(timezone.utc)
+    late, settled = _periods(31, 2)
+    late["updated_at"] = now.isoformat()
+    settled["updated_at"] = (now - timedelta(hours=1)).isoformat()
+    client.table("performance_tracking").insert([late, settled]).execute()
+
+    # Row 31 may still have uncommitted neighbours: neither it nor 32 is folded yet
+    stats = ps.refresh_performance_stats()
+    assert (stats.periods, stats.watermark) == (30, 30)
+    monkeypatch.setattr(ps, "SAFETY_LAG_SECONDS", 0.0)
+    stats = ps.refresh_performance_stats()
+    assert (stats.periods, stats.watermark) == (32, 32)
+
+    # An in-place edit is invisible to the incremental path until the rebuild is due
+    client.table("performance_tracking").update({"service_level": 0.0}).eq("id", 1).execute()
+    assert ps.refresh_performance_stats().service_sum == pytest.approx(stats.service_sum)
+    monkeypatch.setattr(ps, "FULL_REBUILD_DAYS", 1e-9)
+    rebuilt = ps.refresh_performance_stats()
+    expected = pd.DataFrame(client.table("performance_tracking").select("*").execute().data)
+    assert rebuilt.periods == 32
+    assert rebuilt.service_mean == pytest.approx(expected["service_level"].mean())
+    assert ps.load_stats().full_rebuilt_at >= now
+
+
+def test_variance_update_needs_two_service_levels(local_client, capsys):
+    local_client.table("performance_tracking").insert([
+        {"id": 1, "service_level": 0.9, "stockout_count": 0, "overstock_count": 0},
+        {"id": 2, "service_level": None, "stockout_count": 1, "overstock_count": 0},
+    ]).execute()
+    local_client.table("threshold_config").insert([{"id": 1, "demand_variability_threshold": 0.6, "decoupling_threshold": 0.75}]).execute()
+    invalidate("threshold_config")
+    try:
+        update_thresholds()
+    finally:
+        invalidate("threshold_config")
+    assert "Skipping update" in capsys.readouterr().out
+    config = local_client.table("threshold_config").select("*").eq("id", 1).execute().data[0]
+    assert config["demand_variability_threshold"] == 0.6
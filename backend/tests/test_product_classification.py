@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.analytics.clustering import product_classification as pc
+from backend.analytics.clustering.classification_model import ClassificationModel, latest_version, load_latest
+
+
+def _planning_rows(low_adu=2.0):
+    rng = np.random.default_rng(5)
+    rows = []
+    for i in range(240):
+        group = i % 3
+        adu = [low_adu, 20.0, 80.0][group] + rng.normal(0, 1.0)
+        rows.append({"product_id": f"P{i:03d}", "location_id": f"L{i % 4}",
+                     "average_daily_usage": round(float(adu), 1),
+                     "demand_variability": float([0.2, 0.5, 0.9][group] + rng.normal(0, 0.02))})
+    return rows
+
+
+@pytest.fixture
+def client(local_client):
+    local_client.table("inventory_planning_view").insert(_planning_rows()).execute()
+    return local_client
+
+
+def test_descending_rank_matches_pandas():
+    values = np.array([3.0, 1.0, 3.0, 7.0, 2.0, 3.0])
+    expected = pd.Series(values).rank(ascending=False).to_numpy()
+    assert list(pc.descending_rank(np.sort(values), values)) == list(expected)
+
+
+def test_streaming_matches_full_kmeans(client):
+    full = pc.classify_products(pc.fetch_all_data()).set_index(["product_id", "location_id"])
+    streamed = pd.concat(pc.classify_products_streaming(batch_size=50)).set_index(["product_id", "location_id"])
+    assert len(streamed) == len(full)
+    streamed = streamed.loc[full.index]
+    assert (streamed["classification_label"] == full["classification_label"]).all()
+    assert (streamed["score"] == full["score"]).all()
+    assert set(full.loc[full["average_daily_usage"] > 50, "classification_label"]) == {"A"}
+
+    pc.main(mode="streaming")
+    stored = client.table("product_classification").select("*").execute().data
+    assert len(stored) == 240
+
+
+def test_streaming_rechunks_pages_and_keeps_rows_of_a_short_scan(client, monkeypatch):
+    assert [len(b) for b in pc.iter_planning_batches(batch_size=100)] == [100, 100, 40]
+    client.table("product_classification").insert(
+        {"product_id": "OLD", "location_id": "L0", "classification_label": "C"}
+    ).execute()
+
+    # A scan that returns fewer rows than the view holds must not delete anything
+    iter_batches = pc.iter_batches
+    monkeypatch.setattr(pc, "iter_batches", lambda *a, **kw: (b.iloc[:10] for b in iter_batches(*a, **kw)))
+    pc.run_streaming(batch_size=50)
+    stored = {r["product_id"] for r in client.table("product_classification").select("product_id").execute().data}
+    assert "OLD" in stored
+
+    monkeypatch.setattr(pc, "iter_batches", iter_batches)
+    pc.run_streaming(batch_size=50)
+    stored = {r["product_id"] for r in client.table("product_classification").select("product_id").execute().data}
+    assert "OLD" not in stored and len(stored) == 240
+
+
+def test_incremental_run_writes_only_the_diff(local_client, tmp_path):
+    # Strictly positive ADUs, so a new row can rank below every existing one
+    client = local_client
+    client.table("inventory_planning_view").insert(_planning_rows(low_adu=5.0)).execute()
+    first = pc.run_incremental(model_dir=str(tmp_path))
+    assert first == {"changed": 240, "unchanged": 0, "removed": 0}
+    assert latest_version(str(tmp_path)) == 1
+
+    assert pc.run_incremental(model_dir=str(tmp_path)) == {"changed": 0, "unchanged": 240, "removed": 0}
+
+    # Replace the lowest (untied) ADU row by an even lower one: no other rank moves
+    rows = sorted(_planning_rows(low_adu=5.0), key=lambda r: r["average_daily_usage"])
+    lowest = rows[0]
+    assert rows[1]["average_daily_usage"] > lowest["average_daily_usage"]
+    client.table("inventory_planning_view").delete().eq("product_id", lowest["product_id"]).eq("location_id", lowest["location_id"]).execute()
+    client.table("inventory_planning_view").insert([{"product_id": "NEW", "location_id": "L0",
+                                                      "average_daily_usage": 0.01, "demand_variability": 0.2}]).execute()
+    assert pc.run_incremental(model_dir=str(tmp_path)) == {"changed": 1, "unchanged": 239, "removed": 1}
+    stored = client.table("product_classification").select("*").eq("product_id", "NEW").execute().data
+    assert stored[0]["classification_label"] == "C"
+
+    pc.run_incremental(retrain=True, model_dir=str(tmp_path))
+    assert latest_version(str(tmp_path)) == 2
+
+
+def test_diff_is_not_thrown_off_by_null_scores_or_fields():
+    stored = pd.DataFrame({
+        "product_id": ["A", "B", "C", "D"], "location_id": "L1", "classification_label": ["A", "B", "C", "C"],
+        "lead_time_category": "short", "variability_level": "low", "criticality": ["high", "high", "high", None],
+        "score": [3, None, 1, 1],
+    })
+    # The stored NULL makes the stored scores floats; the fresh ones are ints
+    fresh = stored.drop(index=1).assign(score=[3, 2, 1])
+    changed, stale = pc.classification_diff(fresh, stored)
+    assert changed["product_id"].tolist() == ["C"] and stale == [("B", "L1")]
+
+
+def test_model_roundtrip_and_drift(tmp_path):
+    features = pd.DataFrame(_planning_rows())[pc.FEATURES].to_numpy()
+    model = ClassificationModel.fit(features)
+    assert set(model.labels) == {"A", "B", "C"}
+    model.save(str(tmp_path))
+    loaded = load_latest(str(tmp_path))
+    assert (loaded.assign(features)["classification_label"] == model.assign(features)["classification_label"]).all()
+    assert loaded.needs_retrain(features) is None
+    assert "drift" in loaded.needs_retrain(features * np.array([2.0, 1.0]))
+
+
+def test_persisted_model_matches_in_memory_kmeans(client):
+    full = pc.classify_products(pc.fetch_all_data())
+    model = ClassificationModel.fit(full[pc.FEATURES].fillna(0).to_numpy(dtype=float))
+    assert (model.assign(full[pc.FEATURES].to_numpy(dtype=float))["classification_label"] == full["classification_label"]).all()
@@ -0,0 +1,99 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.supabase import sales_snapshot as ss
+
+
+def _sale(sales_id, location_id, sales_date, product_id="A", qty=1.0):
+    return {"sales_id": sales_id, "product_id": product_id, "location_id": location_id,
+            "sales_date": sales_date, "quantity_sold": qty, "unit_price": 2.0, "revenue": 2.0 * qty}
+
+
+@pytest.fixture
+def client(local_client):
+    local_client.table("historical_sales_data").insert([
+        _sale("1", "L1", "2024-03-01"),
+        _sale("2", "L1", "2024-03-05", product_id="B"),
+        _sale("3", "L/2", "2024-03-10"),
+    ]).execute()
+    return local_client
+
+
+def test_delta_sync_fetches_only_new_rows(client, tmp_path):
+    first = ss.sync_sales_snapshot(root=tmp_path)
+    assert (first["rows_added"], first["locations_touched"], first["watermark"]) == (3, 2, "2024-03-10")
+    assert ss.sync_sales_snapshot(root=tmp_path)["rows_added"] == 0
+
+    # Rows on the watermark day and after it; the stored ones are not duplicated
+    client.table("historical_sales_data").insert([
+        _sale("4", "L/2", "2024-03-10"), _sale("5", "L3", "2024-03-12"),
+    ]).execute()
+    delta = ss.sync_sales_snapshot(root=tmp_path)
+    assert (delta["rows_added"], delta["watermark"], delta["full"]) == (2, "2024-03-12", False)
+    assert sorted(ss.load_sales(root=tmp_path)["sales_id"]) == ["1", "2", "3", "4", "5"]
+
+
+def test_backdated_rows_need_the_lookback_or_a_full_resync(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(ss, "LOOKBACK_DAYS", 3)
+    ss.sync_sales_snapshot(root=tmp_path)
+    client.table("historical_sales_data").insert([
+        _sale("late", "L1", "2024-03-08"), _sale("very_late", "L1", "2024-03-02"),
+    ]).execute()
+    assert ss.sync_sales_snapshot(root=tmp_path)["rows_added"] == 1
+    assert "very_late" not in set(ss.load_sales(root=tmp_path)["sales_id"])
+
+    # Once the last full reload is old enough, the next sync reloads everything
+    assert not ss.full_resync_due(root=tmp_path)
+    assert ss.full_resync_due(root=tmp_path, now=datetime.utcnow() + timedelta(days=ss.FULL_RESYNC_DAYS))
+    result = ss.sync_sales_snapshot(root=tmp_path, full=True)
+    assert result["full"] and result["rows_added"] == 5
+    assert len(ss.load_sales(root=tmp_path)) == 5
+
+
+def test_location_partitions_and_compaction(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(ss, "MAX_PARTS", 2)
+    ss.sync_sales_snapshot(root=tmp_path)
+    assert ss.snapshot_locations(root=tmp_path) == ["L/2", "L1"]
+    # The third part of L1 exceeds MAX_PARTS and compacts the partition
+    for i, day in enumerate(["2024-03-11", "2024-03-12"]):
+        client.table("historical_sales_data").insert([_sale(f"n{i}", "L1", day)]).execute()
+        ss.sync_sales_snapshot(root=tmp_path)
+    assert len(ss._part_files(ss._partition_dir("L1", tmp_path))) == 1
+    assert len(ss.load_sales(locations=["L1"], root=tmp_path)) == 4
+
+
+def test_load_sales_filters(client, tmp_path):
+    ss.sync_sales_snapshot(root=tmp_path)
+    window = ss.load_sales(start_date="2024-03-02", end_date="2024-03-10", root=tmp_path)
+    assert sorted(window["sales_id"]) == ["2", "3"]
+    assert list(ss.load_sales(product_ids=["B"], columns=["sales_id"], root=tmp_path)["sales_id"]) == ["2"]
+    assert list(ss.load_sales(locations=["L/2"], root=tmp_path)["sales_id"]) == ["3"]
+    assert ss.load_sales(locations=["missing"], root=tmp_path).empty
+
+
+def test_full_reload_is_swapped_in_only_when_complete(client, tmp_path, monkeypatch):
+    ss.sync_sales_snapshot(root=tmp_path)
+    versions = sorted(os.listdir(tmp_path))
+    iter_batches = ss.iter_batches
+    seen_during_reload = []
+
+    def failing(*args, **kwargs):
+        for batch in iter_batches(*args, **kwargs):
+            yield batch
+            seen_during_reload.append(len(ss.load_sales(root=tmp_path)))
+            raise ConnectionError("network down")
+
+    monkeypatch.setattr(ss, "iter_batches", failing)
+    with pytest.raises(ConnectionError):
+        ss.sync_sales_snapshot(root=tmp_path, full=True)
+    assert seen_during_reload == [3] and len(ss.load_sales(root=tmp_path)) == 3
+    assert sorted(os.listdir(tmp_path)) == versions
+
+    monkeypatch.setattr(ss, "iter_batches", iter_batches)
+    client.table("historical_sales_data").insert([_sale("old", "L1", "2024-01-01")]).execute()
+    assert ss.sync_sales_snapshot(root=tmp_path, full=True)["rows_added"] == 4
+    assert os.path.islink(ss._table_dir(tmp_path)) and len(os.listdir(tmp_path)) == 2
+    assert sorted(os.listdir(tmp_path)) != versions
+    assert ss.read_watermark(root=tmp_path) == "2024-03-10" and len(ss.load_sales(root=tmp_path)) == 4
@@ -0,0 +1,105 @@
+-- Change log for incremental net flow recalculation
+-- Every insert/update/delete on the net flow inputs records the affected
+-- product-location; analytics/ddmrp/net_flow_incremental.py consumes the
+-- log and recomputes only those pairs.  The inputs are on-hand, open supply,
+-- sales orders and the zones of inventory_ddmrp_buffers_view, which in turn
+-- read actual_lead_time, component_demand_view (ADU), buffer_profile_master,
+-- product_master and location_master.
+
+CREATE TABLE IF NOT EXISTS public.net_flow_change_log (
+  id bigserial PRIMARY KEY,
+  product_id text NOT NULL,
+  location_id text NOT NULL,
+  source text NOT NULL,
+  -- Wall-clock time of the insert (not the transaction start), so rows older
+  -- than the consumer's safety lag can no longer be preceded by an
+  -- uncommitted lower id
+  changed_at timestamptz NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_net_flow_change_log_changed_at ON public.net_flow_change_log(changed_at);
+
+ALTER TABLE public.net_flow_change_log ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow authenticated full access" ON public.net_flow_change_log;
+CREATE POLICY "Allow authenticated full access" ON public.net_flow_change_log
+  FOR ALL TO authenticated USING (true) WITH CHECK (true);
+
+-- Row-level inputs: log the old and the new pair
+CREATE OR REPLACE FUNCTION public.log_net_flow_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO public.net_flow_change_log (product_id, location_id, source)
+    VALUES (OLD.product_id, OLD.location_id, TG_ARGV[0]);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO public.net_flow_change_log (product_id, location_id, source)
+    VALUES (NEW.product_id, NEW.location_id, TG_ARGV[0]);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SET search_path = public;
+
+DROP TRIGGER IF EXISTS trigger_net_flow_change_on_hand ON public.on_hand_inventory;
+CREATE TRIGGER trigger_net_flow_change_on_hand
+  AFTER INSERT OR UPDATE OR DELETE ON public.on_hand_inventory
+  FOR EACH ROW EXECUTE FUNCTION public.log_net_flow_change('on_hand');
+
+DROP TRIGGER IF EXISTS trigger_net_flow_change_open_pos ON public.open_pos;
+CREATE TRIGGER trigger_net_flow_change_open_pos
+  AFTER INSERT OR UPDATE OR DELETE ON public.open_pos
+  FOR EACH ROW EXECUTE FUNCTION public.log_net_flow_change('open_supply');
+
+DROP TRIGGER IF EXISTS trigger_net_flow_change_open_so ON public.open_so;
+CREATE TRIGGER trigger_net_flow_change_open_so
+  AFTER INSERT OR UPDATE OR DELETE ON public.open_so
+  FOR EACH ROW EXECUTE FUNCTION public.log_net_flow_change('demand');
+
+-- Lead times feed the red and yellow zones of their pair
+DROP TRIGGER IF EXISTS trigger_net_flow_change_lead_time ON public.actual_lead_time;
+CREATE TRIGGER trigger_net_flow_change_lead_time
+  AFTER INSERT OR UPDATE OR DELETE ON public.actual_lead_time
+  FOR EACH ROW EXECUTE FUNCTION public.log_net_flow_change('lead_time');
+
+-- Tables that feed many zones at once: log one wildcard row per statement
+CREATE OR REPLACE FUNCTION public.log_net_flow_wildcard_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO public.net_flow_change_log (product_id, location_id, source)
+  VALUES ('*', '*', TG_ARGV[0]);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SET search_path = public;
+
+DROP FUNCTION IF EXISTS public.log_net_flow_buffer_change() CASCADE;
+
+DROP TRIGGER IF EXISTS trigger_net_flow_change_buffer_profile ON public.buffer_profile_master;
+CREATE TRIGGER trigger_net_flow_change_buffer_profile
+  AFTER INSERT OR UPDATE OR DELETE ON public.buffer_profile_master
+  FOR EACH STATEMENT EXECUTE FUNCTION public.log_net_flow_wildcard_change('buffer');
+
+DROP TRIGGER IF EXISTS trigger_net_flow_change_product_master ON public.product_master;
+CREATE TRIGGER trigger_net_flow_change_product_master
+  AFTER INSERT OR UPDATE OR DELETE ON public.product_master
+  FOR EACH STATEMENT EXECUTE FUNCTION public.log_net_flow_wildcard_change('product');
+
+DROP TRIGGER IF EXISTS trigger_net_flow_change_location_master ON public.location_master;
+CREATE TRIGGER trigger_net_flow_change_location_master
+  AFTER INSERT OR UPDATE OR DELETE ON public.location_master
+  FOR EACH STATEMENT EXECUTE FUNCTION public.log_net_flow_wildcard_change('location');
+
+-- ADU comes from the component_demand_view materialized view, which changes
+-- only when it is refreshed (not on each sale): log the refresh instead
+CREATE OR REPLACE FUNCTION public.refresh_component_demand_view()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  REFRESH MATERIALIZED VIEW component_demand_view;
+  INSERT INTO public.net_flow_change_log (product_id, location_id, source)
+  VALUES ('*', '*', 'adu');
+END;
+$$;
@@ -0,0 +1,50 @@
+-- Net flow alerts keep one open alert per item/location; a color change
+-- resolves the open alert and opens a new one with the previous color.
+
+CREATE TABLE IF NOT EXISTS public.alerts (
+  id bigserial PRIMARY KEY,
+  item_id text NOT NULL,
+  location_id text,
+  alert_type text NOT NULL,
+  color text NOT NULL,
+  previous_color text,
+  message text,
+  status text NOT NULL DEFAULT 'open',
+  created_at timestamptz NOT NULL DEFAULT now(),
+  resolved_at timestamptz
+);
+
+-- status is added without a default: the previous generator inserted a row
+-- per run, so existing tables hold many rows per item and must not all
+-- become open.
+ALTER TABLE public.alerts
+  ADD COLUMN IF NOT EXISTS location_id text,
+  ADD COLUMN IF NOT EXISTS previous_color text,
+  ADD COLUMN IF NOT EXISTS status text,
+  ADD COLUMN IF NOT EXISTS resolved_at timestamptz;
+
+-- Backfill: only the newest pre-existing row per item/location stays open.
+WITH ranked AS (
+  SELECT id,
+         row_number() OVER (
+           PARTITION BY item_id, COALESCE(location_id, '')
+           ORDER BY created_at DESC, id DESC
+         ) AS rn
+  FROM public.alerts
+  WHERE status IS NULL
+)
+UPDATE public.alerts AS a
+SET status = CASE WHEN ranked.rn = 1 THEN 'open' ELSE 'resolved' END,
+    resolved_at = CASE WHEN ranked.rn = 1 THEN NULL ELSE CURRENT_TIMESTAMP END
+FROM ranked
+WHERE a.id = ranked.id;
+
+ALTER TABLE public.alerts
+  ALTER COLUMN status SET DEFAULT 'open',
+  ALTER COLUMN status SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_one_open
+  ON public.alerts (item_id, COALESCE(location_id, ''))
+  WHERE status = 'open';
+
+CREATE INDEX IF NOT EXISTS idx_alerts_status ON public.alerts (status);
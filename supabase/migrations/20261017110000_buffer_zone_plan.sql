@@ -0,0 +1,32 @@
+-- Time-phased buffer zones from the DAF/ZAF/LTAF calendars
+-- (analytics/ddmrp/adjustment_calendar.py); only changed cells are rewritten.
+
+ALTER TABLE public.demand_adjustment_factor ADD COLUMN IF NOT EXISTS ramp_days integer NOT NULL DEFAULT 0;
+ALTER TABLE public.zone_adjustment_factor ADD COLUMN IF NOT EXISTS ramp_days integer NOT NULL DEFAULT 0;
+ALTER TABLE public.lead_time_adjustment_factor ADD COLUMN IF NOT EXISTS ramp_days integer NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN public.demand_adjustment_factor.ramp_days IS 'Days over which the factor phases in linearly from 1.0 (0 = step change)';
+COMMENT ON COLUMN public.zone_adjustment_factor.ramp_days IS 'Days over which the factor phases in linearly from 1.0 (0 = step change)';
+COMMENT ON COLUMN public.lead_time_adjustment_factor.ramp_days IS 'Days over which the factor phases in linearly from 1.0 (0 = step change)';
+
+CREATE TABLE IF NOT EXISTS public.buffer_zone_plan (
+  product_id text NOT NULL,
+  location_id text NOT NULL,
+  plan_date date NOT NULL,
+  daf numeric NOT NULL DEFAULT 1.0,
+  zaf numeric NOT NULL DEFAULT 1.0,
+  ltaf numeric NOT NULL DEFAULT 1.0,
+  red_zone numeric NOT NULL,
+  yellow_zone numeric NOT NULL,
+  green_zone numeric NOT NULL,
+  calculated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (product_id, location_id, plan_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_buffer_zone_plan_date ON public.buffer_zone_plan (plan_date);
+
+ALTER TABLE public.buffer_zone_plan ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow authenticated full access" ON public.buffer_zone_plan;
+CREATE POLICY "Allow authenticated full access" ON public.buffer_zone_plan
+  FOR ALL TO authenticated USING (true) WITH CHECK (true);
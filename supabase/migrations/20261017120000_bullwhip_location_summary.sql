@@ -0,0 +1,156 @@
+-- Bullwhip ratio was scored but never stored; the location summary and the
+-- top-candidate ranking need it.
+ALTER TABLE IF EXISTS public.bullwhip_analysis ADD COLUMN IF NOT EXISTS bullwhip_ratio numeric;
+
+-- Backfill from the stored moments, as bullwhip_analysis.py computes it.  A
+-- NaN order std (a single order) leaves the ratio undefined (NULL).
+DO $$
+BEGIN
+  IF to_regclass('public.bullwhip_analysis') IS NOT NULL THEN
+    UPDATE public.bullwhip_analysis
+    SET bullwhip_ratio = CASE
+      WHEN customer_demand_mean > 0 AND customer_demand_std_dev > 0 AND customer_demand_std_dev <> 'NaN'
+        THEN (CASE WHEN order_qty_mean > 0 THEN order_qty_std_dev / order_qty_mean ELSE 0 END)
+             / (customer_demand_std_dev / customer_demand_mean)
+      ELSE 1.0
+    END
+    WHERE bullwhip_ratio IS NULL
+      AND order_qty_std_dev IS NOT NULL AND order_qty_std_dev <> 'NaN';
+  END IF;
+END $$;
+
+-- Per-location bullwhip summary of the latest analysis period of each pair.
+-- top_products holds the location's BULLWHIP_SUMMARY_TOP_K (50) highest
+-- ratios, so the overall ranking can be rebuilt from these rows alone.
+CREATE TABLE IF NOT EXISTS public.bullwhip_location_summary (
+  location_id text PRIMARY KEY,
+  total_products integer NOT NULL DEFAULT 0,
+  avg_bullwhip_ratio numeric,
+  max_bullwhip_ratio numeric,
+  critical_products integer NOT NULL DEFAULT 0,
+  products_with_amplification integer NOT NULL DEFAULT 0,
+  top_5_products jsonb NOT NULL DEFAULT '[]'::jsonb,
+  top_products jsonb NOT NULL DEFAULT '[]'::jsonb,
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- Overall top-K pairs by bullwhip ratio
+CREATE TABLE IF NOT EXISTS public.bullwhip_top_candidates (
+  rank integer PRIMARY KEY,
+  product_id text NOT NULL,
+  location_id text NOT NULL,
+  bullwhip_ratio numeric NOT NULL,
+  bullwhip_score integer,
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+ALTER TABLE public.bullwhip_location_summary ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.bullwhip_top_candidates ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow authenticated full access" ON public.bullwhip_location_summary;
+CREATE POLICY "Allow authenticated full access" ON public.bullwhip_location_summary
+  FOR ALL TO authenticated USING (true) WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Allow authenticated full access" ON public.bullwhip_top_candidates;
+CREATE POLICY "Allow authenticated full access" ON public.bullwhip_top_candidates
+  FOR ALL TO authenticated USING (true) WITH CHECK (true);
+
+-- Recompute the summary rows of the given locations, then the overall top-K
+-- from the per-location top lists.  Callable as an RPC for a manual rebuild
+-- (pass every location) and run by the trigger below on every write.
+CREATE OR REPLACE FUNCTION public.refresh_bullwhip_summary(p_location_ids text[], p_top_k integer DEFAULT 50)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  -- Serialise refreshes so concurrent writers cannot store an older view
+  PERFORM pg_advisory_xact_lock(hashtext('bullwhip_location_summary'));
+
+  DELETE FROM public.bullwhip_location_summary WHERE location_id = ANY(p_location_ids);
+
+  INSERT INTO public.bullwhip_location_summary (
+    location_id, total_products, avg_bullwhip_ratio, max_bullwhip_ratio, critical_products,
+    products_with_amplification, top_5_products, top_products, updated_at
+  )
+  WITH latest AS (
+    SELECT DISTINCT ON (product_id, location_id)
+      product_id, location_id, bullwhip_ratio, bullwhip_score
+    FROM public.bullwhip_analysis
+    WHERE location_id = ANY(p_location_ids)
+    ORDER BY product_id, location_id, analysis_period_end DESC
+  ),
+  ranked AS (
+    SELECT *, row_number() OVER (PARTITION BY location_id ORDER BY bullwhip_ratio DESC, product_id) AS rn
+    FROM latest
+    WHERE bullwhip_ratio IS NOT NULL AND bullwhip_ratio <> 'NaN'
+  )
+  SELECT
+    location_id,
+    count(*),
+    avg(bullwhip_ratio),
+    max(bullwhip_ratio),
+    count(*) FILTER (WHERE bullwhip_ratio >= 2.0),
+    count(*) FILTER (WHERE bullwhip_ratio > 1.0),
+    COALESCE(jsonb_agg(jsonb_build_object('product_id', product_id, 'bullwhip_ratio', bullwhip_ratio,
+                                          'bullwhip_score', bullwhip_score) ORDER BY rn)
+             FILTER (WHERE rn <= 5), '[]'::jsonb),
+    COALESCE(jsonb_agg(jsonb_build_object('product_id', product_id, 'bullwhip_ratio', bullwhip_ratio,
+                                          'bullwhip_score', bullwhip_score) ORDER BY rn)
+             FILTER (WHERE rn <= p_top_k), '[]'::jsonb),
+    now()
+  FROM ranked
+  GROUP BY location_id;
+
+  DELETE FROM public.bullwhip_top_candidates;
+  INSERT INTO public.bullwhip_top_candidates (rank, product_id, location_id, bullwhip_ratio, bullwhip_score, updated_at)
+  SELECT
+    row_number() OVER (ORDER BY (p.value->>'bullwhip_ratio')::numeric DESC, p.value->>'product_id', s.location_id),
+    p.value->>'product_id', s.location_id, (p.value->>'bullwhip_ratio')::numeric,
+    (p.value->>'bullwhip_score')::integer, now()
+  FROM public.bullwhip_location_summary s
+  CROSS JOIN LATERAL jsonb_array_elements(s.top_products) AS p(value)
+  ORDER BY 1
+  LIMIT p_top_k;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.bullwhip_analysis_refresh_summary()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM public.refresh_bullwhip_summary(ARRAY(SELECT DISTINCT location_id FROM new_rows));
+  ELSIF TG_OP = 'UPDATE' THEN
+    PERFORM public.refresh_bullwhip_summary(ARRAY(
+      SELECT location_id FROM new_rows UNION SELECT location_id FROM old_rows));
+  ELSE
+    PERFORM public.refresh_bullwhip_summary(ARRAY(SELECT DISTINCT location_id FROM old_rows));
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+-- Statement-level: one refresh per upsert batch, whoever writes the rows.
+-- Transition tables need one trigger per event.
+DO $$
+BEGIN
+  IF to_regclass('public.bullwhip_analysis') IS NOT NULL THEN
+    DROP TRIGGER IF EXISTS bullwhip_analysis_summary_insert ON public.bullwhip_analysis;
+    DROP TRIGGER IF EXISTS bullwhip_analysis_summary_update ON public.bullwhip_analysis;
+    DROP TRIGGER IF EXISTS bullwhip_analysis_summary_delete ON public.bullwhip_analysis;
+    CREATE TRIGGER bullwhip_analysis_summary_insert AFTER INSERT ON public.bullwhip_analysis
+      REFERENCING NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION public.bullwhip_analysis_refresh_summary();
+    CREATE TRIGGER bullwhip_analysis_summary_update AFTER UPDATE ON public.bullwhip_analysis
+      REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION public.bullwhip_analysis_refresh_summary();
+    CREATE TRIGGER bullwhip_analysis_summary_delete AFTER DELETE ON public.bullwhip_analysis
+      REFERENCING OLD TABLE AS old_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION public.bullwhip_analysis_refresh_summary();
+    -- Seed the summary from the rows already stored
+    PERFORM public.refresh_bullwhip_summary(ARRAY(SELECT DISTINCT location_id FROM public.bullwhip_analysis));
+  END IF;
+END $$;
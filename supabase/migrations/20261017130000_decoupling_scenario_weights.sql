@@ -0,0 +1,9 @@
+-- Weights for the storage intensity, MOQ rigidity and bullwhip factors, so
+-- every scenario in decoupling_weights_config covers all nine factors
+-- (analytics/ddmrp/decoupling_scoring.py).  Existing scenarios keep their
+-- totals: the new weights default to 0.
+
+ALTER TABLE public.decoupling_weights_config
+  ADD COLUMN IF NOT EXISTS storage_intensity_weight numeric DEFAULT 0 CHECK (storage_intensity_weight >= 0 AND storage_intensity_weight <= 1),
+  ADD COLUMN IF NOT EXISTS moq_rigidity_weight numeric DEFAULT 0 CHECK (moq_rigidity_weight >= 0 AND moq_rigidity_weight <= 1),
+  ADD COLUMN IF NOT EXISTS bullwhip_weight numeric DEFAULT 0 CHECK (bullwhip_weight >= 0 AND bullwhip_weight <= 1);
@@ -0,0 +1,8 @@
+-- Sales fingerprint stored with each distribution profile, so the nightly
+-- detection job only refits nodes whose sales history changed.
+ALTER TABLE IF EXISTS demand_distribution_profile
+  ADD COLUMN IF NOT EXISTS sample_count integer,
+  ADD COLUMN IF NOT EXISTS last_sales_date date,
+  ADD COLUMN IF NOT EXISTS sales_sum numeric,
+  ADD COLUMN IF NOT EXISTS sales_sum_squares numeric,
+  ADD COLUMN IF NOT EXISTS fitted_at timestamptz;
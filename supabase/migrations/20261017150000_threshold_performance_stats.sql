@@ -0,0 +1,25 @@
+-- Running sufficient statistics of performance_tracking for the Bayesian
+-- threshold updaters (analytics/threshold/performance_stats.py).  Each run
+-- folds only the rows past the watermark into these counters;
+-- full_rebuilt_at is when they were last recomputed from the whole table.
+CREATE TABLE IF NOT EXISTS public.threshold_performance_stats (
+  source_table text PRIMARY KEY,
+  watermark text,
+  periods numeric NOT NULL DEFAULT 0,
+  service_count numeric NOT NULL DEFAULT 0,
+  service_sum numeric NOT NULL DEFAULT 0,
+  service_sum_squares numeric NOT NULL DEFAULT 0,
+  stockout_total numeric NOT NULL DEFAULT 0,
+  overstock_total numeric NOT NULL DEFAULT 0,
+  full_rebuilt_at timestamptz,
+  updated_at timestamptz DEFAULT now()
+);
+
+ALTER TABLE public.threshold_performance_stats
+  ADD COLUMN IF NOT EXISTS full_rebuilt_at timestamptz;
+
+ALTER TABLE public.threshold_performance_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow authenticated full access" ON public.threshold_performance_stats;
+CREATE POLICY "Allow authenticated full access" ON public.threshold_performance_stats
+  FOR ALL TO authenticated USING (true) WITH CHECK (true);
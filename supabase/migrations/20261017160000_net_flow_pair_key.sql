@@ -0,0 +1,50 @@
+-- net_flow holds one row per product-location, computed from the zones of
+-- inventory_ddmrp_buffers_view (analytics/ddmrp/net_flow_batch.py and the
+-- single-pair calculate_net_flow).  The old single-item path wrote rows keyed
+-- by item_id alone; those have no location and are dropped with the column.
+CREATE TABLE IF NOT EXISTS public.net_flow (
+  product_id text NOT NULL,
+  location_id text NOT NULL,
+  on_hand numeric,
+  open_supply numeric,
+  qualified_demand numeric,
+  spike_demand numeric,
+  net_flow numeric,
+  ratio numeric,
+  color text,
+  calculated_at timestamptz DEFAULT now(),
+  PRIMARY KEY (product_id, location_id)
+);
+
+ALTER TABLE public.net_flow
+  ADD COLUMN IF NOT EXISTS product_id text,
+  ADD COLUMN IF NOT EXISTS location_id text,
+  ADD COLUMN IF NOT EXISTS on_hand numeric,
+  ADD COLUMN IF NOT EXISTS open_supply numeric,
+  ADD COLUMN IF NOT EXISTS qualified_demand numeric,
+  ADD COLUMN IF NOT EXISTS spike_demand numeric,
+  ADD COLUMN IF NOT EXISTS ratio numeric,
+  ADD COLUMN IF NOT EXISTS calculated_at timestamptz DEFAULT now();
+
+-- A table created by the item-keyed path: drop its per-item rows and key
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'net_flow' AND column_name = 'item_id'
+  ) THEN
+    UPDATE public.net_flow SET product_id = item_id WHERE product_id IS NULL AND location_id IS NOT NULL;
+    DELETE FROM public.net_flow WHERE product_id IS NULL OR location_id IS NULL;
+    ALTER TABLE public.net_flow DROP COLUMN item_id CASCADE;
+    ALTER TABLE public.net_flow ALTER COLUMN product_id SET NOT NULL, ALTER COLUMN location_id SET NOT NULL;
+  END IF;
+END $$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_net_flow_product_location ON public.net_flow(product_id, location_id);
+CREATE INDEX IF NOT EXISTS idx_net_flow_color ON public.net_flow(color);
+
+ALTER TABLE public.net_flow ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow authenticated full access" ON public.net_flow;
+CREATE POLICY "Allow authenticated full access" ON public.net_flow
+  FOR ALL TO authenticated USING (true) WITH CHECK (true);